@@ -1,25 +1,29 @@
 #!/usr/bin/env python3
 """
 01_sync_wallet.py - Create Excel file and populate WALLET tab
-Usage: python 01_sync_wallet.py
+Usage: python 01_sync_wallet.py [--stage_only]
+
+Each step reassembles processed/{batch_id}.xlsx from every tab staged so far, so running
+the steps standalone rewrites the earlier tabs once per step. That keeps the workbook usable
+after every step; with --stage_only the WALLET tab is only staged and the last step writes
+the workbook once.
 """
 
 import sys
 import os
+import argparse
 from pathlib import Path
 from datetime import datetime
 import pytz
-import gspread
-from google.oauth2.service_account import Credentials
-import openpyxl
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Font, PatternFill, Alignment
 from typing import List, Dict
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
 from utils import setup_logging, get_env_variable, get_batch_timestamp_as_datetime
+from src.google_client import get_gspread_client, open_spreadsheet
+from src.sheet_mirror import get_sheet_mirror
+from src.batch_staging import stage_tab, finalize_batch, workbook_path
 
 logger = setup_logging()
 
@@ -50,7 +54,7 @@ def set_current_batch(batch_id: str):
 
 def get_current_excel_path(batch_id: str) -> Path:
     """Get Excel file path for current batch"""
-    return Path("processed") / f"{batch_id}.xlsx"
+    return workbook_path(batch_id)
 
 class WalletSyncer:
     """Sync wallet data from Google Sheets to Excel"""
@@ -58,21 +62,12 @@ class WalletSyncer:
     def __init__(self):
         self.wallet_sheet_id = get_env_variable('WALLET_SHEET_ID')
         self.wallet_tab_name = get_env_variable('WALLET_SHEET_TAB')
-        self.credentials_path = get_env_variable('GOOGLE_SHEETS_CREDENTIALS_PATH', 'config/credentials.json')
         self.client = self._authenticate()
     
     def _authenticate(self):
-        """Authenticate with Google Sheets API"""
-        scope = [
-            'https://spreadsheets.google.com/feeds',
-            'https://www.googleapis.com/auth/drive'
-        ]
-        
+        """Authenticate with Google Sheets API (shared client, cached access token)"""
         try:
-            credentials = Credentials.from_service_account_file(
-                self.credentials_path, scopes=scope
-            )
-            client = gspread.authorize(credentials)
+            client = get_gspread_client()
             logger.info("✅ Google Sheets authentication successful")
             return client
             
@@ -105,12 +100,11 @@ class WalletSyncer:
             logger.info(f"📖 Reading wallet data from sheet ID: {self.wallet_sheet_id}")
             logger.info(f"📖 Tab name: {self.wallet_tab_name}")
             
-            # Open the workbook and worksheet
-            workbook = self.client.open_by_key(self.wallet_sheet_id)
-            worksheet = workbook.worksheet(self.wallet_tab_name)
+            # Open the workbook
+            workbook = open_spreadsheet(self.wallet_sheet_id)
             
-            # Get all values
-            all_values = worksheet.get_all_values()
+            # Get all values (from the local mirror when the sheet hasn't changed since the last batch)
+            all_values = get_sheet_mirror().get_all_values(workbook, self.wallet_tab_name)
             
             if not all_values:
                 logger.warning("⚠️ No data found in wallet sheet")
@@ -153,87 +147,38 @@ class WalletSyncer:
             logger.error(f"❌ Failed to read wallet data: {e}")
             raise
     
-    def create_excel_file(self, filename: str, processed_dir: Path) -> Path:
-        """Create new Excel file"""
-        file_path = processed_dir / filename
-        
-        try:
-            # Create new workbook
-            workbook = openpyxl.Workbook()
-            
-            # Remove default sheet
-            default_sheet = workbook.active
-            workbook.remove(default_sheet)
-            
-            logger.info(f"📄 Created new Excel file: {file_path}")
-            return file_path, workbook
-            
-        except Exception as e:
-            logger.error(f"❌ Failed to create Excel file: {e}")
-            raise
-    
-    def populate_wallet_tab(self, workbook: openpyxl.Workbook, wallet_data: List[Dict]):
-        """Populate WALLET tab in Excel"""
+    def stage_wallet_tab(self, batch_id: str, wallet_data: List[Dict]):
+        """Stage the WALLET tab of the batch workbook"""
         try:
             logger.info(f"📝 Creating WALLET tab with {len(wallet_data)} records...")
             
-            # Create WALLET worksheet
-            wallet_sheet = workbook.create_sheet("WALLET")
-            
             # Define headers - exactly what's in Google Sheets + sync time as last column
             headers = ['Wallet Name', 'Company', 'Address', 'Created At', 'Refreshed Time', 'Sync_Date']
             
-            # Style for headers
-            header_font = Font(bold=True, color="FFFFFF")
-            header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            header_alignment = Alignment(horizontal="center")
-            
-            # Write headers
-            for col_idx, header in enumerate(headers, 1):
-                cell = wallet_sheet.cell(row=1, column=col_idx, value=header)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = header_alignment
-            
-            # Write data - exactly as it appears in Google Sheets + sync time from batch
-            for row_idx, wallet in enumerate(wallet_data, 2):  # Start from row 2
-                wallet_sheet.cell(row=row_idx, column=1, value=wallet['wallet_name'])
-                wallet_sheet.cell(row=row_idx, column=2, value=wallet['company'])
-                wallet_sheet.cell(row=row_idx, column=3, value=wallet['address'])
-                wallet_sheet.cell(row=row_idx, column=4, value=wallet['created_at'])
-                wallet_sheet.cell(row=row_idx, column=5, value=wallet['refreshed_time'])
-                wallet_sheet.cell(row=row_idx, column=6, value=wallet['sync_date'])
+            # Data - exactly as it appears in Google Sheets + sync time from batch
+            rows = ([wallet['wallet_name'], wallet['company'], wallet['address'],
+                     wallet['created_at'], wallet['refreshed_time'], wallet['sync_date']]
+                    for wallet in wallet_data)
             
-            # Auto-adjust column widths
-            for column in wallet_sheet.columns:
-                max_length = 0
-                column_letter = get_column_letter(column[0].column)
-                
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                
-                adjusted_width = min(max_length + 2, 50)  # Cap at 50 chars
-                wallet_sheet.column_dimensions[column_letter].width = adjusted_width
+            # Column widths are fitted to the data (capped at 50 chars)
+            stage_tab(batch_id, "WALLET", headers, rows, header_color="366092", max_width=50)
             
-            logger.info(f"✅ Successfully populated WALLET tab")
+            logger.info(f"✅ Successfully staged WALLET tab")
             
         except Exception as e:
-            logger.error(f"❌ Failed to populate WALLET tab: {e}")
+            logger.error(f"❌ Failed to stage WALLET tab: {e}")
             raise
     
-    def save_excel_file(self, workbook: openpyxl.Workbook, file_path: Path):
-        """Save Excel file"""
+    def finalize_excel_file(self, batch_id: str) -> Path:
+        """Assemble the batch Excel file from its staged tabs"""
         try:
-            workbook.save(file_path)
+            file_path = finalize_batch(batch_id)
             logger.info(f"💾 Excel file saved: {file_path}")
             
             # Show file info
             file_size = file_path.stat().st_size
             logger.info(f"📊 File size: {file_size:,} bytes")
+            return file_path
             
         except Exception as e:
             logger.error(f"❌ Failed to save Excel file: {e}")
@@ -241,6 +186,11 @@ class WalletSyncer:
 
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description='Create the batch and stage its WALLET tab')
+    parser.add_argument('--stage_only', action='store_true',
+                       help='Only stage the WALLET tab; a later step assembles the Excel file')
+    args = parser.parse_args()
+    
     try:
         logger.info("🚀 Starting 01_sync_wallet.py")
         logger.info("="*60)
@@ -255,10 +205,6 @@ def main():
         batch_id = syncer.generate_batch_id()
         set_current_batch(batch_id)
         
-        # Create Excel filename
-        filename = f"{batch_id}.xlsx"
-        excel_path = get_current_excel_path(batch_id)
-        
         # Read wallet data from Google Sheets (with batch ID for consistent sync time)
         wallet_data = syncer.read_wallet_data(batch_id)
         
@@ -266,19 +212,20 @@ def main():
             logger.error("❌ No wallet data found. Cannot proceed.")
             sys.exit(1)
         
-        # Create Excel file
-        file_path, workbook = syncer.create_excel_file(filename, processed_dir)
+        # Stage WALLET tab (later steps stage theirs into the same batch)
+        syncer.stage_wallet_tab(batch_id, wallet_data)
         
-        # Populate WALLET tab
-        syncer.populate_wallet_tab(workbook, wallet_data)
-        
-        # Save file
-        syncer.save_excel_file(workbook, file_path)
+        # Assemble the Excel file (left to the last step with --stage_only)
+        if args.stage_only:
+            file_path = workbook_path(batch_id)
+            logger.info(f"📦 WALLET tab staged only, {file_path} is written by a later step")
+        else:
+            file_path = syncer.finalize_excel_file(batch_id)
         
         # Final summary
         logger.info("="*60)
         logger.info("🎉 01_sync_wallet.py completed successfully!")
-        logger.info(f"📄 Created file: {file_path}")
+        logger.info(f"📄 {'Staged batch for' if args.stage_only else 'Created file'}: {file_path}")
         logger.info(f"📊 WALLET tab: {len(wallet_data)} records")
         logger.info(f"📅 Batch ID: {batch_id}")
         logger.info(f"📄 Batch file: current_batch.txt")
@@ -1,19 +1,18 @@
 #!/usr/bin/env python3
 """
-02_sync_ms_form.py - Add MS_FORM tab to existing Excel file
-Usage: python 02_sync_ms_form.py
+02_sync_ms_form.py - Add MS_FORM tab to the current batch's Excel file
+Usage: python 02_sync_ms_form.py [--stage_only]
+
+The Excel file is reassembled from all staged tabs (see 01_sync_wallet.py --stage_only);
+with --stage_only the MS_FORM tab is only staged for a later step to assemble.
 """
 
 import sys
 import os
+import argparse
 from pathlib import Path
 from datetime import datetime
 import pytz
-import gspread
-from google.oauth2.service_account import Credentials
-import openpyxl
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Font, PatternFill, Alignment
 from typing import List, Dict
 import re
 
@@ -21,6 +20,9 @@ import re
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
 from utils import setup_logging, get_env_variable, get_batch_timestamp_as_datetime
+from src.google_client import get_gspread_client, open_spreadsheet
+from src.sheet_mirror import get_sheet_mirror
+from src.batch_staging import stage_tab, finalize_batch, read_manifest, staging_dir, workbook_path
 
 logger = setup_logging()
 
@@ -41,7 +43,7 @@ def get_current_batch() -> str:
 
 def get_current_excel_path(batch_id: str) -> Path:
     """Get Excel file path for current batch"""
-    return Path("processed") / f"{batch_id}.xlsx"
+    return workbook_path(batch_id)
 
 class MSFormSyncer:
     """Sync MS Form data from Google Sheets to Excel"""
@@ -49,7 +51,6 @@ class MSFormSyncer:
     def __init__(self):
         self.form_sheet_id = get_env_variable('FORM_SHEET_ID')
         self.form_worksheet = get_env_variable('FORM_WORKSHEET')
-        self.credentials_path = get_env_variable('GOOGLE_SHEETS_CREDENTIALS_PATH', 'config/credentials.json')
         self.client = self._authenticate()
         
         # Categories that should result in negative amounts (expenses/reimbursements)
@@ -62,17 +63,9 @@ class MSFormSyncer:
         }
     
     def _authenticate(self):
-        """Authenticate with Google Sheets API"""
-        scope = [
-            'https://spreadsheets.google.com/feeds',
-            'https://www.googleapis.com/auth/drive'
-        ]
-        
+        """Authenticate with Google Sheets API (shared client, cached access token)"""
         try:
-            credentials = Credentials.from_service_account_file(
-                self.credentials_path, scopes=scope
-            )
-            client = gspread.authorize(credentials)
+            client = get_gspread_client()
             logger.info("✅ Google Sheets authentication successful")
             return client
             
@@ -86,12 +79,11 @@ class MSFormSyncer:
             logger.info(f"📖 Reading form data from sheet ID: {self.form_sheet_id}")
             logger.info(f"📖 Worksheet: {self.form_worksheet}")
             
-            # Open the workbook and worksheet
-            workbook = self.client.open_by_key(self.form_sheet_id)
-            worksheet = workbook.worksheet(self.form_worksheet)
+            # Open the workbook
+            workbook = open_spreadsheet(self.form_sheet_id)
             
-            # Get all values
-            all_values = worksheet.get_all_values()
+            # Get all values (from the local mirror when the sheet hasn't changed since the last batch)
+            all_values = get_sheet_mirror().get_all_values(workbook, self.form_worksheet)
             
             if not all_values:
                 logger.warning("⚠️ No data found in form sheet")
@@ -223,87 +215,54 @@ class MSFormSyncer:
             logger.warning(f"⚠️ Could not parse amount: '{amount_str}' for category '{category}': {e}")
             return 0.0
     
-    def add_ms_form_tab(self, excel_path: Path, form_data: List[Dict]):
-        """Add MS_FORM tab to existing Excel file"""
+    def stage_ms_form_tab(self, batch_id: str, form_data: List[Dict]) -> int:
+        """Stage the MS_FORM tab of the batch workbook, returns the number of columns"""
+        # Get all unique column names from all records
+        all_columns = set()
+        for record in form_data:
+            all_columns.update(record.keys())
+        
+        # Sort columns for consistent order, put important ones first
+        priority_columns = ['form_row', 'clean_txn_hash', 'processed_amount', 'sync_date']
+        sorted_columns = []
+        
+        # Add priority columns first (if they exist)
+        for col in priority_columns:
+            if col in all_columns:
+                sorted_columns.append(col)
+                all_columns.remove(col)
+        
+        # Add remaining columns alphabetically
+        sorted_columns.extend(sorted(all_columns))
+        
+        logger.info(f"📊 Writing {len(sorted_columns)} columns: {sorted_columns[:10]}{'...' if len(sorted_columns) > 10 else ''}")
+        
+        # Negative processed amounts are shown red by a conditional-formatting rule
+        rows = ([record.get(column_name, '') for column_name in sorted_columns] for record in form_data)
+        stage_tab(batch_id, "MS_FORM", sorted_columns, rows, header_color="0066CC", max_width=60,
+                  negative_red_columns=['processed_amount'])
+        return len(sorted_columns)
+    
+    def add_ms_form_tab(self, batch_id: str, form_data: List[Dict], finalize: bool = True) -> Path:
+        """Stage the MS_FORM tab and (unless finalize is False) reassemble the batch Excel file with it"""
         try:
-            logger.info(f"📝 Adding MS_FORM tab to {excel_path}")
-            
-            # Open existing Excel file
-            workbook = openpyxl.load_workbook(excel_path)
-            
-            # Remove MS_FORM sheet if it already exists
-            if "MS_FORM" in workbook.sheetnames:
-                workbook.remove(workbook["MS_FORM"])
-                logger.info("🗑️ Removed existing MS_FORM tab")
-            
-            # Create MS_FORM worksheet
-            ms_form_sheet = workbook.create_sheet("MS_FORM")
+            logger.info(f"📝 Adding MS_FORM tab to batch {batch_id}")
             
             if not form_data:
                 logger.warning("⚠️ No data to write to MS_FORM tab")
-                return
-            
-            # Get all unique column names from all records
-            all_columns = set()
-            for record in form_data:
-                all_columns.update(record.keys())
-            
-            # Sort columns for consistent order, put important ones first
-            priority_columns = ['form_row', 'clean_txn_hash', 'processed_amount', 'sync_date']
-            sorted_columns = []
+                return get_current_excel_path(batch_id)
             
-            # Add priority columns first (if they exist)
-            for col in priority_columns:
-                if col in all_columns:
-                    sorted_columns.append(col)
-                    all_columns.remove(col)
+            column_count = self.stage_ms_form_tab(batch_id, form_data)
             
-            # Add remaining columns alphabetically
-            sorted_columns.extend(sorted(all_columns))
-            
-            logger.info(f"📊 Writing {len(sorted_columns)} columns: {sorted_columns[:10]}{'...' if len(sorted_columns) > 10 else ''}")
-            
-            # Style for headers
-            header_font = Font(bold=True, color="FFFFFF")
-            header_fill = PatternFill(start_color="0066CC", end_color="0066CC", fill_type="solid")
-            header_alignment = Alignment(horizontal="center")
-            
-            # Write headers
-            for col_idx, column_name in enumerate(sorted_columns, 1):
-                cell = ms_form_sheet.cell(row=1, column=col_idx, value=column_name)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = header_alignment
-            
-            # Write data
-            for row_idx, record in enumerate(form_data, 2):  # Start from row 2
-                for col_idx, column_name in enumerate(sorted_columns, 1):
-                    value = record.get(column_name, '')
-                    cell = ms_form_sheet.cell(row=row_idx, column=col_idx, value=value)
-                    
-                    # Special formatting for processed amounts
-                    if column_name == 'processed_amount' and isinstance(value, (int, float)) and value < 0:
-                        cell.font = Font(color="FF0000")  # Red for negative amounts
-            
-            # Auto-adjust column widths
-            for column in ms_form_sheet.columns:
-                max_length = 0
-                column_letter = get_column_letter(column[0].column)
-                
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                
-                adjusted_width = min(max_length + 2, 60)  # Cap at 60 chars
-                ms_form_sheet.column_dimensions[column_letter].width = adjusted_width
-            
-            # Save the workbook
-            workbook.save(excel_path)
+            # The workbook is assembled from the staged tabs (WALLET, MS_FORM) in one write,
+            # the existing file isn't reopened
+            if finalize:
+                excel_path = finalize_batch(batch_id)
+            else:
+                excel_path = get_current_excel_path(batch_id)
+                logger.info(f"📦 MS_FORM tab staged only, {excel_path} is written by a later step")
             
-            logger.info(f"✅ Successfully added MS_FORM tab with {len(form_data)} records and {len(sorted_columns)} columns")
+            logger.info(f"✅ Successfully added MS_FORM tab with {len(form_data)} records and {column_count} columns")
             
             # Show summary if processed amounts exist
             if any('processed_amount' in record for record in form_data):
@@ -317,12 +276,19 @@ class MSFormSyncer:
                     logger.info(f"📈 Positive amounts: ${positive_amount:,.2f}")
                     logger.info(f"📉 Negative amounts: ${negative_amount:,.2f}")
             
+            return excel_path
+            
         except Exception as e:
             logger.error(f"❌ Failed to add MS_FORM tab: {e}")
             raise
 
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description="Stage the MS_FORM tab of the current batch")
+    parser.add_argument('--stage_only', action='store_true',
+                       help='Only stage the MS_FORM tab; a later step assembles the Excel file')
+    args = parser.parse_args()
+    
     try:
         logger.info("🚀 Starting 02_sync_ms_form.py")
         logger.info("="*60)
@@ -331,9 +297,9 @@ def main():
         batch_id = get_current_batch()
         excel_path = get_current_excel_path(batch_id)
         
-        # Check if Excel file exists
-        if not excel_path.exists():
-            logger.error(f"❌ Excel file not found: {excel_path}")
+        # Check that 01_sync_wallet.py staged this batch
+        if not read_manifest(batch_id)['tabs']:
+            logger.error(f"❌ No staged tabs for batch {batch_id} in {staging_dir(batch_id)}")
             logger.error("Run 01_sync_wallet.py first to create the Excel file")
             sys.exit(1)
         
@@ -355,7 +321,7 @@ def main():
             sys.exit(1)
         
         # Add MS_FORM tab to Excel file
-        syncer.add_ms_form_tab(excel_path, form_data)
+        syncer.add_ms_form_tab(batch_id, form_data, finalize=not args.stage_only)
         
         # Final summary
         logger.info("="*60)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the pipeline steps
+Usage: python cli.py <command> [command options]
+Example: python cli.py hash-check 1dad52d991ba6963777ae069276e01d67ba6e9786811739cb463b405c51a2213 --usdt-only
+
+Only the chosen command's script is imported, so gspread / google-auth / openpyxl are loaded
+by the steps that use them and `python cli.py --help` or `hash-check` start quickly.
+"""
+
+import sys
+import argparse
+import importlib.util
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+
+# command -> (script run by it, description)
+COMMANDS = {
+    'wallet-sync': ('01_sync_wallet.py', 'Sync WALLET_LIST from Google Sheets into a new batch Excel file'),
+    'form-sync': ('02_sync_ms_form.py', 'Add the MS Form submissions to the current batch Excel file'),
+    'historical-load': ('scripts/historical_usdt_load.py', 'Historical USDT load for every wallet in WALLET_LIST'),
+    'adhoc-load': ('scripts/adhoc_usdt_load.py', 'Ad-hoc USDT load for one address and date range'),
+    'hash-check': ('hash_checker.py', 'Look up TRC20 transfers for transaction hashes'),
+    'exceptions': ('scripts/exception_analysis.py', 'Compare MS_FORM against TRONSCAN and write EXCEPTIONS'),
+    'pipeline': ('pipeline.py', 'Run the whole batch as one in-process DAG (resumable)')
+}
+
+def load_command(name: str):
+    """Import the script behind a command (without running it) and return its module"""
+    script = ROOT / COMMANDS[name][0]
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+
+    spec = importlib.util.spec_from_file_location(f"cli_{name.replace('-', '_')}", script)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    parser = argparse.ArgumentParser(
+        description='Crypto hash exception pipeline',
+        epilog='Run "python cli.py <command> --help" for the options of a command.',
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('command', choices=list(COMMANDS), metavar='command',
+                        help='; '.join(f"{name}: {description}" for name, (_, description) in COMMANDS.items()))
+    parser.add_argument('args', nargs=argparse.REMAINDER, help='Options passed to the command')
+
+    # Everything after the command belongs to it, including --help
+    if argv and argv[0] in COMMANDS:
+        command, command_args = argv[0], argv[1:]
+    else:
+        args = parser.parse_args(argv)
+        command, command_args = args.command, args.args
+
+    module = load_command(command)
+
+    # The scripts parse sys.argv themselves
+    sys.argv = [str(ROOT / COMMANDS[command][0])] + command_args
+    return module.main()
+
+if __name__ == "__main__":
+    sys.exit(main())
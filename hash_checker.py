@@ -12,6 +12,8 @@ import sys
 import argparse
 from decimal import Decimal, getcontext
 from datetime import datetime
+from src.rate_limiter import get_rate_limiter
+from src.tx_cache import get_transaction_cache
 
 # Set precision for decimal calculations
 getcontext().prec = 28
@@ -27,14 +29,24 @@ def extract_trc20_transfers(tx_hash: str, verbose: bool = False):
     params = {"hash": tx_hash}
     
     try:
-        if verbose:
-            print("🌐 Fetching data from TronScan API...")
-        
-        time.sleep(0.5)  # Rate limiting
-        response = requests.get(url, params=params, timeout=15)
-        response.raise_for_status()
+        tx_cache = get_transaction_cache()
+        data = tx_cache.get(tx_hash)
         
-        data = response.json()
+        if data is not None:
+            if verbose:
+                print("🗄️ Using cached transaction data")
+        else:
+            if verbose:
+                print("🌐 Fetching data from TronScan API...")
+            
+            rate_limiter = get_rate_limiter('tronscan')
+            rate_limiter.acquire()
+            response = requests.get(url, params=params, timeout=15)
+            rate_limiter.record_response(response.status_code, response.headers.get('Retry-After'))
+            response.raise_for_status()
+            
+            data = response.json()
+            tx_cache.put(tx_hash, data)
         
         # Check if transaction exists
         if not data or 'hash' not in data:
@@ -214,6 +226,10 @@ def main():
             for transfer in result['transfers']
         )
         print(f"\n💰 Total USDT Value: ${total_usdt:,.2f}")
+        
+        stats = get_transaction_cache().get_stats()
+        print(f"🗄️ Cache: {stats['memory_hits'] + stats['disk_hits']} hits, {stats['misses']} misses, "
+              f"{stats['disk_entries']} stored ({stats['disk_bytes']:,} bytes)")
 
 if __name__ == "__main__":
     if len(sys.argv) == 1:
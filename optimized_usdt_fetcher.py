@@ -10,6 +10,9 @@ import csv
 from datetime import datetime, timezone, timedelta
 from typing import List, Dict, Any
 from decimal import Decimal, getcontext
+from src.rate_limiter import get_rate_limiter
+from src.http_transport import HttpTransport
+from src.key_pool import get_key_pool
 
 # Set high precision for decimal calculations
 getcontext().prec = 28
@@ -20,28 +23,27 @@ class USDTTransactionFetcher:
     def __init__(self, api_key: str = None):
         self.base_url = "https://api.trongrid.io/v1"
         self.api_key = api_key
-        self.session = requests.Session()
         
         # USDT TRC20 contract address
         self.usdt_contract = "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"
         
-        if self.api_key:
-            self.session.headers.update({'TRON-PRO-API-KEY': self.api_key})
-        
-        # Rate limiting - be conservative with requests
-        self.rate_limit_delay = 0.2 if api_key else 0.5
-    
-    def _rate_limit(self):
-        """Apply rate limiting delay"""
-        time.sleep(self.rate_limit_delay)
+        # Shared TronGrid budget (TRONGRID_REQUESTS_PER_SECOND), backs off on 429/5xx;
+        # the transport adds timeouts, retries and the per-host circuit breaker.
+        # TRONGRID_API_KEYS / TRONGRID_API_KEYS_FILE add keys to rotate alongside api_key.
+        self.rate_limiter = get_rate_limiter('trongrid')
+        self.key_pool = get_key_pool('trongrid', self.api_key)
+        self.transport = HttpTransport(
+            'trongrid', rate_limiter=self.rate_limiter,
+            key_pool=self.key_pool, key_header='TRON-PRO-API-KEY'
+        )
+        self.session = self.transport.session
     
     def _make_request(self, endpoint: str, params: Dict = None) -> Dict:
         """Make API request with error handling and rate limiting"""
         url = f"{self.base_url}/{endpoint}"
         
         try:
-            self._rate_limit()
-            response = self.session.get(url, params=params or {}, timeout=30)
+            response = self.transport.get(url, params=params or {})
             response.raise_for_status()
             
             # Check if response is JSON
@@ -104,6 +106,10 @@ class USDTTransactionFetcher:
         
         print(f"🕐 Timestamp range: {min_timestamp} to {max_timestamp}")
         
+        return self.get_usdt_transactions_between(wallet_address, min_timestamp, max_timestamp)
+    
+    def get_usdt_transactions_between(self, wallet_address: str, min_timestamp: int, max_timestamp: int) -> List[Dict]:
+        """Get USDT transactions between two inclusive millisecond timestamps"""
         all_transactions = []
         fingerprint = None
         limit = 200  # Maximum allowed by TronGrid
@@ -224,8 +230,9 @@ class USDTTransactionFetcher:
                     break
                     
             except Exception as e:
-                print(f"❌ Error fetching transactions: {e}")
-                break
+                # Returning what we have so far would silently truncate the wallet's history
+                print(f"❌ Error fetching transactions after {len(all_transactions)} records: {e}")
+                raise
         
         return all_transactions
 
@@ -354,7 +361,7 @@ def main():
             print(f"{date_str:<20} {tx['direction']:<3} {amount_str:<15} {hash_short:<20} {counterparty:<20}")
         
         print("-" * 90)
-        print(f"💡 Tip: Use TronGrid API key for faster processing (current: {'✅ Authenticated' if api_key else '❌ No API key'})")
+        print(f"💡 Tip: Use TronGrid API key for faster processing (current: {len(fetcher.key_pool)} API keys)")
         print(f"🔗 Get your free API key at: https://www.trongrid.io/")
         
         # Save to CSV
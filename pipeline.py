@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Batch pipeline runner - wallet sync, form sync, USDT fetch and exception analysis in one process
+Usage: python pipeline.py --date_from 2025-07-01 --date_to 2025-08-01
+       python pipeline.py --resume                     (continue the current batch after a failure)
+
+The steps run as stages of one DAG instead of separate processes chained through
+current_batch.txt: they share the Google / TronScan clients and hand each other their
+tables in memory, and stages whose inputs are ready run concurrently (the wallet and form
+reads; the workbook and the sheet writes at the end). The TRONSCAN and EXCEPTION tabs are
+written by one stage so their writes go out together as coalesced batchUpdate calls.
+
+    wallet_read ──┬── wallet_tab ──┐
+                  │                ├── workbook
+    form_read ────┼── form_tab ────┘
+                  │
+                  └── usdt_fetch ───── sheets  (TRONSCAN + exceptions, also needs wallet_read, form_read)
+
+Every stage is timed. Completed stages and their outputs are kept in
+processed/{batch_id}/pipeline/, so --resume only runs what hasn't completed yet.
+"""
+
+import sys
+import json
+import time
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Sequence
+import pytz
+
+from cli import load_command
+from src.batch_staging import staging_dir, finalize_batch, decode_value, write_json_atomic
+from src.utils import setup_logging, validate_date_format
+
+logger = setup_logging()
+
+class Stage:
+    """One step of the pipeline: a function of the context, run once its dependencies completed"""
+
+    def __init__(self, name: str, func: Callable, deps: Sequence[str] = ()):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+
+class PipelineState:
+    """Completed stages of a batch (with timings) and their outputs, under processed/{batch_id}/pipeline/"""
+
+    def __init__(self, batch_id: str):
+        self.directory = staging_dir(batch_id) / "pipeline"
+        self.path = self.directory / "state.json"
+        if self.path.exists():
+            self.data = json.loads(self.path.read_text())
+        else:
+            self.data = {'batch_id': batch_id, 'settings': {}, 'completed': {}}
+
+    @property
+    def completed(self) -> Dict[str, Dict]:
+        return self.data['completed']
+
+    def save(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(self.path, self.data)
+
+    def complete(self, name: str, seconds: float, output):
+        """Persist a stage's output, then mark it completed (so a completed stage always has its output)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(self.directory / f"{name}.json", {'output': output})
+        self.completed[name] = {'seconds': round(seconds, 3), 'finished_at': datetime.now().isoformat()}
+        self.save()
+
+    def load_output(self, name: str):
+        path = self.directory / f"{name}.json"
+        return json.loads(path.read_text(), object_hook=decode_value)['output']
+
+class PipelineContext:
+    """What the stages share: batch settings, clients (created once, on first use) and stage outputs"""
+
+    def __init__(self, batch_id: str, settings: Dict, state: PipelineState):
+        self.batch_id = batch_id
+        self.settings = settings
+        self.state = state
+        self._outputs = {}
+        self._clients = {}
+        # Reentrant: a client's factory may need another client (the syncers need their script)
+        self._lock = threading.RLock()
+
+    def _client(self, name: str, factory: Callable):
+        with self._lock:
+            if name not in self._clients:
+                self._clients[name] = factory()
+            return self._clients[name]
+
+    def script(self, command: str):
+        """A cli.py command's script module (imported once)"""
+        return self._client(f"script:{command}", lambda: load_command(command))
+
+    @property
+    def wallet_syncer(self):
+        return self._client('wallet_syncer', lambda: self.script('wallet-sync').WalletSyncer())
+
+    @property
+    def form_syncer(self):
+        return self._client('form_syncer', lambda: self.script('form-sync').MSFormSyncer())
+
+    @property
+    def sheets_manager(self):
+        from src.sheets_manager import GoogleSheetsManager
+        return self._client('sheets_manager', GoogleSheetsManager)
+
+    @property
+    def tronscan_api(self):
+        from src.tronscan_api import TronScanAPI
+        return self._client('tronscan_api', TronScanAPI)
+
+    def set_output(self, name: str, output):
+        with self._lock:
+            self._outputs[name] = output
+
+    def output(self, name: str):
+        """A completed stage's output, from memory or (after --resume) from its saved state"""
+        with self._lock:
+            if name not in self._outputs:
+                self._outputs[name] = self.state.load_output(name)
+            return self._outputs[name]
+
+# Stages
+
+def read_wallets(ctx: PipelineContext) -> List[Dict]:
+    wallet_data = ctx.wallet_syncer.read_wallet_data(ctx.batch_id)
+    if not wallet_data:
+        raise RuntimeError("No wallet data found. Cannot proceed.")
+    return wallet_data
+
+def read_form(ctx: PipelineContext) -> List[Dict]:
+    form_data = ctx.form_syncer.read_form_data(ctx.batch_id)
+    if not form_data:
+        logger.warning("⚠️ No valid form data found")
+    return form_data
+
+def stage_wallet_tab(ctx: PipelineContext) -> int:
+    wallet_data = ctx.output('wallet_read')
+    ctx.wallet_syncer.stage_wallet_tab(ctx.batch_id, wallet_data)
+    return len(wallet_data)
+
+def stage_form_tab(ctx: PipelineContext) -> int:
+    form_data = ctx.output('form_read')
+    if form_data:
+        ctx.form_syncer.stage_ms_form_tab(ctx.batch_id, form_data)
+    return len(form_data)
+
+def assemble_workbook(ctx: PipelineContext) -> str:
+    return str(finalize_batch(ctx.batch_id))
+
+def fetch_usdt(ctx: PipelineContext) -> List[Dict]:
+    addresses = [wallet['address'] for wallet in ctx.output('wallet_read')]
+    date_from, date_to = ctx.settings['date_from'], ctx.settings['date_to']
+    logger.info(f"🔍 Fetching USDT transactions for {len(addresses)} wallets from {date_from} to {date_to}...")
+
+    tronscan_api = ctx.tronscan_api
+    transactions = tronscan_api.get_usdt_for_multiple_addresses(addresses, date_from, date_to)
+    tronscan_api.tx_cache.log_stats()
+    tronscan_api.key_pool.log_stats()
+    if tronscan_api.failed_addresses:
+        # Partial data would show their transfers as exceptions; --resume retries the stage
+        raise RuntimeError(f"{len(tronscan_api.failed_addresses)} wallets failed to fetch")
+    return transactions
+
+def write_sheets(ctx: PipelineContext) -> Dict:
+    """Write the TRONSCAN tab and the exception analysis in one batched_writes() block"""
+    from src.file_sources import batch_ms_form_grid, tronscan_grid
+    from src.reconciliation_state import ReconciliationState
+    from src.sync_cursor import SyncCursorStore
+
+    transactions = ctx.output('usdt_fetch')
+    exception_analysis = ctx.script('exceptions')
+    analyzer = exception_analysis.ExceptionAnalyzer(ctx.sheets_manager)
+    # Batches started before these settings existed keep the analyzer defaults (the CLI's)
+    analyzer.tolerance = ctx.settings.get('tolerance', analyzer.tolerance)
+    analyzer.match_window_hours = ctx.settings.get('match_window_hours', analyzer.match_window_hours)
+    analyzer.form_time_column = ctx.settings.get('form_time_column', analyzer.form_time_column)
+    if analyzer.match_window_hours > 0:
+        analyzer.wallet_addresses = {wallet['wallet_name'].strip().lower(): wallet['address']
+                                     for wallet in ctx.output('wallet_read') if wallet['wallet_name'].strip()}
+
+    # The form and chain tables come straight from the earlier stages, not back from the sheets
+    ms_form_data = analyzer.parse_ms_form_values(batch_ms_form_grid(ctx.output('form_read')), 'MS_FORM')
+    tronscan_data = analyzer.parse_tronscan_values(tronscan_grid(transactions), 'TRONSCAN')
+    exceptions = analyzer.analyze_exceptions(ms_form_data, tronscan_data)
+
+    cursors = SyncCursorStore()
+    cursors.stage(transactions)
+    exception_sheet = ctx.settings['exception_sheet']
+    with ctx.sheets_manager.batched_writes():
+        if transactions:
+            ctx.sheets_manager.write_usdt_transactions_to_sheet(transactions, ctx.settings['tronscan_sheet'])
+        else:
+            logger.warning("⚠️  No USDT transactions to write")
+        logger.info(f"💾 Writing {len(exceptions)} exceptions to {exception_sheet}...")
+        type_counts = analyzer.write_exceptions_to_sheet(exceptions, exception_sheet)
+
+    # Only advance cursors and save the reconciliation state once the sheets hold what they point at
+    cursors.commit()
+    analyzer.save_state(ReconciliationState(), exceptions, exception_sheet, ms_form_data, tronscan_data)
+    return {'tronscan_rows': len(transactions), 'exception_counts': type_counts}
+
+STAGES = [
+    Stage('wallet_read', read_wallets),
+    Stage('form_read', read_form),
+    Stage('wallet_tab', stage_wallet_tab, ['wallet_read']),
+    Stage('form_tab', stage_form_tab, ['form_read']),
+    Stage('workbook', assemble_workbook, ['wallet_tab', 'form_tab']),
+    Stage('usdt_fetch', fetch_usdt, ['wallet_read']),
+    Stage('sheets', write_sheets, ['wallet_read', 'form_read', 'usdt_fetch'])
+]
+
+def _timed(stage: Stage, ctx: PipelineContext):
+    started = time.perf_counter()
+    output = stage.func(ctx)
+    return output, time.perf_counter() - started
+
+def run_pipeline(ctx: PipelineContext, stages: List[Stage] = STAGES, max_workers: int = 4) -> Dict[str, float]:
+    """Run every stage not completed yet, each as soon as its dependencies are done
+
+    Returns {stage: seconds} for the stages run. On a failure no new stages start, the running
+    ones finish (and are recorded), and the first error is raised.
+    """
+    done = set(ctx.state.completed)
+    pending = [stage for stage in stages if stage.name not in done]
+    for name in done:
+        logger.info(f"⏭️  {name}: completed in an earlier run")
+
+    timings = {}
+    running = {}
+    error = None
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            if error is None:
+                for stage in [s for s in pending if all(dep in done for dep in s.deps)]:
+                    logger.info(f"▶️  {stage.name}")
+                    running[pool.submit(_timed, stage, ctx)] = stage
+                    pending.remove(stage)
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                try:
+                    output, seconds = future.result()
+                except Exception as e:
+                    logger.error(f"❌ {stage.name} failed: {e}")
+                    error = error or e
+                    continue
+                ctx.set_output(stage.name, output)
+                ctx.state.complete(stage.name, seconds, output)
+                timings[stage.name] = seconds
+                done.add(stage.name)
+                logger.info(f"✅ {stage.name}: {seconds:,.1f}s")
+
+    if error is not None:
+        raise error
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the whole batch (wallet sync, form sync, USDT fetch, exceptions) in one process')
+    parser.add_argument('--date_from', help='Start date for the USDT fetch (YYYY-MM-DD)')
+    parser.add_argument('--date_to', help='End date for the USDT fetch (YYYY-MM-DD)')
+    parser.add_argument('--tronscan_sheet', default='TRONSCAN', help='Target sheet name for USDT transactions')
+    parser.add_argument('--exception_sheet', default='EXCEPTION', help='Exception output sheet name')
+    # Same classification settings (and defaults) as scripts/exception_analysis.py, so both share reusable state
+    parser.add_argument('--tolerance', type=float, default=0.01, help='Amount tolerance for matching')
+    parser.add_argument('--match_window_hours', type=float, default=48,
+                        help='Time window for matching unmatched rows on wallet + amount (0 disables)')
+    parser.add_argument('--form_time_column', default='Timestamp', help='MS_FORM column holding the transfer time')
+    parser.add_argument('--resume', action='store_true', help='Continue a batch, skipping its completed stages')
+    parser.add_argument('--batch_id', help='Batch to resume (default: the one in current_batch.txt)')
+    parser.add_argument('--max_workers', type=int, default=4, help='Stages run concurrently at most')
+
+    args = parser.parse_args()
+
+    wallet_sync = load_command('wallet-sync')
+
+    if args.resume:
+        batch_id = args.batch_id or wallet_sync.get_current_batch()
+        if not batch_id:
+            parser.error('--resume needs --batch_id or a current_batch.txt')
+        state = PipelineState(batch_id)
+        if not state.data['settings']:
+            parser.error(f"No pipeline state for batch {batch_id} in {state.directory}")
+        # A resumed batch keeps the settings its completed stages ran with
+        settings = state.data['settings']
+    else:
+        if not args.date_from or not args.date_to:
+            parser.error('--date_from and --date_to are required (unless --resume)')
+        if not validate_date_format(args.date_from) or not validate_date_format(args.date_to):
+            parser.error('Invalid date format. Use YYYY-MM-DD')
+        if datetime.strptime(args.date_from, '%Y-%m-%d') >= datetime.strptime(args.date_to, '%Y-%m-%d'):
+            parser.error('date_from must be earlier than date_to')
+
+        # Same GMT+7 batch ID format as 01_sync_wallet.py
+        batch_id = datetime.now(pytz.timezone('Asia/Bangkok')).strftime('%Y%m%d%H%M%S')
+        state = PipelineState(batch_id)
+        state.data['settings'] = settings = {
+            'date_from': args.date_from,
+            'date_to': args.date_to,
+            'tronscan_sheet': args.tronscan_sheet,
+            'exception_sheet': args.exception_sheet,
+            'tolerance': args.tolerance,
+            'match_window_hours': args.match_window_hours,
+            'form_time_column': args.form_time_column
+        }
+        state.save()
+
+    # The standalone steps (02_sync_ms_form.py, ...) keep working on this batch
+    wallet_sync.set_current_batch(batch_id)
+
+    logger.info(f"🚀 Pipeline for batch {batch_id} ({settings['date_from']} to {settings['date_to']})")
+    logger.info("="*60)
+
+    ctx = PipelineContext(batch_id, settings, state)
+    started = time.perf_counter()
+    try:
+        run_pipeline(ctx, max_workers=args.max_workers)
+    except Exception as e:
+        logger.error(f"❌ Pipeline failed: {e}")
+        logger.error(f"Fix the cause and rerun with: python pipeline.py --resume --batch_id {batch_id}")
+        sys.exit(1)
+
+    # Final summary
+    logger.info("="*60)
+    logger.info(f"🎉 Pipeline completed in {time.perf_counter() - started:,.1f}s")
+    logger.info("⏱️  Stage timings:")
+    for stage in STAGES:
+        logger.info(f"  {stage.name:<16} {state.completed[stage.name]['seconds']:>8,.1f}s")
+
+    type_counts = ctx.output('sheets')['exception_counts']
+    logger.info(f"  ⚠️  Exceptions: {', '.join(f'{exc_type} {count}' for exc_type, count in type_counts.items())}")
+
+    # Output for pipeline automation
+    print(f"BATCH_ID={batch_id}")
+    print(f"EXCEL_FILE={ctx.output('workbook')}")
+
+if __name__ == "__main__":
+    main()
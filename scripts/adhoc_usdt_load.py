@@ -84,8 +84,9 @@ def main():
                     ]
                     rows_to_append.append(row)
                 
-                # Append rows
-                worksheet.append_rows(rows_to_append)
+                # Append rows through the quota-aware write queue
+                sheets_manager.write_queue.append_rows(worksheet, rows_to_append)
+                sheets_manager.flush_writes()
                 logger.info(f"✅ Appended {len(rows_to_append)} USDT transactions")
                 
             except Exception as e:
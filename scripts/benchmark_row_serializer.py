@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark sheet row serialization: the schema-driven RowSerializer vs the previous pandas path
+Usage: python scripts/benchmark_row_serializer.py --rows 100000 --repeat 3
+"""
+
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+from pathlib import Path
+from typing import List, Dict, Callable
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.row_serializer import TRANSACTION_SERIALIZER
+from src.utils import setup_logging
+
+logger = setup_logging()
+
+def make_transactions(count: int) -> List[Dict]:
+    """Synthetic transactions shaped like the TronScan records (some fields missing, like the real ones)"""
+    rng = random.Random(42)
+    transactions = []
+    for i in range(count):
+        tx = {
+            'hash': f"{rng.getrandbits(256):064x}",
+            'block_number': 60_000_000 + i,
+            'timestamp': 1_720_000_000_000 + i * 3000,
+            'from_address': f"T{rng.getrandbits(160):040x}"[:34],
+            'to_address': f"T{rng.getrandbits(160):040x}"[:34],
+            'amount_raw': str(rng.randint(1, 10**12)),
+            'amount_formatted': round(rng.uniform(0, 10**6), 6),
+            'amount_usdt': round(rng.uniform(0, 10**6), 2),
+            'token_price_usdt': 1.0,
+            'token_name': 'Tether USD',
+            'token_symbol': 'USDT',
+            'contract_address': 'TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t',
+            'transfer_type': rng.choice(['IN', 'OUT']),
+            'status': 'SUCCESS',
+            'address_queried': f"T{rng.getrandbits(160):040x}"[:34]
+        }
+        if i % 3:
+            tx['fee'] = rng.randint(0, 30) * 1_000_000
+        transactions.append(tx)
+    return transactions
+
+def pandas_rows(transactions: List[Dict]) -> List[List[str]]:
+    """The DataFrame-based flattening sheets_manager used before RowSerializer"""
+    import pandas as pd
+
+    columns = list(TRANSACTION_SERIALIZER.columns)
+    df = pd.DataFrame(transactions)
+    for col in columns:
+        if col not in df.columns:
+            df[col] = ''
+    df = df[columns]
+    return [[str(cell) if cell is not None else '' for cell in row] for row in df.values.tolist()]
+
+def serializer_rows(transactions: List[Dict]) -> List[List[str]]:
+    return TRANSACTION_SERIALIZER.rows(transactions)
+
+def measure(name: str, func: Callable, transactions: List[Dict], repeat: int) -> Dict:
+    """Best wall time over repeat runs, plus peak traced memory of one run"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(transactions)
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    func(transactions)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'name': name, 'seconds': best, 'rows_per_second': len(transactions) / best, 'peak_mb': peak / 2**20}
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sheet row serialization')
+    parser.add_argument('--rows', type=int, default=100000, help='Number of synthetic transactions')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per implementation (best is reported)')
+
+    args = parser.parse_args()
+
+    transactions = make_transactions(args.rows)
+    logger.info(f"📊 Serializing {args.rows:,} transactions x {len(TRANSACTION_SERIALIZER.columns)} columns")
+
+    implementations = [('RowSerializer', serializer_rows)]
+    try:
+        import pandas  # noqa: F401
+        implementations.insert(0, ('pandas DataFrame', pandas_rows))
+    except ImportError:
+        logger.warning("pandas is not installed, benchmarking RowSerializer only")
+
+    results = [measure(name, func, transactions, args.repeat) for name, func in implementations]
+
+    logger.info("=" * 72)
+    for result in results:
+        logger.info(f"{result['name']:<18} {result['seconds']:8.3f}s  {result['rows_per_second']:>12,.0f} rows/s  "
+                    f"{result['peak_mb']:8.1f} MB peak")
+    if len(results) == 2:
+        before, after = results
+        logger.info(f"Speedup: {before['seconds'] / after['seconds']:.1f}x, "
+                    f"peak memory: {after['peak_mb'] / before['peak_mb']:.0%} of pandas")
+    logger.info("=" * 72)
+
+if __name__ == "__main__":
+    main()
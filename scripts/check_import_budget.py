@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Check the startup import cost of each cli.py command against its budget using python -X importtime
+Usage: python scripts/check_import_budget.py [--command hash-check] [--top 5]
+
+Each command is loaded in a fresh interpreter (imports only, main() is not run). Exits with 1
+when a command goes over its budget, so it can run in CI or before deploying the n8n steps.
+"""
+
+import os
+import re
+import sys
+import argparse
+import subprocess
+from pathlib import Path
+from typing import List, Tuple
+
+ROOT = Path(__file__).parent.parent
+
+# Milliseconds of imports each command may spend before doing any work.
+# 'cli' is the bare entry point (python cli.py --help).
+IMPORT_BUDGETS_MS = {
+    'cli': 30,
+    'hash-check': 90,
+    'exceptions': 180,
+    'adhoc-load': 180,
+    'historical-load': 180,
+    'wallet-sync': 180,
+    'form-sync': 180,
+    'pipeline': 180
+}
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+def measure(command: str) -> Tuple[float, List[Tuple[str, float]]]:
+    """Total import milliseconds for a command and its top-level imports by cumulative time"""
+    code = 'import cli' if command == 'cli' else f'import cli; cli.load_command({command!r})'
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Loading {command} failed:\n{result.stderr[-2000:]}")
+
+    total_us = 0
+    top_level = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = int(match.group(1)), int(match.group(2)), match.group(3), match.group(4)
+        total_us += self_us
+        # -X importtime indents nested imports by two spaces per level
+        if len(indent) == 1:
+            top_level.append((name, cumulative_us / 1000))
+
+    return total_us / 1000, sorted(top_level, key=lambda item: item[1], reverse=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='Check cli.py command import times against their budgets')
+    parser.add_argument('--command', action='append', choices=list(IMPORT_BUDGETS_MS),
+                        help='Command to check (repeatable, default: all)')
+    parser.add_argument('--top', type=int, default=5, help='Heaviest top-level imports to show per command')
+
+    args = parser.parse_args()
+
+    over_budget = []
+    for command in args.command or list(IMPORT_BUDGETS_MS):
+        total_ms, top_level = measure(command)
+        budget_ms = IMPORT_BUDGETS_MS[command]
+        status = 'OK  ' if total_ms <= budget_ms else 'OVER'
+        heaviest = ', '.join(f"{name} {ms:.0f}ms" for name, ms in top_level[:args.top])
+        print(f"{status} {command:<16} {total_ms:7.1f}ms / {budget_ms}ms  ({heaviest})")
+        if total_ms > budget_ms:
+            over_budget.append(command)
+
+    if over_budget:
+        print(f"\n❌ Over import budget: {', '.join(over_budget)}")
+        sys.exit(1)
+    print("\n✅ All commands within their import budgets")
+
+if __name__ == "__main__":
+    main()
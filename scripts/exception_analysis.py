@@ -2,37 +2,130 @@
 """
 Exception Analysis Script - Compare MS_FORM vs TRONSCAN tabs
 Usage: python scripts/exception_analysis.py
+       python scripts/exception_analysis.py --ms_form_xlsx processed/20250729114059.xlsx \
+           --tronscan_csv "usdt_transactions_*.csv" --output_csv exceptions.csv   (fully local)
 """
 
 import sys
+import json
 import argparse
+from collections import Counter
 from pathlib import Path
-from typing import List, Dict, Set, Tuple
+from typing import List, Dict, Set, Tuple, Optional
 from datetime import datetime
+import pytz
 
 # Add src to path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from src.sheets_manager import GoogleSheetsManager
-from src.utils import setup_logging
+from src.reconciliation import (ReconciliationResult, ReconciliationSide, reconcile, EXCEPTION_TYPES,
+                                IN_FORM_NOT_TRONSCAN, IN_TRONSCAN_NOT_FORM, MATCHED_BY_WALLET, MATCHED)
+from src.reconciliation_state import ReconciliationState, fingerprint
+from src.file_sources import read_batch_ms_form, read_batch_wallets, read_tronscan_csv, write_csv
+from src.utils import setup_logging, validate_address
 
 logger = setup_logging()
 
+# Reconciliation state type for a form hash folded into another hash's MATCHED_BY_WALLET row
+FOLDED = 'FOLDED'
+RESIDUE_TYPES = {EXCEPTION_TYPES[IN_FORM_NOT_TRONSCAN], EXCEPTION_TYPES[IN_TRONSCAN_NOT_FORM],
+                 EXCEPTION_TYPES[MATCHED_BY_WALLET], FOLDED}
+MATCH_TYPES = {EXCEPTION_TYPES[MATCHED_BY_WALLET], EXCEPTION_TYPES[MATCHED]}
+
 class ExceptionAnalyzer:
     """Analyze exceptions between MS_FORM and TRONSCAN data"""
     
-    def __init__(self, sheets_manager: GoogleSheetsManager):
+    def __init__(self, sheets_manager: Optional[GoogleSheetsManager]):
         self.sheets_manager = sheets_manager
         self.tolerance = 0.01  # Amount tolerance for matching (1 cent)
+        self.match_window_hours = 48  # Time window for matching unmatched rows on wallet + amount (0 disables)
+        self.form_timezone = pytz.timezone('Asia/Bangkok')  # Form timestamps are local time
+        self.form_time_column = 'Timestamp'  # MS_FORM header holding the transfer time (any case)
+        self.wallet_addresses = {}  # Wallet name (lowercase) -> Tron address, from WALLET_LIST
+    
+    def read_wallet_addresses(self, sheet_name: str = "WALLET_LIST") -> Dict[str, str]:
+        """Read WALLET_LIST and return {wallet name (lowercase): address}"""
+        try:
+            all_values = self.sheets_manager.read_worksheet_values(sheet_name)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read {sheet_name}, form wallets must be addresses to be matched: {e}")
+            return {}
+        
+        return self.parse_wallet_values(all_values, sheet_name)
+    
+    def parse_wallet_values(self, all_values: List[List[str]], sheet_name: str) -> Dict[str, str]:
+        """{wallet name (lowercase): address} from WALLET_LIST-style values (Wallet Name ... Address)"""
+        if not all_values:
+            return {}
+        
+        headers = [h.strip().lower() for h in all_values[0]]
+        name_col = next((i for i, h in enumerate(headers) if 'name' in h), 0)
+        address_col = next((i for i, h in enumerate(headers) if 'address' in h), 2)
+        
+        wallet_addresses = {}
+        for row in all_values[1:]:
+            if len(row) > max(name_col, address_col) and validate_address(row[address_col].strip()):
+                wallet_addresses[row[name_col].strip().lower()] = row[address_col].strip()
+        
+        logger.info(f"✅ Found {len(wallet_addresses)} wallet addresses in {sheet_name}")
+        return wallet_addresses
+    
+    def _resolve_wallet(self, value: str) -> str:
+        """Tron address for a form's wallet cell (an address, or a wallet name from WALLET_LIST)"""
+        value = value.strip()
+        if validate_address(value):
+            return value
+        return self.wallet_addresses.get(value.lower(), '')
+    
+    def _parse_form_time(self, value: str) -> int:
+        """Millisecond timestamp for a form date/time cell, 0 when it can't be parsed"""
+        value = value.strip()
+        for fmt in ('%m/%d/%Y %H:%M:%S', '%m/%d/%Y %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S',
+                    '%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y'):
+            try:
+                parsed = datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+            return int(self.form_timezone.localize(parsed).timestamp() * 1000)
+        return 0
     
     def read_ms_form_data(self, sheet_name: str = "MS_FORM") -> Dict[str, Dict]:
         """Read MS_FORM data and return dict keyed by TrxHash"""
         try:
             logger.info(f"📖 Reading data from {sheet_name}...")
             
-            worksheet = self.sheets_manager.workbook.worksheet(sheet_name)
-            all_values = worksheet.get_all_values()
+            all_values = self.sheets_manager.read_worksheet_values(sheet_name)
+            return self.parse_ms_form_values(all_values, sheet_name)
             
+        except Exception as e:
+            logger.error(f"Failed to read {sheet_name}: {e}")
+            return {}
+    
+    def _find_time_column(self, headers: List[str], sheet_name: str) -> Optional[int]:
+        """Index of the MS_FORM transfer time column: the configured header, else the first date/time header
+
+        Forms also carry times that aren't the transfer's (Start time, Completion time, Sync_Date),
+        so the fallback skips sync columns and the picked column is logged.
+        """
+        configured = self.form_time_column.strip().lower()
+        if configured in headers:
+            time_col = headers.index(configured)
+            logger.info(f"🕒 Using {sheet_name} column '{headers[time_col]}' for form times")
+            return time_col
+        
+        time_col = next((i for i, h in enumerate(headers)
+                         if ('date' in h or 'time' in h) and 'hash' not in h and 'sync' not in h), None)
+        if time_col is None:
+            logger.warning(f"⚠️ No time column in {sheet_name}, wallet + amount matching is disabled for its rows")
+        else:
+            logger.warning(f"⚠️ No '{configured}' column in {sheet_name}, using '{headers[time_col]}' "
+                           f"for form times (set --form_time_column to choose another)")
+        return time_col
+    
+    def parse_ms_form_values(self, all_values: List[List[str]], sheet_name: str = "MS_FORM") -> Dict[str, Dict]:
+        """MS_FORM records keyed by TrxHash from a 2D grid of cell strings (header row first)"""
+        try:
             if not all_values:
                 logger.warning(f"No data found in {sheet_name}")
                 return {}
@@ -50,6 +143,10 @@ class ExceptionAnalyzer:
                 if 'amount' in header or 'usdt' in header:
                     amount_col = i
             
+            # Optional columns for the secondary wallet/amount/time matching
+            wallet_col = next((i for i, h in enumerate(headers) if 'wallet' in h and 'hash' not in h), None)
+            time_col = self._find_time_column(headers, sheet_name)
+            
             if hash_col is None:
                 logger.error(f"Could not find TrxHash column in {sheet_name}")
                 logger.info(f"Available headers: {headers}")
@@ -73,6 +170,8 @@ class ExceptionAnalyzer:
                     ms_form_data[tx_hash] = {
                         'hash': tx_hash,
                         'amount': amount,
+                        'wallet': self._resolve_wallet(row[wallet_col]) if wallet_col is not None and len(row) > wallet_col else '',
+                        'timestamp': self._parse_form_time(row[time_col]) if time_col is not None and len(row) > time_col else 0,
                         'row_number': row_idx,
                         'raw_row': row
                     }
@@ -89,9 +188,16 @@ class ExceptionAnalyzer:
         try:
             logger.info(f"📖 Reading data from {sheet_name}...")
             
-            worksheet = self.sheets_manager.workbook.worksheet(sheet_name)
-            all_values = worksheet.get_all_values()
+            all_values = self.sheets_manager.read_worksheet_values(sheet_name)
+            return self.parse_tronscan_values(all_values, sheet_name)
             
+        except Exception as e:
+            logger.error(f"Failed to read {sheet_name}: {e}")
+            return {}
+    
+    def parse_tronscan_values(self, all_values: List[List[str]], sheet_name: str = "TRONSCAN") -> Dict[str, Dict]:
+        """TRONSCAN records keyed by HASH from a 2D grid of cell strings (HASH, WALLET, AMT, TIMESTAMP)"""
+        try:
             if not all_values:
                 logger.warning(f"No data found in {sheet_name}")
                 return {}
@@ -99,10 +205,11 @@ class ExceptionAnalyzer:
             headers = [h.strip().lower() for h in all_values[0]]
             data_rows = all_values[1:]
             
-            # Find required columns (HASH, WALLET, AMT)
+            # Find required columns (HASH, WALLET, AMT; TIMESTAMP when present)
             hash_col = None
             wallet_col = None
             amt_col = None
+            timestamp_col = None
             
             for i, header in enumerate(headers):
                 if header == 'hash':
@@ -111,6 +218,8 @@ class ExceptionAnalyzer:
                     wallet_col = i
                 elif header == 'amt':
                     amt_col = i
+                elif header == 'timestamp':
+                    timestamp_col = i
             
             if hash_col is None or amt_col is None:
                 logger.error(f"Could not find required columns in {sheet_name}")
@@ -139,10 +248,15 @@ class ExceptionAnalyzer:
                         except:
                             amount = 0.0
                     
+                    timestamp = 0
+                    if timestamp_col is not None and len(row) > timestamp_col and row[timestamp_col].strip().isdigit():
+                        timestamp = int(row[timestamp_col])
+                    
                     tronscan_data[tx_hash] = {
                         'hash': tx_hash,
                         'wallet': wallet,
                         'amount': amount,
+                        'timestamp': timestamp,
                         'row_number': row_idx,
                         'raw_row': row
                     }
@@ -154,168 +268,61 @@ class ExceptionAnalyzer:
             logger.error(f"Failed to read {sheet_name}: {e}")
             return {}
     
-    def analyze_exceptions(self, ms_form_data: Dict, tronscan_data: Dict) -> List[Dict]:
-        """Analyze and categorize all exceptions"""
-        exceptions = []
+    def analyze_exceptions(self, ms_form_data: Dict, tronscan_data: Dict) -> ReconciliationResult:
+        """Analyze and categorize all exceptions (vectorized outer join on the hash)
         
-        # Get all unique hashes
-        all_hashes = set(ms_form_data.keys()) | set(tronscan_data.keys())
+        Rows left unmatched on both sides are then paired on wallet, amount and time
+        (MATCHED_BY_WALLET), which catches form entries whose hash is malformed.
+        """
+        return reconcile(
+            ReconciliationSide.from_records(ms_form_data),
+            ReconciliationSide.from_records(tronscan_data),
+            self.tolerance,
+            match_window_ms=int(self.match_window_hours * 3600 * 1000)
+        )
+    
+    headers = [
+        'HASH',
+        'EXCEPTION_TYPE', 
+        'MS_FORM_AMOUNT',
+        'TRONSCAN_AMOUNT',
+        'DIFFERENCE',
+        'TRONSCAN_WALLET',
+        'MS_FORM_ROW',
+        'TRONSCAN_ROW',
+        'SEVERITY',
+        'NOTES'
+    ]
+    
+    def _summary_rows(self, type_counts: Dict[str, int], total_difference: float) -> List[List]:
+        """Summary block written below the exception rows"""
+        summary_rows = [
+            [''], ['=== SUMMARY ==='], ['']
+        ]
         
-        for tx_hash in all_hashes:
-            in_ms_form = tx_hash in ms_form_data
-            in_tronscan = tx_hash in tronscan_data
-            
-            if in_ms_form and in_tronscan:
-                # Both exist - check amounts
-                ms_amount = ms_form_data[tx_hash]['amount']
-                ts_amount = tronscan_data[tx_hash]['amount']
-                
-                if abs(ms_amount - ts_amount) <= self.tolerance:
-                    # Amounts match
-                    exception = {
-                        'hash': tx_hash,
-                        'exception_type': 'MATCHED',
-                        'ms_form_amount': ms_amount,
-                        'tronscan_amount': ts_amount,
-                        'difference': 0.0,
-                        'tronscan_wallet': tronscan_data[tx_hash]['wallet'],
-                        'ms_form_row': ms_form_data[tx_hash]['row_number'],
-                        'tronscan_row': tronscan_data[tx_hash]['row_number']
-                    }
-                else:
-                    # Amounts differ
-                    exception = {
-                        'hash': tx_hash,
-                        'exception_type': 'AMOUNT_DIFFERENT',
-                        'ms_form_amount': ms_amount,
-                        'tronscan_amount': ts_amount,
-                        'difference': abs(ms_amount - ts_amount),
-                        'tronscan_wallet': tronscan_data[tx_hash]['wallet'],
-                        'ms_form_row': ms_form_data[tx_hash]['row_number'],
-                        'tronscan_row': tronscan_data[tx_hash]['row_number']
-                    }
-                
-            elif in_ms_form and not in_tronscan:
-                # Only in MS_FORM
-                exception = {
-                    'hash': tx_hash,
-                    'exception_type': 'IN_FORM_NOT_TRONSCAN',
-                    'ms_form_amount': ms_form_data[tx_hash]['amount'],
-                    'tronscan_amount': 0.0,
-                    'difference': ms_form_data[tx_hash]['amount'],
-                    'tronscan_wallet': '',
-                    'ms_form_row': ms_form_data[tx_hash]['row_number'],
-                    'tronscan_row': 'N/A'
-                }
-                
-            elif not in_ms_form and in_tronscan:
-                # Only in TRONSCAN
-                exception = {
-                    'hash': tx_hash,
-                    'exception_type': 'IN_TRONSCAN_NOT_FORM',
-                    'ms_form_amount': 0.0,
-                    'tronscan_amount': tronscan_data[tx_hash]['amount'],
-                    'difference': tronscan_data[tx_hash]['amount'],
-                    'tronscan_wallet': tronscan_data[tx_hash]['wallet'],
-                    'ms_form_row': 'N/A',
-                    'tronscan_row': tronscan_data[tx_hash]['row_number']
-                }
-            
-            exceptions.append(exception)
+        # Count by exception type
+        for exc_type, count in type_counts.items():
+            summary_rows.append([exc_type, count])
         
-        return exceptions
+        summary_rows.extend([
+            [''],
+            ['TOTAL_DIFFERENCE_AMOUNT', total_difference],
+            ['ANALYSIS_TIMESTAMP', str(datetime.now())]
+        ])
+        return summary_rows
     
-    def write_exceptions_to_sheet(self, exceptions: List[Dict], sheet_name: str = "EXCEPTION"):
+    def write_exceptions_to_sheet(self, exceptions: ReconciliationResult, sheet_name: str = "EXCEPTION"):
         """Write exception analysis to Google Sheet"""
         try:
-            # Try to get existing worksheet or create new one
-            try:
-                worksheet = self.sheets_manager.workbook.worksheet(sheet_name)
-                logger.info(f"Using existing worksheet: {sheet_name}")
-            except:
-                worksheet = self.sheets_manager.workbook.add_worksheet(title=sheet_name, rows=1000, cols=15)
-                logger.info(f"Created new worksheet: {sheet_name}")
-            
-            # Clear existing data
-            worksheet.clear()
-            
-            # Write headers
-            headers = [
-                'HASH',
-                'EXCEPTION_TYPE', 
-                'MS_FORM_AMOUNT',
-                'TRONSCAN_AMOUNT',
-                'DIFFERENCE',
-                'TRONSCAN_WALLET',
-                'MS_FORM_ROW',
-                'TRONSCAN_ROW',
-                'SEVERITY',
-                'NOTES'
-            ]
-            worksheet.append_row(headers)
-            
-            # Sort exceptions by type for better organization
-            type_order = {
-                'AMOUNT_DIFFERENT': 1,
-                'IN_FORM_NOT_TRONSCAN': 2, 
-                'IN_TRONSCAN_NOT_FORM': 3,
-                'MATCHED': 4
-            }
-            
-            exceptions.sort(key=lambda x: (type_order.get(x['exception_type'], 5), -x['difference']))
-            
-            # Write exception data
-            rows_to_write = []
-            for exc in exceptions:
-                # Determine severity
-                severity = self._get_severity(exc)
-                notes = self._get_notes(exc)
-                
-                row = [
-                    exc['hash'],
-                    exc['exception_type'],
-                    exc['ms_form_amount'],
-                    exc['tronscan_amount'],
-                    exc['difference'],
-                    exc['tronscan_wallet'],
-                    exc['ms_form_row'],
-                    exc['tronscan_row'],
-                    severity,
-                    notes
-                ]
-                rows_to_write.append(row)
-            
-            # Write in batches
-            batch_size = 100
-            for i in range(0, len(rows_to_write), batch_size):
-                batch = rows_to_write[i:i+batch_size]
-                worksheet.append_rows(batch)
-                logger.info(f"Written batch {i//batch_size + 1}")
+            # Headers, exception rows and the summary are built as one grid and written in one update.
+            # Rows come out of the reconciliation already sorted by type and largest difference
+            rows_to_write = [self.headers] + exceptions.to_rows()
             
             # Add summary at the bottom
-            summary_rows = [
-                [''], ['=== SUMMARY ==='], ['']
-            ]
-            
-            # Count by exception type
-            type_counts = {}
-            total_diff = 0
-            for exc in exceptions:
-                exc_type = exc['exception_type']
-                type_counts[exc_type] = type_counts.get(exc_type, 0) + 1
-                if exc_type != 'MATCHED':
-                    total_diff += exc['difference']
-            
-            for exc_type, count in type_counts.items():
-                summary_rows.append([exc_type, count])
+            type_counts = exceptions.type_counts()
+            summary_rows = self._summary_rows(type_counts, exceptions.total_difference())
             
-            summary_rows.extend([
-                [''],
-                ['TOTAL_DIFFERENCE_AMOUNT', total_diff],
-                ['ANALYSIS_TIMESTAMP', str(datetime.now())]
-            ])
-            
-            worksheet.append_rows(summary_rows)
+            self.sheets_manager.write_grid(sheet_name, rows_to_write + summary_rows, rows=1000, cols=15)
             
             logger.info(f"✅ Exception analysis written to {sheet_name}")
             return type_counts
@@ -324,40 +331,142 @@ class ExceptionAnalyzer:
             logger.error(f"Failed to write exceptions to {sheet_name}: {e}")
             raise
     
-    def _get_severity(self, exception: Dict) -> str:
-        """Determine severity level of exception"""
-        exc_type = exception['exception_type']
-        difference = exception['difference']
-        
-        if exc_type == 'MATCHED':
-            return 'OK'
-        elif exc_type == 'AMOUNT_DIFFERENT':
-            if difference < 1:
-                return 'LOW'
-            elif difference < 100:
-                return 'MEDIUM'
-            else:
-                return 'HIGH'
-        else:  # Missing transactions
-            if difference < 100:
-                return 'MEDIUM'
-            else:
-                return 'HIGH'
+    def write_exceptions_to_csv(self, exceptions: ReconciliationResult, path: str) -> Dict[str, int]:
+        """Write the exception rows to a local CSV (no summary block, that's derivable from the rows)"""
+        write_csv(path, exceptions.to_rows(), self.headers)
+        logger.info(f"✅ Exception analysis written to {path}")
+        return exceptions.type_counts()
     
-    def _get_notes(self, exception: Dict) -> str:
-        """Generate notes for exception"""
-        exc_type = exception['exception_type']
-        
-        if exc_type == 'MATCHED':
-            return 'Perfect match'
-        elif exc_type == 'AMOUNT_DIFFERENT':
-            return f'Amount differs by ${exception["difference"]:.2f}'
-        elif exc_type == 'IN_FORM_NOT_TRONSCAN':
-            return 'Transaction recorded in form but not found in blockchain'
-        elif exc_type == 'IN_TRONSCAN_NOT_FORM':
-            return 'Blockchain transaction not recorded in form'
-        else:
-            return ''
+    def _state_scope(self, sheet_name: str) -> str:
+        return f"{self.sheets_manager.sheet_id}/{sheet_name}"
+    
+    def _state_settings(self) -> str:
+        """Settings that change classifications; stored state from other settings isn't reused"""
+        return json.dumps({'tolerance': self.tolerance, 'match_window_hours': self.match_window_hours,
+                           'form_time_column': self.form_time_column.strip().lower()})
+    
+    def _state_entries(self, result: ReconciliationResult, rows: List[List], sheet_rows: List[int],
+                       ms_form_data: Dict, tronscan_data: Dict) -> List[tuple]:
+        """State entries for a result's rows, plus the form hashes folded into wallet matches"""
+        entries = [
+            (tx_hash, fingerprint(ms_form_data.get(tx_hash)), fingerprint(tronscan_data.get(tx_hash)),
+             EXCEPTION_TYPES[type_code], float(difference), sheet_row, row)
+            for tx_hash, type_code, difference, sheet_row, row
+            in zip(result.hashes.tolist(), result.type_codes, result.differences, sheet_rows, rows)
+        ]
+        for form_hash in result.form_hashes[result.form_hashes != ''].tolist():
+            entries.append((form_hash, fingerprint(ms_form_data.get(form_hash)), fingerprint(tronscan_data.get(form_hash)),
+                            FOLDED, 0.0, None, None))
+        return entries
+    
+    def save_state(self, state: ReconciliationState, exceptions: ReconciliationResult, sheet_name: str,
+                   ms_form_data: Dict, tronscan_data: Dict):
+        """Record a full run (sorted rows from row 2, summary right below) as the incremental baseline"""
+        rows = exceptions.to_rows()
+        summary_start = len(rows) + 2
+        entries = self._state_entries(exceptions, rows, list(range(2, summary_start)), ms_form_data, tronscan_data)
+        summary_rows = len(self._summary_rows(exceptions.type_counts(), 0.0))
+        
+        state.save(self._state_scope(sheet_name), entries, [], {
+            'settings': self._state_settings(), 'next_row': summary_start,
+            'summary_start': summary_start, 'summary_rows': summary_rows
+        }, replace=True)
+    
+    def reconcile_incremental(self, state: ReconciliationState, ms_form_data: Dict, tronscan_data: Dict,
+                              sheet_name: str = "EXCEPTION") -> Optional[Dict[str, int]]:
+        """Re-evaluate only hashes whose inputs changed since the last run and rewrite only their rows
+        
+        Unchanged rows keep their place in the tab, new rows fill rows freed in this run and then
+        go below the last one, and the summary block moves below them. Returns the type counts,
+        or None when there is no usable state (the caller then runs a full reconciliation).
+        """
+        scope = self._state_scope(sheet_name)
+        run = state.get_run(scope)
+        if run is None or run['settings'] != self._state_settings():
+            logger.info("📌 No reconciliation state for these settings yet, running a full reconciliation")
+            return None
+        
+        stored = state.load(scope)
+        current = ms_form_data.keys() | tronscan_data.keys()
+        dirty = {
+            tx_hash for tx_hash in current
+            if tx_hash not in stored
+            or stored[tx_hash]['ms_form'] != fingerprint(ms_form_data.get(tx_hash))
+            or stored[tx_hash]['tronscan'] != fingerprint(tronscan_data.get(tx_hash))
+        }
+        removed = [tx_hash for tx_hash in stored if tx_hash not in current]
+        
+        # Wallet matching pairs rows across the whole residue, so the residue is always revisited
+        if self.match_window_hours > 0:
+            dirty |= {tx_hash for tx_hash, entry in stored.items() if entry['type'] in RESIDUE_TYPES and tx_hash in current}
+        
+        logger.info(f"📌 Incremental reconciliation: {len(dirty)} of {len(current)} hashes to re-evaluate, "
+                    f"{len(removed)} removed")
+        
+        result = self.analyze_exceptions(
+            {tx_hash: ms_form_data[tx_hash] for tx_hash in dirty if tx_hash in ms_form_data},
+            {tx_hash: tronscan_data[tx_hash] for tx_hash in dirty if tx_hash in tronscan_data}
+        )
+        rows = result.to_rows()
+        blank = [''] * len(self.headers)
+        changes = {}
+        
+        # Rows of hashes that are gone or no longer get a row of their own are blanked and reused
+        output_hashes = set(result.hashes.tolist())
+        freed = []
+        for tx_hash in list(dirty) + removed:
+            entry = stored.get(tx_hash)
+            if entry and entry['sheet_row'] and tx_hash not in output_hashes:
+                changes[entry['sheet_row']] = blank
+                freed.append(entry['sheet_row'])
+        freed.sort(reverse=True)
+        
+        next_row = run['next_row']
+        sheet_rows = []
+        for tx_hash, row in zip(result.hashes.tolist(), rows):
+            entry = stored.get(tx_hash)
+            if entry and entry['sheet_row']:
+                sheet_row = entry['sheet_row']
+                if entry['row'] != row:
+                    changes[sheet_row] = row
+            else:
+                if freed:
+                    sheet_row = freed.pop()
+                else:
+                    sheet_row, next_row = next_row, next_row + 1
+                changes[sheet_row] = row
+            sheet_rows.append(sheet_row)
+        
+        entries = self._state_entries(result, rows, sheet_rows, ms_form_data, tronscan_data)
+        
+        # Totals over the whole tab: stored rows with this run's changes applied
+        totals = {tx_hash: (entry['type'], entry['row'][4] if entry['row'] else 0.0)
+                  for tx_hash, entry in stored.items() if entry['sheet_row']}
+        for tx_hash in list(dirty) + removed:
+            totals.pop(tx_hash, None)
+        for tx_hash, _, _, exc_type, difference, sheet_row, _ in entries:
+            if sheet_row:
+                totals[tx_hash] = (exc_type, difference)
+        
+        counts = Counter(exc_type for exc_type, _ in totals.values())
+        type_counts = {exc_type: counts[exc_type] for exc_type in EXCEPTION_TYPES if counts[exc_type]}
+        total_difference = sum(difference for exc_type, difference in totals.values() if exc_type not in MATCH_TYPES)
+        
+        # Move the summary block below the last row, blanking whatever is left of the old one
+        summary_rows = self._summary_rows(type_counts, total_difference)
+        for row_number in range(run['summary_start'], run['summary_start'] + run['summary_rows']):
+            changes.setdefault(row_number, blank)
+        for offset, row in enumerate(summary_rows):
+            changes[next_row + offset] = row + [''] * (len(blank) - len(row))
+        
+        self.sheets_manager.update_rows(sheet_name, changes, cols=15)
+        state.save(scope, entries, removed, {
+            'settings': run['settings'], 'next_row': next_row,
+            'summary_start': next_row, 'summary_rows': len(summary_rows)
+        })
+        
+        logger.info(f"✅ Exception analysis updated in {sheet_name} ({len(changes)} rows written)")
+        return type_counts
 
 def main():
     parser = argparse.ArgumentParser(description='Exception Analysis: Compare MS_FORM vs TRONSCAN')
@@ -365,36 +474,85 @@ def main():
     parser.add_argument('--tronscan_sheet', default='TRONSCAN', help='TronScan sheet name')
     parser.add_argument('--exception_sheet', default='EXCEPTION', help='Exception output sheet name')
     parser.add_argument('--tolerance', type=float, default=0.01, help='Amount tolerance for matching')
+    parser.add_argument('--wallet_sheet', default='WALLET_LIST', help='Sheet mapping wallet names to addresses')
+    parser.add_argument('--match_window_hours', type=float, default=48,
+                       help='Time window for matching unmatched rows on wallet + amount (0 disables)')
+    parser.add_argument('--form_time_column', default='Timestamp',
+                       help='MS_FORM column holding the transfer time (falls back to the first date/time column)')
+    parser.add_argument('--incremental', action='store_true',
+                       help='Only re-evaluate hashes that changed since the last run and update their rows in place')
+    parser.add_argument('--ms_form_xlsx', help='Read MS_FORM (and wallets) from a processed/{batch_id}.xlsx instead of the sheet')
+    parser.add_argument('--tronscan_csv', nargs='+',
+                       help='Read TRONSCAN from usdt_transactions_*.csv exports (paths or globs) instead of the sheet')
+    parser.add_argument('--output_csv', help='Write exceptions to this CSV instead of the exception sheet')
     
     args = parser.parse_args()
     
+    if args.incremental and args.output_csv:
+        parser.error('--incremental updates the exception sheet in place and cannot be used with --output_csv')
+    
     try:
-        # Initialize Google Sheets manager
-        logger.info("🔄 Initializing Google Sheets manager...")
-        sheets_manager = GoogleSheetsManager()
+        # Google Sheets is only needed for whatever isn't read from / written to local files
+        sheets_manager = None
+        if not (args.ms_form_xlsx and args.tronscan_csv and args.output_csv):
+            logger.info("🔄 Initializing Google Sheets manager...")
+            sheets_manager = GoogleSheetsManager()
         
         # Initialize analyzer
         analyzer = ExceptionAnalyzer(sheets_manager)
         analyzer.tolerance = args.tolerance
+        analyzer.match_window_hours = args.match_window_hours
+        analyzer.form_time_column = args.form_time_column
+        if args.match_window_hours > 0:
+            if args.ms_form_xlsx:
+                analyzer.wallet_addresses = analyzer.parse_wallet_values(read_batch_wallets(args.ms_form_xlsx),
+                                                                         f"{args.ms_form_xlsx} WALLET")
+            else:
+                analyzer.wallet_addresses = analyzer.read_wallet_addresses(args.wallet_sheet)
         
         logger.info("🔍 Starting exception analysis...")
         logger.info("="*60)
         
-        # Read data from both sheets
-        ms_form_data = analyzer.read_ms_form_data(args.ms_form_sheet)
-        tronscan_data = analyzer.read_tronscan_data(args.tronscan_sheet)
+        # Read data from both sources
+        if args.ms_form_xlsx:
+            logger.info(f"📖 Reading MS_FORM from {args.ms_form_xlsx}...")
+            ms_form_data = analyzer.parse_ms_form_values(read_batch_ms_form(args.ms_form_xlsx), args.ms_form_xlsx)
+        else:
+            ms_form_data = analyzer.read_ms_form_data(args.ms_form_sheet)
+        
+        if args.tronscan_csv:
+            logger.info(f"📖 Reading TRONSCAN from {len(args.tronscan_csv)} CSV path(s)...")
+            tronscan_data = analyzer.parse_tronscan_values(read_tronscan_csv(args.tronscan_csv), 'TronScan CSV')
+        else:
+            tronscan_data = analyzer.read_tronscan_data(args.tronscan_sheet)
         
         if not ms_form_data and not tronscan_data:
             logger.error("❌ No data found in either sheet")
             sys.exit(1)
         
-        # Analyze exceptions
-        logger.info("🔍 Analyzing exceptions...")
-        exceptions = analyzer.analyze_exceptions(ms_form_data, tronscan_data)
+        type_counts = None
+        
+        if args.output_csv:
+            logger.info("🔍 Analyzing exceptions...")
+            exceptions = analyzer.analyze_exceptions(ms_form_data, tronscan_data)
+            type_counts = analyzer.write_exceptions_to_csv(exceptions, args.output_csv)
+        else:
+            state = ReconciliationState()
+            if args.incremental:
+                type_counts = analyzer.reconcile_incremental(state, ms_form_data, tronscan_data, args.exception_sheet)
+        
+        if type_counts is None:
+            # Analyze exceptions
+            logger.info("🔍 Analyzing exceptions...")
+            exceptions = analyzer.analyze_exceptions(ms_form_data, tronscan_data)
+            
+            # Write results to sheet (rows and summary leave as one coalesced batchUpdate)
+            logger.info(f"💾 Writing {len(exceptions)} exceptions to {args.exception_sheet}...")
+            with sheets_manager.batched_writes():
+                type_counts = analyzer.write_exceptions_to_sheet(exceptions, args.exception_sheet)
+            analyzer.save_state(state, exceptions, args.exception_sheet, ms_form_data, tronscan_data)
         
-        # Write results to sheet
-        logger.info(f"💾 Writing {len(exceptions)} exceptions to {args.exception_sheet}...")
-        type_counts = analyzer.write_exceptions_to_sheet(exceptions, args.exception_sheet)
+        total_rows = sum(type_counts.values())
         
         # Final summary
         logger.info("="*60)
@@ -402,16 +560,17 @@ def main():
         logger.info("📊 Summary:")
         logger.info(f"  📝 MS_FORM records: {len(ms_form_data)}")
         logger.info(f"  🔗 TRONSCAN records: {len(tronscan_data)}")
-        logger.info(f"  ⚠️  Total exceptions: {len(exceptions)}")
+        logger.info(f"  ⚠️  Total exceptions: {total_rows}")
         
         for exc_type, count in type_counts.items():
             logger.info(f"    - {exc_type}: {count}")
         
-        logger.info(f"  📋 Output sheet: {args.exception_sheet}")
+        logger.info(f"  📋 Output: {args.output_csv or args.exception_sheet}")
         
         # Calculate match rate
-        matched_count = type_counts.get('MATCHED', 0)
-        total_unique = len(set(ms_form_data.keys()) | set(tronscan_data.keys()))
+        # (a wallet match folds a form row and a chain row into one exception row)
+        matched_count = type_counts.get('MATCHED', 0) + type_counts.get('MATCHED_BY_WALLET', 0)
+        total_unique = total_rows
         match_rate = (matched_count / total_unique * 100) if total_unique > 0 else 0
         
         logger.info(f"  ✅ Match rate: {match_rate:.1f}%")
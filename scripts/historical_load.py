@@ -9,6 +9,7 @@ import argparse
 from datetime import datetime
 from pathlib import Path
 import time
+from typing import Dict, List
 
 # Add src to path
 sys.path.append(str(Path(__file__).parent.parent))
@@ -45,6 +46,13 @@ def process_single_address(tronscan_api, address, date_from, date_to, address_in
         logger.error(f"❌ Failed to get transactions for {address}: {e}")
         return []
 
+def write_results(sheets_manager: GoogleSheetsManager, transactions: List[Dict], args):
+    """Transactions tab and (unless disabled) summary tab, sent together in coalesced batchUpdate calls"""
+    with sheets_manager.batched_writes():
+        sheets_manager.write_transactions_to_sheet(transactions, args.target_sheet)
+        if args.summary_sheet:
+            sheets_manager.create_summary_sheet(transactions, args.summary_sheet)
+
 def main():
     parser = argparse.ArgumentParser(description='Historical load of TronScan transactions (one by one)')
     parser.add_argument('--date_from', required=True, help='Start date (YYYY-MM-DD)')
@@ -54,6 +62,7 @@ def main():
     parser.add_argument('--start_from', type=int, default=1, help='Start from address number (for resuming)')
     parser.add_argument('--process_count', type=int, default=None, help='Number of addresses to process (for testing)')
     parser.add_argument('--skip_validation', action='store_true', help='Skip address validation (use with caution)')
+    parser.add_argument('--summary_sheet', default='SUMMARY', help='Sheet for transaction statistics (empty to skip)')
     
     args = parser.parse_args()
     
@@ -150,7 +159,7 @@ def main():
                 logger.info(f"Successful: {successful_addresses}, Failed: {failed_addresses}")
                 if all_transactions:
                     logger.info(f"Saving {len(all_transactions)} transactions collected so far...")
-                    sheets_manager.write_transactions_to_sheet(all_transactions, args.target_sheet)
+                    write_results(sheets_manager, all_transactions, args)
                 sys.exit(0)
                 
             except Exception as e:
@@ -186,7 +195,7 @@ def main():
         
         # Write transactions to target sheet
         logger.info(f"💾 Writing {len(all_transactions)} transactions to {args.target_sheet}...")
-        sheets_manager.write_transactions_to_sheet(all_transactions, args.target_sheet)
+        write_results(sheets_manager, all_transactions, args)
         
         logger.info("✅ Historical load completed successfully!")
         
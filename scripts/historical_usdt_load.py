@@ -2,10 +2,16 @@
 """
 Historical USDT load script - simplified 3-column output
 Usage: python scripts/historical_usdt_load.py --date_from 2025-07-01 --date_to 2025-07-24
+       python scripts/historical_usdt_load.py --date_from 2025-07-01 --date_to 2025-07-24 --engine async
+       python scripts/historical_usdt_load.py --date_from 2025-07-01 --date_to 2025-07-24 --incremental
+       python scripts/historical_usdt_load.py --date_from 2025-07-01 --date_to 2025-07-24 --provider auto
 """
 
 import sys
+import time
 import argparse
+import tempfile
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
 
@@ -14,10 +20,114 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from src.sheets_manager import GoogleSheetsManager
 from src.tronscan_api import TronScanAPI
+from src.async_tronscan_api import AsyncTronScanAPI
+from src.providers import build_provider_client
+from src.sync_cursor import SyncCursorStore
+from src.tx_cache import TransactionInfoCache
+from src.sinks import SheetAppendSink, CsvSink, LocalStoreSink, write_stream
 from src.utils import setup_logging, validate_date_format
 
 logger = setup_logging()
 
+def fetch_with_timing(client, addresses, date_from, date_to, label, since=None):
+    """Fetch USDT transactions and log the wall-clock time taken"""
+    started = time.perf_counter()
+    transactions = client.get_usdt_for_multiple_addresses(addresses, date_from, date_to, since=since)
+    elapsed = time.perf_counter() - started
+    logger.info(f"⏱️  {label} fetch: {elapsed:,.1f}s for {len(addresses)} addresses ({len(transactions)} USDT transactions)")
+    return transactions, elapsed
+
+def fetch_with_fresh_cache(tronscan_api, client, addresses, date_from, date_to, label, since=None):
+    """fetch_with_timing with an empty transaction-info cache, so an earlier run's entries don't skew the timing"""
+    shared_cache = tronscan_api.tx_cache
+    with tempfile.TemporaryDirectory() as cache_dir:
+        tronscan_api.tx_cache = TransactionInfoCache(str(Path(cache_dir) / 'transaction_info.sqlite'))
+        try:
+            return fetch_with_timing(client, addresses, date_from, date_to, label, since)
+        finally:
+            tronscan_api.tx_cache.close()
+            tronscan_api.tx_cache = shared_cache
+
+def compare_engines(tronscan_api, async_api, addresses, date_from, date_to, since=None):
+    """Run the sequential and async engines over the same wallets and report the speedup
+    
+    Each engine runs on its own empty transaction-info cache (the async engine shares
+    tronscan_api's), otherwise the second run would be served from the first run's entries.
+    """
+    sequential_transactions, sequential_elapsed = fetch_with_fresh_cache(tronscan_api, tronscan_api, addresses, date_from, date_to, "Sequential", since)
+    async_transactions, async_elapsed = fetch_with_fresh_cache(tronscan_api, async_api, addresses, date_from, date_to, "Async", since)
+    
+    speedup = sequential_elapsed / async_elapsed if async_elapsed > 0 else float('inf')
+    logger.info(f"📊 Engine comparison: sequential {sequential_elapsed:,.1f}s vs async {async_elapsed:,.1f}s ({speedup:,.1f}x)")
+    
+    sequential_keys = {(tx['hash'], tx['wallet'], tx['amt_usdt']) for tx in sequential_transactions}
+    async_keys = {(tx['hash'], tx['wallet'], tx['amt_usdt']) for tx in async_transactions}
+    if sequential_keys == async_keys:
+        logger.info("✅ Both engines returned identical USDT transactions")
+    else:
+        logger.warning(f"⚠️  Engines differ: {len(sequential_keys - async_keys)} only in sequential, {len(async_keys - sequential_keys)} only in async")
+    
+    return async_transactions
+
+def usdt_transfer_key(tx):
+    """One transfer's (hash, wallet, amount); float() so amounts read back from the sheet compare equal"""
+    return (tx['hash'], tx['wallet'], float(tx['amt_usdt']))
+
+def merge_usdt_transactions(existing, new_transactions):
+    """Append new transfers to the existing output, skipping those the output already holds
+
+    Transfers are matched on (hash, wallet, amount) with a count, so equal transfers of one
+    transaction are all kept; the new batch itself is never deduplicated.
+    """
+    already_written = Counter(usdt_transfer_key(tx) for tx in existing)
+    merged = list(existing)
+    for tx in new_transactions:
+        key = usdt_transfer_key(tx)
+        if already_written[key]:
+            already_written[key] -= 1
+            continue
+        merged.append(tx)
+    return merged
+
+def build_sink(args, sheets_manager):
+    """Create the sink a streamed load writes into"""
+    if args.sink == 'csv':
+        return CsvSink(args.sink_path or f"usdt_transactions_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    if args.sink == 'store':
+        return LocalStoreSink(args.sink_path or 'cache/usdt_transfers.sqlite')
+    return SheetAppendSink(sheets_manager, args.target_sheet)
+
+def run_streaming_load(args, sheets_manager, tronscan_api, addresses, cursors):
+    """Stream transfers page by page into the chosen sink in fixed-size chunks"""
+    sink = build_sink(args, sheets_manager)
+    
+    def staged(records):
+        for record in records:
+            cursors.stage([record])
+            yield record
+    
+    records = tronscan_api.iter_usdt_transfers(addresses, args.date_from, args.date_to)
+    stats = write_stream(staged(records), sink, args.chunk_size)
+    
+    # Cursors only move once the whole stream has been written, and never for a wallet
+    # whose stream broke off part-way (its newest transfers were written but not the rest)
+    cursors.discard(tronscan_api.failed_addresses)
+    cursors.commit()
+    tronscan_api.tx_cache.log_stats()
+    tronscan_api.key_pool.log_stats()
+    
+    logger.info("🎉 Streaming USDT load completed successfully!")
+    logger.info("📊 Summary:")
+    logger.info(f"  📅 Date range: {args.date_from} to {args.date_to}")
+    logger.info(f"  🏦 Wallets processed: {len(addresses)}")
+    logger.info(f"  🏦 Wallets with USDT: {len(stats['wallets'])}")
+    logger.info(f"  💰 USDT transactions: {stats['count']} in {stats['chunks']} chunks")
+    logger.info(f"  💵 Total USDT value: ${stats['total_usdt']:,.2f}")
+    if tronscan_api.failed_addresses:
+        logger.warning(f"  ⚠️  Wallets failed: {len(tronscan_api.failed_addresses)} (rerun to complete them)")
+    destination = args.target_sheet if args.sink == 'sheet' else sink.path
+    logger.info(f"  📝 Output: {destination}")
+
 def main():
     parser = argparse.ArgumentParser(description='Historical USDT load from WALLET_LIST')
     parser.add_argument('--date_from', required=True, help='Start date (YYYY-MM-DD)')
@@ -25,9 +135,25 @@ def main():
     parser.add_argument('--source_sheet', default='WALLET_LIST', help='Source sheet name for addresses')
     parser.add_argument('--target_sheet', default='TRONSCAN', help='Target sheet name for USDT transactions')
     parser.add_argument('--process_count', type=int, default=None, help='Number of addresses to process (for testing)')
+    parser.add_argument('--engine', choices=['sequential', 'async'], default='sequential', help='Fetch engine (async fetches wallets concurrently)')
+    parser.add_argument('--concurrency', type=int, default=None, help='Max in-flight requests for the async engine (default: ASYNC_MAX_CONCURRENCY or 8)')
+    parser.add_argument('--usdt_mode', choices=['transfers', 'details'], default=None, help='USDT source: TRC20 transfer list (default) or per-transaction details')
+    parser.add_argument('--incremental', action='store_true', help='Only fetch transfers newer than each wallet\'s sync cursor and merge them into the target sheet')
+    parser.add_argument('--stream', action='store_true', help='Stream transfers page by page into --sink in fixed-size chunks (bounded memory, partial progress kept)')
+    parser.add_argument('--sink', choices=['sheet', 'csv', 'store'], default='sheet', help='Where --stream writes: target sheet, CSV file or local SQLite store')
+    parser.add_argument('--sink_path', default=None, help='Output path for the csv/store sinks')
+    parser.add_argument('--chunk_size', type=int, default=500, help='Records per sink write in --stream mode')
+    parser.add_argument('--provider', choices=['tronscan', 'trongrid', 'auto'], default=None, help='Fetch through the provider router (auto routes each wallet to the healthiest of TronScan and TronGrid)')
+    parser.add_argument('--compare_engines', action='store_true', help='Run both engines, log the wall-clock comparison, then write the async result')
     
     args = parser.parse_args()
     
+    if args.stream and (args.incremental or args.compare_engines or args.engine == 'async'):
+        parser.error("--stream runs the sequential engine and cannot be combined with --incremental, --compare_engines or --engine async")
+    
+    if args.provider and (args.stream or args.compare_engines or args.engine == 'async'):
+        parser.error("--provider runs the sequential router and cannot be combined with --stream, --compare_engines or --engine async")
+    
     # Validate dates
     if not validate_date_format(args.date_from) or not validate_date_format(args.date_to):
         logger.error("Invalid date format. Use YYYY-MM-DD")
@@ -44,6 +170,8 @@ def main():
         
         logger.info("🔄 Initializing TronScan API client...")
         tronscan_api = TronScanAPI()
+        if args.usdt_mode:
+            tronscan_api.usdt_mode = args.usdt_mode
         
         # Read addresses from WALLET_LIST (Column C = Address)
         logger.info(f"📖 Reading addresses from {args.source_sheet} column C...")
@@ -64,11 +192,48 @@ def main():
         logger.info(f"🔍 Fetching USDT transactions from {args.date_from} to {args.date_to}...")
         logger.info("="*60)
         
-        usdt_transactions = tronscan_api.get_usdt_for_multiple_addresses(
-            addresses, args.date_from, args.date_to
-        )
+        cursors = SyncCursorStore()
+        
+        if args.stream:
+            run_streaming_load(args, sheets_manager, tronscan_api, addresses, cursors)
+            return
+        
+        since = None
+        if args.incremental:
+            since = cursors.start_timestamps(addresses)
+            logger.info(f"📌 Incremental mode: {len(since)}/{len(addresses)} wallets resume from their sync cursor")
+        
+        if args.engine == 'async' or args.compare_engines:
+            async_api = AsyncTronScanAPI(tronscan_api, args.concurrency)
+        
+        if args.provider:
+            router = build_provider_client(args.provider, tronscan_api)
+            usdt_transactions, _ = fetch_with_timing(router, addresses, args.date_from, args.date_to, f"Provider ({args.provider})", since)
+        elif args.compare_engines:
+            usdt_transactions = compare_engines(tronscan_api, async_api, addresses, args.date_from, args.date_to, since)
+        elif args.engine == 'async':
+            usdt_transactions, _ = fetch_with_timing(async_api, addresses, args.date_from, args.date_to, "Async", since)
+        else:
+            usdt_transactions, _ = fetch_with_timing(tronscan_api, addresses, args.date_from, args.date_to, "Sequential", since)
         
         logger.info("="*60)
+        failed_addresses = router.failed_addresses if args.provider else tronscan_api.failed_addresses
+        tronscan_api.tx_cache.log_stats()
+        tronscan_api.key_pool.log_stats()
+        
+        if args.incremental:
+            new_transactions = cursors.filter_new(usdt_transactions)
+            logger.info(f"🆕 {len(new_transactions)} USDT transactions newer than the sync cursors")
+            
+            if not new_transactions:
+                logger.info("✅ Target sheet is already up to date")
+                return
+            
+            existing_transactions = sheets_manager.read_usdt_transactions_from_sheet(args.target_sheet)
+            cursors.stage(new_transactions)
+            usdt_transactions = merge_usdt_transactions(existing_transactions, new_transactions)
+        else:
+            cursors.stage(usdt_transactions)
         
         if not usdt_transactions:
             logger.warning("⚠️  No USDT transactions found for the specified criteria")
@@ -82,6 +247,9 @@ def main():
         logger.info(f"💾 Writing {len(usdt_transactions)} USDT transactions to {args.target_sheet}...")
         sheets_manager.write_usdt_transactions_to_sheet(usdt_transactions, args.target_sheet)
         
+        # Only advance cursors once the sheet holds the transfers they point at
+        cursors.commit()
+        
         # Final summary
         total_usdt = sum(tx['amt_usdt'] for tx in usdt_transactions)
         unique_wallets = len(set(tx['wallet'] for tx in usdt_transactions))
@@ -94,6 +262,8 @@ def main():
         logger.info(f"  💰 USDT transactions: {len(usdt_transactions)}")
         logger.info(f"  💵 Total USDT value: ${total_usdt:,.2f}")
         logger.info(f"  📝 Output sheet: {args.target_sheet}")
+        if failed_addresses:
+            logger.warning(f"  ⚠️  Wallets failed: {len(failed_addresses)} (missing from the output, rerun to complete them)")
         
     except Exception as e:
         logger.error(f"❌ Historical USDT load failed: {e}")
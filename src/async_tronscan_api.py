@@ -0,0 +1,176 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
+from src.tronscan_api import TronScanAPI
+from src.utils import setup_logging
+
+logger = setup_logging()
+
+class AsyncTronScanAPI:
+    """Concurrent TronScan client producing the same HASH, WALLET, AMT records as TronScanAPI
+
+    Up to max_concurrency blocking requests are in flight at once, each on its own worker thread.
+    """
+
+    def __init__(self, api: TronScanAPI = None, max_concurrency: int = None):
+        self.api = api or TronScanAPI()
+        # Each pooled API key brings its own quota, so the default in-flight budget scales with them
+        self.max_concurrency = max_concurrency or int(os.getenv('ASYNC_MAX_CONCURRENCY', 8 * max(len(self.api.key_pool), 1)))
+
+        # One pooled connection per concurrent request so workers don't queue on the adapter
+        if self.api.transport.pool_size < self.max_concurrency:
+            self.api.transport.set_pool_size(self.max_concurrency)
+
+        self._semaphore = None
+        self._executor = None
+
+    async def _request(self, endpoint: str, params: Dict) -> Dict:
+        """Run one blocking request in a worker thread under the global concurrency budget
+
+        The threads come from a pool of max_concurrency workers owned by the fetch (asyncio's
+        default executor is capped at min(32, cpus + 4) and would silently lower the budget).
+        Rate limiting, timeouts and retries happen in the shared transport inside that thread.
+        """
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self.api._make_request, endpoint, params)
+
+    async def _get_transaction_details(self, tx_hash: str) -> Dict:
+        """Get full transaction details including TRC20 transfers"""
+        cached = self.api.tx_cache.get(tx_hash)
+        if cached is not None:
+            return cached
+
+        response = await self._request('transaction-info', {'hash': tx_hash})
+        self.api.tx_cache.put(tx_hash, response)
+        return response
+
+    async def _get_transfer_page(self, address: str, start_timestamp: int, end_timestamp: int, start: int):
+        """Fetch one transfer-list page: (records, rows on page, total rows in the window)"""
+        params = self.api._transfer_list_params(address, start_timestamp, end_timestamp, start)
+        response = await self._request('token_trc20/transfers', params)
+
+        if 'token_transfers' not in response:
+            raise ValueError(f"Unexpected transfer list response keys: {list(response.keys())}")
+
+        transfers = response['token_transfers'] or []
+        records = [r for r in (self.api._parse_trc20_transfer(t, address) for t in transfers) if r]
+        return records, len(transfers), self.api._window_total(response, len(transfers))
+
+    async def _get_detail_page(self, address: str, start_timestamp: int, end_timestamp: int, start: int):
+        """Fetch one transaction-list page and every row's details concurrently"""
+        params = {
+            'address': address,
+            'start_timestamp': start_timestamp,
+            'end_timestamp': end_timestamp,
+            'start': start,
+            'limit': self.api.detail_page_limit,
+            'sort': '-timestamp'
+        }
+        response = await self._request('transaction', params)
+
+        transactions = response.get('data') or []
+        tx_hashes = [tx.get('hash', '') for tx in transactions]
+        details = await asyncio.gather(*(self._get_transaction_details(tx_hash) for tx_hash in tx_hashes))
+
+        records = []
+        for tx_hash, tx_details in zip(tx_hashes, details):
+            records.extend(self.api._parse_usdt_transfers(tx_hash, tx_details, address))
+
+        return records, len(transactions), self.api._window_total(response, len(transactions))
+
+    async def _fetch_window(self, address: str, start_timestamp: int, end_timestamp: int, get_page, limit: int) -> List[List[Dict]]:
+        """Fetch one time window as [records], or its concurrent halves' windows when it's over the offset cap"""
+        records, page_rows, total = await get_page(address, start_timestamp, end_timestamp, 0)
+
+        sub_windows = self.api._split_window(address, start_timestamp, end_timestamp, total)
+        if sub_windows:
+            halves = await asyncio.gather(*(
+                self._fetch_window(address, window_start, window_end, get_page, limit)
+                for window_start, window_end in sub_windows
+            ))
+            return [window for half in halves for window in half]
+
+        all_records = list(records)
+        start = 0
+
+        while page_rows == limit:
+            start += limit
+
+            # Only reachable for windows that couldn't be split
+            if start >= self.api.max_offset:
+                logger.warning(f"Reached API limit for address {address}")
+                break
+
+            records, page_rows, _ = await get_page(address, start_timestamp, end_timestamp, start)
+            all_records.extend(records)
+
+        return [all_records]
+
+    async def _get_usdt_transactions(self, address: str, start_timestamp: int, end_timestamp: int) -> List[Dict]:
+        """Get USDT transactions for address, preferring the transfer list like TronScanAPI"""
+        if self.api.usdt_mode == 'transfers':
+            try:
+                windows = await self._fetch_window(address, start_timestamp, end_timestamp,
+                                                   self._get_transfer_page, self.api.transfer_page_limit)
+                return self.api._merge_window_records(windows)
+            except Exception as e:
+                logger.warning(f"Transfer list failed for {address} ({e}), falling back to per-transaction details")
+
+        windows = await self._fetch_window(address, start_timestamp, end_timestamp,
+                                           self._get_detail_page, self.api.detail_page_limit)
+        return self.api._merge_window_records(windows)
+
+    async def _fetch_address(self, address: str, index: int, total: int, start_timestamp: int, end_timestamp: int) -> List[Dict]:
+        """Fetch one address and log the same per-address summary as the sequential client"""
+        logger.info(f"Processing address {index}/{total}: {address}")
+
+        try:
+            usdt_transactions = await self._get_usdt_transactions(address, start_timestamp, end_timestamp)
+        except Exception as e:
+            logger.error(f"Failed to get USDT transactions for address {address}: {e}")
+            self.api.failed_addresses.append(address)
+            return []
+
+        total_usdt = sum(tx['amt_usdt'] for tx in usdt_transactions)
+        logger.info(f"✅ Address {address}: {len(usdt_transactions)} USDT transactions, Total: ${total_usdt:,.2f}")
+        return usdt_transactions
+
+    async def _fetch_all(self, addresses: List[str], start_timestamp: int, end_timestamp: int, since: Dict[str, int]) -> List[Dict]:
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='tronscan') as executor:
+            self._executor = executor
+            try:
+                results = await asyncio.gather(*(
+                    self._fetch_address(address, i, len(addresses), max(start_timestamp, since.get(address, start_timestamp)), end_timestamp)
+                    for i, address in enumerate(addresses, 1)
+                ))
+            finally:
+                self._executor = None
+
+        # Keep the sequential client's address order in the output
+        return [tx for address_transactions in results for tx in address_transactions]
+
+    def get_usdt_for_multiple_addresses(self, addresses: List[str], date_from: str, date_to: str,
+                                        since: Optional[Dict[str, int]] = None) -> List[Dict]:
+        """Get USDT transactions for multiple addresses concurrently (since: per-address start timestamps)"""
+        start_timestamp, end_timestamp = TronScanAPI.date_range_to_timestamps(date_from, date_to)
+
+        requests_before = self.api.request_count
+        self.api.failed_addresses = []
+
+        logger.info(f"⚡ Async fetch: {len(addresses)} addresses, concurrency {self.max_concurrency}, {self.api.request_rate:g} req/s")
+        all_usdt_transactions = asyncio.run(self._fetch_all(addresses, start_timestamp, end_timestamp, since or {}))
+
+        logger.info(f"🎉 Total USDT transactions found: {len(all_usdt_transactions)}")
+        logger.info(f"💰 Total USDT value: ${sum(tx['amt_usdt'] for tx in all_usdt_transactions):,.2f}")
+        self.api.log_request_stats(len(addresses), start_timestamp, end_timestamp, self.api.request_count - requests_before)
+        self.api.log_failed_addresses()
+
+        return all_usdt_transactions
+
+    def get_usdt_for_single_address(self, address: str, date_from: str, date_to: str) -> List[Dict]:
+        """Get USDT transactions for single address"""
+        return self.get_usdt_for_multiple_addresses([address], date_from, date_to)
@@ -0,0 +1,117 @@
+import os
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence
+from src.excel_writer import new_workbook, write_table, save_workbook, track_widths
+from src.utils import setup_logging
+
+logger = setup_logging()
+
+PROCESSED_DIR = Path("processed")
+MANIFEST_NAME = "manifest.json"
+
+def staging_dir(batch_id: str) -> Path:
+    """Per-batch directory holding the staged tabs: processed/{batch_id}/"""
+    return PROCESSED_DIR / batch_id
+
+def workbook_path(batch_id: str) -> Path:
+    """The assembled batch workbook: processed/{batch_id}.xlsx"""
+    return PROCESSED_DIR / f"{batch_id}.xlsx"
+
+def encode_value(value):
+    """json.dumps default: datetimes are tagged (Sync_Date must stay an Excel date), the rest stringified"""
+    if isinstance(value, datetime):
+        return {'$datetime': value.isoformat()}
+    return str(value)
+
+def decode_value(obj: Dict):
+    """json.loads object_hook reversing encode_value"""
+    if '$datetime' in obj:
+        return datetime.fromisoformat(obj['$datetime'])
+    return obj
+
+def write_json_atomic(path: Path, data: Dict):
+    """Write JSON through a temporary file so readers never see a partial file"""
+    temp_path = path.with_name(f".{path.name}.tmp")
+    temp_path.write_text(json.dumps(data, indent=2, default=encode_value))
+    os.replace(temp_path, path)
+
+def read_manifest(batch_id: str) -> Dict:
+    """Staged tabs of a batch, in workbook order ({'batch_id', 'tabs': [...]})"""
+    path = staging_dir(batch_id) / MANIFEST_NAME
+    if not path.exists():
+        return {'batch_id': batch_id, 'tabs': []}
+    return json.loads(path.read_text())
+
+def stage_tab(batch_id: str, title: str, headers: List[str], rows: Iterable[Sequence],
+              header_color: str = "366092", max_width: int = 50, negative_red_columns: Sequence[str] = ()) -> int:
+    """Stage one tab of the batch workbook as JSON lines and record it in the manifest
+
+    Column widths are tracked while the rows are written, so finalize_batch can stream the
+    rows straight from disk into the workbook. Re-staging a tab replaces it in place (same
+    position in the workbook). Returns the number of rows staged.
+    """
+    directory = staging_dir(batch_id)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    filename = f"{title}.jsonl"
+    temp_path = directory / f".{filename}.tmp"
+    widths = []
+    track_widths(widths, headers)
+    row_count = 0
+    with open(temp_path, 'w', encoding='utf-8') as staged:
+        for row in rows:
+            row = list(row)
+            track_widths(widths, row)
+            staged.write(json.dumps(row, default=encode_value) + '\n')
+            row_count += 1
+    os.replace(temp_path, directory / filename)
+
+    tab = {
+        'title': title,
+        'file': filename,
+        'headers': list(headers),
+        'widths': widths,
+        'rows': row_count,
+        'header_color': header_color,
+        'max_width': max_width,
+        'negative_red_columns': list(negative_red_columns)
+    }
+    manifest = read_manifest(batch_id)
+    titles = [staged_tab['title'] for staged_tab in manifest['tabs']]
+    if title in titles:
+        manifest['tabs'][titles.index(title)] = tab
+    else:
+        manifest['tabs'].append(tab)
+    write_json_atomic(directory / MANIFEST_NAME, manifest)
+
+    logger.info(f"📦 Staged {title} tab for batch {batch_id}: {row_count} rows")
+    return row_count
+
+def _staged_rows(path: Path):
+    with open(path, encoding='utf-8') as staged:
+        for line in staged:
+            yield json.loads(line, object_hook=decode_value)
+
+def finalize_batch(batch_id: str) -> Path:
+    """Assemble processed/{batch_id}.xlsx from the staged tabs in one streaming write
+
+    Every call rewrites all staged tabs, so steps that each finalize (01, 02 run standalone)
+    write the early tabs again per step; steps run with --stage_only leave it to the last one.
+    """
+    manifest = read_manifest(batch_id)
+    if not manifest['tabs']:
+        raise FileNotFoundError(f"No staged tabs for batch {batch_id} in {staging_dir(batch_id)}")
+
+    workbook = new_workbook()
+    for tab in manifest['tabs']:
+        write_table(workbook, tab['title'], tab['headers'], _staged_rows(staging_dir(batch_id) / tab['file']),
+                    header_color=tab['header_color'], max_width=tab['max_width'],
+                    negative_red_columns=tab['negative_red_columns'], widths=tab['widths'])
+
+    path = workbook_path(batch_id)
+    save_workbook(workbook, path)
+    logger.info(f"📄 Assembled {path} from {len(manifest['tabs'])} staged tabs: "
+                f"{', '.join(tab['title'] for tab in manifest['tabs'])}")
+    return path
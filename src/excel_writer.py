@@ -0,0 +1,109 @@
+import os
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, TYPE_CHECKING
+from src.utils import setup_logging
+
+if TYPE_CHECKING:
+    import openpyxl
+
+logger = setup_logging()
+
+def new_workbook() -> 'openpyxl.Workbook':
+    """Empty write-only workbook: rows are streamed to disk instead of kept as cell objects"""
+    import openpyxl
+    return openpyxl.Workbook(write_only=True)
+
+def _header_style(workbook: 'openpyxl.Workbook', color: str) -> str:
+    """Register (once) and return the named style for header rows of a fill color"""
+    from openpyxl.styles import NamedStyle, Font, PatternFill, Alignment
+
+    name = f"header_{color}"
+    if name not in workbook.named_styles:
+        workbook.add_named_style(NamedStyle(
+            name=name,
+            font=Font(bold=True, color="FFFFFF"),
+            fill=PatternFill(start_color=color, end_color=color, fill_type="solid"),
+            alignment=Alignment(horizontal="center")
+        ))
+    return name
+
+def _set_widths(worksheet, widths: List[int], max_width: int):
+    """Column widths as longest value + 2, capped; must run before the first row is appended"""
+    from openpyxl.utils import get_column_letter
+
+    for col_idx, width in enumerate(widths, 1):
+        worksheet.column_dimensions[get_column_letter(col_idx)].width = min(width + 2, max_width)
+
+def track_widths(widths: List[int], values: Sequence):
+    """Grow widths (longest value per column so far) with one row of values"""
+    for col_idx, value in enumerate(values):
+        length = len(str(value)) if value is not None else 0
+        if col_idx == len(widths):
+            widths.append(length)
+        elif length > widths[col_idx]:
+            widths[col_idx] = length
+
+def write_table(workbook: 'openpyxl.Workbook', title: str, headers: List[str], rows: Iterable[Sequence],
+                header_color: str = "366092", max_width: int = 50, negative_red_columns: Sequence[str] = (),
+                widths: Optional[List[int]] = None):
+    """Add a tab with a styled header row and the data rows to a write-only workbook
+
+    Write-only sheets emit column widths before the first row. With widths (from track_widths
+    over the headers and rows) the rows are streamed straight through; without them they are
+    collected as plain value lists (much lighter than cells) while their widths are tracked.
+    Negative numbers in negative_red_columns are shown red by one conditional-formatting rule.
+    """
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    from openpyxl.formatting.rule import CellIsRule
+    from openpyxl.utils import get_column_letter
+
+    worksheet = workbook.create_sheet(title)
+
+    if widths is None:
+        widths = []
+        track_widths(widths, headers)
+        collected = []
+        for row in rows:
+            row = list(row)
+            track_widths(widths, row)
+            collected.append(row)
+        rows = collected
+
+    _set_widths(worksheet, widths, max_width)
+
+    style = _header_style(workbook, header_color)
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(worksheet, value=header)
+        cell.style = style
+        header_cells.append(cell)
+    worksheet.append(header_cells)
+
+    row_count = 0
+    for row in rows:
+        worksheet.append(row)
+        row_count += 1
+
+    if row_count:
+        for column_name in negative_red_columns:
+            if column_name in headers:
+                column_letter = get_column_letter(headers.index(column_name) + 1)
+                worksheet.conditional_formatting.add(
+                    f"{column_letter}2:{column_letter}{row_count + 1}",
+                    CellIsRule(operator='lessThan', formula=['0'], font=Font(color="FF0000"))
+                )
+
+    return worksheet
+
+def save_workbook(workbook: 'openpyxl.Workbook', file_path: Path):
+    """Save to a temporary file next to file_path and move it into place, so a failed save
+    never leaves a half-written workbook"""
+    file_path = Path(file_path)
+    temp_path = file_path.with_name(f".{file_path.name}.tmp")
+    try:
+        workbook.save(temp_path)
+        os.replace(temp_path, file_path)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
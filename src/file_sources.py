@@ -0,0 +1,147 @@
+import csv
+import glob
+from pathlib import Path
+from typing import Dict, List, Optional
+from src.utils import setup_logging
+
+logger = setup_logging()
+
+# Batch workbook MS_FORM column -> header the analyzer's MS_FORM parser recognises.
+# clean_txn_hash is the hash without links/whitespace; amount is the positive form amount
+# (processed_amount carries the expense sign and would never match the chain amount)
+BATCH_MS_FORM_COLUMNS = {
+    'clean_txn_hash': 'TrxHash',
+    'amount': 'Amount',
+    'wallet': 'Wallet',
+    'timestamp': 'Timestamp'
+}
+
+# usdt_transactions_*.csv column -> TRONSCAN tab header
+TRONSCAN_CSV_COLUMNS = {
+    'transaction_hash': 'HASH',
+    'wallet_address': 'WALLET',
+    'amount_abs': 'AMT',
+    'timestamp': 'TIMESTAMP'
+}
+
+def _cell_text(value) -> str:
+    """Worksheet cell as the string Sheets would return for it"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def read_xlsx_values(path: str, sheet_name: str) -> List[List[str]]:
+    """All values of one tab as a 2D grid of strings, streamed with openpyxl read-only mode"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet_name not in workbook.sheetnames:
+            raise ValueError(f"{path} has no {sheet_name} tab (tabs: {', '.join(workbook.sheetnames)})")
+        return [[_cell_text(cell) for cell in row]
+                for row in workbook[sheet_name].iter_rows(values_only=True)]
+    finally:
+        # Read-only workbooks keep the file open until closed
+        workbook.close()
+
+def _select_columns(all_values: List[List[str]], columns: Dict[str, str], source: str) -> List[List[str]]:
+    """Keep the mapped columns of a grid (header row first), renamed to their analyzer headers"""
+    if not all_values:
+        return []
+
+    headers = [h.strip().lower() for h in all_values[0]]
+    missing = [name for name in columns if name not in headers]
+    if missing:
+        raise ValueError(f"{source} is missing columns: {', '.join(missing)}")
+
+    indexes = [headers.index(name) for name in columns]
+    grid = [list(columns.values())]
+    for row in all_values[1:]:
+        grid.append([row[i] if i < len(row) else '' for i in indexes])
+    return grid
+
+def read_batch_ms_form(path: str) -> List[List[str]]:
+    """MS_FORM grid from a processed/{batch_id}.xlsx, in the layout the MS_FORM parser expects"""
+    return _select_columns(read_xlsx_values(path, 'MS_FORM'), BATCH_MS_FORM_COLUMNS, f"{path} MS_FORM")
+
+def batch_ms_form_grid(records: List[Dict]) -> List[List[str]]:
+    """MS_FORM grid, as read_batch_ms_form returns it, from in-memory form records (02_sync_ms_form)"""
+    grid = [list(BATCH_MS_FORM_COLUMNS.values())]
+    for record in records:
+        grid.append([_cell_text(record.get(name)) for name in BATCH_MS_FORM_COLUMNS])
+    return grid
+
+def tronscan_grid(transactions: List[Dict]) -> List[List[str]]:
+    """TRONSCAN grid (HASH, WALLET, AMT, TIMESTAMP) from in-memory USDT transactions"""
+    grid = [list(TRONSCAN_CSV_COLUMNS.values())]
+    for tx in transactions:
+        grid.append([tx.get('hash', ''), tx.get('wallet', ''), _cell_text(float(tx.get('amt_usdt', 0))),
+                     _cell_text(tx.get('timestamp'))])
+    return grid
+
+def read_batch_wallets(path: str) -> List[List[str]]:
+    """WALLET tab of a processed/{batch_id}.xlsx (Wallet Name, Company, Address, ...)"""
+    return read_xlsx_values(path, 'WALLET')
+
+def _read_csv_columns(path: str, columns: List[str]) -> Dict[str, List[str]]:
+    """{column: string values} for selected CSV columns, with pyarrow's multi-threaded reader when installed"""
+    try:
+        import pyarrow as pa
+        from pyarrow import csv as pa_csv
+    except ImportError:
+        pa = None
+
+    if pa is not None:
+        # Everything is read as strings so amounts and hashes keep their exact text
+        table = pa_csv.read_csv(
+            path,
+            read_options=pa_csv.ReadOptions(use_threads=True),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=columns,
+                column_types={name: pa.string() for name in columns}
+            )
+        )
+        return {name: ['' if v is None else v for v in table.column(name).to_pylist()] for name in columns}
+
+    with open(path, newline='', encoding='utf-8') as csvfile:
+        reader = csv.DictReader(csvfile)
+        missing = [name for name in columns if name not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+        values = {name: [] for name in columns}
+        for record in reader:
+            for name in columns:
+                values[name].append(record[name] or '')
+    return values
+
+def read_tronscan_csv(paths: List[str]) -> List[List[str]]:
+    """TRONSCAN grid (HASH, WALLET, AMT, TIMESTAMP) from one or more usdt_transactions_*.csv exports
+
+    Paths may be glob patterns. Later files win for a hash present in several exports,
+    like later rows of the TRONSCAN tab do.
+    """
+    files = []
+    for pattern in paths:
+        matched = sorted(glob.glob(pattern))
+        files.extend(matched or [pattern])
+
+    columns = list(TRONSCAN_CSV_COLUMNS)
+    grid = [list(TRONSCAN_CSV_COLUMNS.values())]
+    for path in files:
+        if not Path(path).exists():
+            raise FileNotFoundError(f"TronScan export not found: {path}")
+        values = _read_csv_columns(path, columns)
+        grid.extend(map(list, zip(*(values[name] for name in columns))))
+        logger.info(f"📄 Read {len(values[columns[0]])} transactions from {path}")
+    return grid
+
+def write_csv(path: str, rows: List[List], headers: Optional[List[str]] = None):
+    """Write rows (and an optional header row) to a CSV file"""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        if headers:
+            writer.writerow(headers)
+        writer.writerows(rows)
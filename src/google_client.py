@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+import gspread
+from google.auth.transport.requests import Request
+from google.oauth2.service_account import Credentials
+from src.utils import setup_logging
+
+logger = setup_logging()
+
+SCOPES = [
+    'https://spreadsheets.google.com/feeds',
+    'https://www.googleapis.com/auth/drive'
+]
+
+def load_service_account_info() -> Dict:
+    """Service account JSON from GOOGLE_CREDENTIALS_JSON, else the GOOGLE_SHEETS_CREDENTIALS_PATH file"""
+    creds_json = os.getenv('GOOGLE_CREDENTIALS_JSON')
+    if creds_json:
+        logger.info("Using credentials from environment variable")
+        return json.loads(creds_json)
+
+    creds_path = os.getenv('GOOGLE_SHEETS_CREDENTIALS_PATH', 'config/credentials.json')
+    if not os.path.exists(creds_path):
+        raise ValueError("No credentials found. Set GOOGLE_CREDENTIALS_JSON environment variable or provide credentials file")
+
+    logger.warning("Using credentials from file - consider using environment variables for production")
+    with open(creds_path, 'r') as f:
+        creds_data = json.load(f)
+
+    if creds_data.get('type') != 'service_account':
+        raise ValueError(f"Expected service_account, got: {creds_data.get('type')}")
+
+    logger.info(f"Using service account: {creds_data.get('client_email')}")
+    return creds_data
+
+class TokenCache:
+    """Access tokens on disk so consecutive pipeline steps reuse one OAuth exchange until it expires"""
+
+    # Tokens this close to expiry are refreshed rather than reused
+    min_remaining = timedelta(minutes=5)
+
+    def __init__(self, path: str = None):
+        self.path = Path(path or os.getenv('GOOGLE_TOKEN_CACHE_PATH', 'cache/google_token.json'))
+
+    def _read(self) -> Dict:
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def load(self, credentials: Credentials) -> bool:
+        """Put a still-valid cached token on credentials; returns True when one was found"""
+        entry = self._read().get(credentials.service_account_email)
+        if not entry:
+            return False
+
+        # google-auth keeps expiry as naive UTC
+        expiry = datetime.fromisoformat(entry['expiry'])
+        if expiry - datetime.utcnow() < self.min_remaining:
+            return False
+
+        credentials.token = entry['token']
+        credentials.expiry = expiry
+        return True
+
+    def save(self, credentials: Credentials):
+        """Persist the current token, readable only by the owner"""
+        entries = self._read()
+        entries[credentials.service_account_email] = {
+            'token': credentials.token,
+            'expiry': credentials.expiry.isoformat()
+        }
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+
+def save_refreshed_tokens(credentials: Credentials, token_cache: TokenCache):
+    """Make every refresh of credentials (also the ones gspread does mid-run) update the token cache"""
+    refresh = credentials.refresh
+
+    def refresh_and_save(request):
+        refresh(request)
+        try:
+            token_cache.save(credentials)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not cache the refreshed Google access token: {e}")
+
+    credentials.refresh = refresh_and_save
+
+_client: Optional[gspread.Client] = None
+_spreadsheets: Dict[str, gspread.Spreadsheet] = {}
+_lock = threading.Lock()
+
+def get_gspread_client() -> gspread.Client:
+    """Get the process-wide authorized gspread client, reusing a cached access token when possible"""
+    global _client
+    with _lock:
+        if _client is None:
+            credentials = Credentials.from_service_account_info(load_service_account_info(), scopes=SCOPES)
+
+            token_cache = TokenCache()
+            save_refreshed_tokens(credentials, token_cache)
+            if token_cache.load(credentials):
+                logger.info("✅ Reusing cached Google access token")
+            else:
+                credentials.refresh(Request())
+                logger.info("✅ Google Sheets authentication successful")
+
+            _client = gspread.authorize(credentials)
+        return _client
+
+def open_spreadsheet(sheet_id: str) -> gspread.Spreadsheet:
+    """Open a spreadsheet once per process and hand out the same object afterwards"""
+    client = get_gspread_client()
+    with _lock:
+        if sheet_id not in _spreadsheets:
+            _spreadsheets[sheet_id] = client.open_by_key(sheet_id)
+            logger.info(f"Opened sheet: {_spreadsheets[sheet_id].title}")
+        return _spreadsheets[sheet_id]
@@ -1,8 +1,9 @@
-import requests
 import time
 from datetime import datetime
 from typing import Dict, Optional
 from src.utils import setup_logging
+from src.rate_limiter import get_rate_limiter
+from src.http_transport import HttpTransport
 
 logger = setup_logging()
 
@@ -10,7 +11,9 @@ class HistoricalPriceFetcher:
     """Fetch historical cryptocurrency prices at specific timestamps"""
     
     def __init__(self):
-        self.session = requests.Session()
+        self.rate_limiter = get_rate_limiter('coingecko')
+        self.transport = HttpTransport('coingecko', rate_limiter=self.rate_limiter)
+        self.session = self.transport.session
         self.price_cache = {}  # Cache: {(token, date): price}
         
         # CoinGecko API mapping for Tron ecosystem tokens
@@ -67,23 +70,19 @@ class HistoricalPriceFetcher:
         
         params = {'date': formatted_date, 'localization': 'false'}
         
-        try:
-            time.sleep(1.0)  # Rate limiting
-            response = self.session.get(url, params=params, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-            
-            if 'market_data' in data and 'current_price' in data['market_data']:
-                if 'usd' in data['market_data']['current_price']:
-                    price = float(data['market_data']['current_price']['usd'])
-                    logger.info(f"Historical price for {token_symbol} on {date_str}: ${price:.8f}")
-                    return price
-            
-            return self._get_fallback_price(token_symbol)
-                
-        except Exception as e:
-            logger.error(f"API request failed for {token_symbol}: {e}")
-            return self._get_fallback_price(token_symbol)
+        # Request errors propagate so get_historical_price doesn't cache a fallback price
+        # for a date that only failed transiently
+        response = self.transport.get(url, params=params, timeout=15)
+        response.raise_for_status()
+        data = response.json()
+        
+        if 'market_data' in data and 'current_price' in data['market_data']:
+            if 'usd' in data['market_data']['current_price']:
+                price = float(data['market_data']['current_price']['usd'])
+                logger.info(f"Historical price for {token_symbol} on {date_str}: ${price:.8f}")
+                return price
+        
+        return self._get_fallback_price(token_symbol)
     
     def _get_fallback_price(self, token_symbol: str) -> float:
         """Get fallback price when API fails"""
@@ -0,0 +1,191 @@
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from src.utils import setup_logging
+from src.rate_limiter import TokenBucketLimiter, parse_retry_after
+from src.key_pool import ApiKeyPool
+
+logger = setup_logging()
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised without sending when a host's circuit breaker is open"""
+
+class CircuitBreaker:
+    """Per-host breaker: opens after consecutive failures, lets one probe through after a cooldown"""
+
+    def __init__(self, host: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Closed: always. Open: no, until the cooldown ends. Half-open: one probe at a time."""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                logger.info(f"🟡 Circuit for {self.host} half-open, probing")
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                logger.info(f"🟢 Circuit for {self.host} closed")
+            self.state = 'closed'
+            self.failures = 0
+
+    def release_probe(self):
+        """Hand back a half-open probe that never reached the host, so the next caller can probe"""
+        with self._lock:
+            if self.state == 'half_open':
+                # opened_at is untouched, the cooldown has already passed
+                self.state = 'open'
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    logger.warning(f"🔴 Circuit for {self.host} opened after {self.failures} failures")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(host: str) -> CircuitBreaker:
+    """Get the process-wide circuit breaker for a host"""
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(
+                host,
+                failure_threshold=int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5)),
+                reset_timeout=float(os.getenv('CIRCUIT_RESET_SECONDS', 30))
+            )
+        return _breakers[host]
+
+class HttpTransport:
+    """requests.Session wrapper with timeouts, jittered retries, rate limiting and per-host circuit breakers
+
+    With a non-empty key_pool every attempt is sent with the next key in rotation (as
+    key_header: key_format) and paced by that key's budget. rate_limiter (the provider's
+    shared limiter) still applies on top as the host-wide cap, so other callers of the same
+    limiter and the keyed requests share one budget. A 429 on a key only slows that key;
+    the host-wide limiter backs off on keyless 429s and on 5xx.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, provider: str, rate_limiter: Optional[TokenBucketLimiter] = None,
+                 headers: Optional[Dict[str, str]] = None, pool_size: int = None,
+                 key_pool: Optional[ApiKeyPool] = None, key_header: str = None, key_format: str = '{key}'):
+        self.provider = provider
+        self.rate_limiter = rate_limiter
+        self.key_pool = key_pool if key_pool else None
+        self.key_header = key_header
+        self.key_format = key_format
+        self.session = requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+
+        self.connect_timeout = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+        self.read_timeout = float(os.getenv('HTTP_READ_TIMEOUT', 30))
+        self.max_retries = int(os.getenv('HTTP_MAX_RETRIES', 4))
+        self.backoff_base = float(os.getenv('HTTP_BACKOFF_BASE', 0.5))
+        self.backoff_max = float(os.getenv('HTTP_BACKOFF_MAX', 30))
+
+        self.set_pool_size(pool_size or int(os.getenv(f'{provider.upper()}_POOL_SIZE', 10)))
+
+        if self.key_pool and self.rate_limiter and self.key_pool.rate > self.rate_limiter.max_rate:
+            logger.info(f"🔑 {provider}: {len(self.key_pool)} API keys allow {self.key_pool.rate:.1f} req/s, capped at "
+                        f"{self.rate_limiter.max_rate:.1f} req/s host-wide ({provider.upper()}_REQUESTS_PER_SECOND)")
+
+    def set_pool_size(self, pool_size: int):
+        """Size the keep-alive connection pool used for this provider's host"""
+        self.pool_size = pool_size
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def get(self, url: str, params: Dict = None, timeout: float = None) -> requests.Response:
+        """GET with retries on connection errors, timeouts, 429 and 5xx
+
+        Only use for idempotent requests. Returns the final response; raise_for_status() is left to
+        the caller so non-retryable 4xx responses still surface normally.
+        """
+        breaker = get_circuit_breaker(urlparse(url).netloc)
+        request_timeout = (self.connect_timeout, timeout or self.read_timeout)
+
+        for attempt in range(self.max_retries + 1):
+            if not breaker.allow_request():
+                raise CircuitOpenError(f"Circuit open for {breaker.host}, not calling {url}")
+
+            # Every exit below resolves the breaker (a half-open probe must never stay pending)
+            key, headers = None, None
+            try:
+                if self.key_pool:
+                    key = self.key_pool.acquire()
+                    headers = {self.key_header: self.key_format.format(key=key)}
+                if self.rate_limiter:
+                    self.rate_limiter.acquire()
+            except BaseException:
+                breaker.release_probe()
+                raise
+
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=request_timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"🔁 {self.provider} request failed ({e.__class__.__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            except requests.exceptions.RequestException:
+                breaker.record_failure()
+                raise
+            except BaseException:
+                breaker.release_probe()
+                raise
+
+            retry_after = response.headers.get('Retry-After')
+            if key:
+                self.key_pool.record_response(key, response.status_code, retry_after)
+            if self.rate_limiter and (not key or response.status_code >= 500):
+                self.rate_limiter.record_response(response.status_code, retry_after)
+
+            if response.status_code not in self.RETRY_STATUSES:
+                breaker.record_success()
+                return response
+
+            # Throttling means the host is healthy, only 5xx counts against the breaker
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+            if attempt == self.max_retries:
+                return response
+
+            # A throttled key is already out of rotation, so the retry needn't wait out its Retry-After
+            delay = self._backoff(attempt)
+            if not (key and response.status_code == 429):
+                delay = max(delay, parse_retry_after(retry_after))
+            logger.warning(f"🔁 {self.provider} returned HTTP {response.status_code}, retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple, Any
+from src.utils import setup_logging
+from src.rate_limiter import (TokenBucketLimiter, key_limits, parse_retry_after, get_rate_limiter,
+                              host_limit_configured)
+
+logger = setup_logging()
+
+def mask_key(key: str) -> str:
+    """Short, log-safe form of an API key"""
+    return f"{key[:4]}…{key[-4:]}" if len(key) > 8 else "****"
+
+def load_api_keys(provider: str, fallback_key: str = '') -> List[str]:
+    """Keys from <PROVIDER>_API_KEYS (comma-separated) and <PROVIDER>_API_KEYS_FILE (one per line)
+
+    The single fallback_key (e.g. TRONSCAN_API_KEY) is added too; duplicates and blanks are dropped.
+    """
+    prefix = provider.upper()
+    keys = os.getenv(f'{prefix}_API_KEYS', '').split(',')
+
+    keys_file = os.getenv(f'{prefix}_API_KEYS_FILE')
+    if keys_file:
+        try:
+            keys += [line for line in Path(keys_file).read_text().splitlines() if not line.strip().startswith('#')]
+        except OSError as e:
+            logger.warning(f"⚠️ Could not read {provider} API keys from {keys_file}: {e}")
+
+    keys.append(fallback_key or '')
+    return list(dict.fromkeys(key.strip() for key in keys if key and key.strip()))
+
+class ApiKeyPool:
+    """Round-robin API keys, each with its own rate budget, usage counters and 429 cooldown"""
+
+    def __init__(self, provider: str, keys: List[str], cooldown_seconds: float = None):
+        self.provider = provider
+        self.cooldown_seconds = cooldown_seconds or float(os.getenv('API_KEY_COOLDOWN_SECONDS', 60))
+
+        # Every key carries its own quota (<PROVIDER>_KEY_REQUESTS_PER_SECOND / _KEY_BURST)
+        rate, burst = key_limits(provider)
+        self.keys = [{
+            'key': key,
+            'limiter': TokenBucketLimiter(f"{provider} key {mask_key(key)}", rate, burst),
+            'requests': 0,
+            'throttled': 0,
+            'cooldown_until': 0.0
+        } for key in keys]
+        self._by_key = {state['key']: state for state in self.keys}
+
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def rate(self) -> float:
+        """Combined current requests/second across all keys"""
+        return sum(state['limiter'].rate for state in self.keys)
+
+    def _checkout(self) -> Tuple[Dict, float]:
+        """Pick the next key in rotation that isn't cooling down: (key state, seconds to wait first)"""
+        with self._lock:
+            now = time.monotonic()
+            for offset in range(len(self.keys)):
+                index = (self._next + offset) % len(self.keys)
+                state = self.keys[index]
+                if state['cooldown_until'] <= now:
+                    self._next = (index + 1) % len(self.keys)
+                    state['requests'] += 1
+                    return state, 0.0
+
+            # Every key is cooling down: take the one that comes back first
+            state = min(self.keys, key=lambda s: s['cooldown_until'])
+            state['requests'] += 1
+            return state, state['cooldown_until'] - now
+
+    def acquire(self) -> str:
+        """Block until a key may send its next request and return that key"""
+        state, wait = self._checkout()
+        if wait > 0:
+            logger.warning(f"⏳ All {len(self.keys)} {self.provider} API keys are cooling down, waiting {wait:.1f}s")
+            time.sleep(wait)
+
+        state['limiter'].acquire()
+        return state['key']
+
+    def record_response(self, key: str, status_code: int, retry_after: str = None):
+        """Feed a response back to the key that sent it; a 429 takes the key out of rotation for a while"""
+        state = self._by_key.get(key)
+        if state is None:
+            return
+
+        state['limiter'].record_response(status_code, retry_after)
+        if status_code != 429:
+            return
+
+        pause = max(self.cooldown_seconds, parse_retry_after(retry_after))
+        with self._lock:
+            state['throttled'] += 1
+            state['cooldown_until'] = time.monotonic() + pause
+        logger.warning(f"🔑 {self.provider} key {mask_key(key)} throttled, out of rotation for {pause:.0f}s")
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """Per-key usage: masked key, requests, 429s, current rate and whether it is cooling down"""
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                'key': mask_key(state['key']),
+                'requests': state['requests'],
+                'throttled': state['throttled'],
+                'rate': state['limiter'].rate,
+                'cooling_down': state['cooldown_until'] > now
+            } for state in self.keys]
+
+    def log_stats(self):
+        """Log one line per key"""
+        for stats in self.get_stats():
+            if not stats['requests']:
+                continue
+            logger.info(
+                f"🔑 {self.provider} key {stats['key']}: {stats['requests']} requests, {stats['throttled']} throttled, "
+                f"{stats['rate']:.2f} req/s" + (" (cooling down)" if stats['cooling_down'] else "")
+            )
+
+_pools: Dict[Tuple[str, Tuple[str, ...]], ApiKeyPool] = {}
+_pools_lock = threading.Lock()
+
+def get_key_pool(provider: str, fallback_key: str = '') -> ApiKeyPool:
+    """Get the process-wide key pool for a provider; empty when no keys are configured"""
+    keys = tuple(load_api_keys(provider, fallback_key))
+    with _pools_lock:
+        if (provider, keys) not in _pools:
+            pool = ApiKeyPool(provider, list(keys))
+            _pools[(provider, keys)] = pool
+            if len(keys) > 1:
+                logger.info(f"🔑 {provider}: rotating {len(keys)} API keys")
+
+            # The shared provider limiter caps the host on top of the keys; unless it is set
+            # explicitly it grows to the keys' combined quota, so each key adds throughput
+            if keys and not host_limit_configured(provider):
+                rate, burst = key_limits(provider)
+                get_rate_limiter(provider).raise_ceiling(rate * len(keys), burst * len(keys))
+        return _pools[(provider, keys)]
@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+from typing import List, Dict, Optional
+from src.utils import setup_logging, get_env_variable
+from src.tronscan_api import TronScanAPI
+
+logger = setup_logging()
+
+# Every provider returns USDT transfers in the shape the sheets already use
+CANONICAL_FIELDS = ('hash', 'wallet', 'amt_usdt', 'timestamp')
+
+class TronScanProvider:
+    """USDT transfers from TronScan (transfer list, falling back to transaction details)"""
+
+    name = 'tronscan'
+
+    def __init__(self, api: TronScanAPI = None):
+        self.api = api or TronScanAPI()
+
+    def fetch_transfers(self, address: str, start_timestamp: int, end_timestamp: int) -> List[Dict]:
+        """Canonical transfers for address in [start_timestamp, end_timestamp)"""
+        return self.api.get_usdt_transactions(address, start_timestamp, end_timestamp)
+
+class TronGridProvider:
+    """USDT transfers from TronGrid's TRC20 account history"""
+
+    name = 'trongrid'
+
+    def __init__(self, fetcher=None):
+        if fetcher is None:
+            # The TronGrid client lives in the standalone fetcher script at the repo root
+            from optimized_usdt_fetcher import USDTTransactionFetcher
+            fetcher = USDTTransactionFetcher(api_key=get_env_variable('TRONGRID_API_KEY', '') or None)
+        self.fetcher = fetcher
+
+    @staticmethod
+    def to_canonical(tx: Dict) -> Dict:
+        """Map a USDTTransactionFetcher record (signed amount_usdt, direction, ...) to the canonical shape"""
+        return {
+            'hash': tx['hash'],
+            'wallet': tx['wallet'],
+            'amt_usdt': tx['amount_abs'],
+            'timestamp': tx['timestamp']
+        }
+
+    def fetch_transfers(self, address: str, start_timestamp: int, end_timestamp: int) -> List[Dict]:
+        """Canonical transfers for address in [start_timestamp, end_timestamp)"""
+        # TronGrid's max_timestamp is inclusive
+        transactions = self.fetcher.get_usdt_transactions_between(address, start_timestamp, end_timestamp - 1)
+        records = [self.to_canonical(tx) for tx in transactions]
+        return sorted(records, key=lambda r: r['timestamp'], reverse=True)
+
+class ProviderRouter:
+    """Route each wallet query to the provider with the best recent latency and error rate
+
+    Health is an EWMA of seconds per query and of failures; a failing provider is skipped for
+    the next best one, and every probe_interval queries the runner-up is tried so a recovered
+    provider can win traffic back.
+    """
+
+    def __init__(self, providers: List, alpha: float = None, probe_interval: int = None):
+        self.providers = providers
+        self.alpha = alpha or float(os.getenv('PROVIDER_EWMA_ALPHA', 0.3))
+        self.probe_interval = probe_interval or int(os.getenv('PROVIDER_PROBE_INTERVAL', 20))
+
+        self.health = {provider.name: {'latency': None, 'error_rate': 0.0, 'queries': 0, 'failures': 0}
+                       for provider in providers}
+        self.failed_addresses = []
+        self._queries = 0
+        self._lock = threading.Lock()
+
+    def _score(self, provider) -> float:
+        """Lower is better; untried providers score 0 so they get measured, never-succeeded ones go last"""
+        health = self.health[provider.name]
+        if health['latency'] is None:
+            return float('inf') if health['failures'] else 0.0
+        return health['latency'] * (1 + 10 * health['error_rate'])
+
+    def _record(self, provider, elapsed: float, failed: bool):
+        """Fold one query's outcome into the provider's moving averages"""
+        with self._lock:
+            health = self.health[provider.name]
+            health['queries'] += 1
+            health['failures'] += int(failed)
+            health['error_rate'] += self.alpha * (float(failed) - health['error_rate'])
+            if not failed:
+                if health['latency'] is None:
+                    health['latency'] = elapsed
+                else:
+                    health['latency'] += self.alpha * (elapsed - health['latency'])
+
+    def ranked(self) -> List:
+        """Providers in the order the next query should try them"""
+        with self._lock:
+            self._queries += 1
+            ranked = sorted(self.providers, key=self._score)
+            if len(ranked) > 1 and self._queries % self.probe_interval == 0:
+                ranked[0], ranked[1] = ranked[1], ranked[0]
+            return ranked
+
+    def get_usdt_transactions(self, address: str, start_timestamp: int, end_timestamp: int) -> List[Dict]:
+        """Get USDT transactions for address from the healthiest provider, failing over on errors"""
+        errors = []
+
+        for provider in self.ranked():
+            started = time.perf_counter()
+            try:
+                transactions = provider.fetch_transfers(address, start_timestamp, end_timestamp)
+            except Exception as e:
+                self._record(provider, time.perf_counter() - started, failed=True)
+                logger.warning(f"🔀 {provider.name} failed for {address} ({e}), trying the next provider")
+                errors.append(f"{provider.name}: {e}")
+                continue
+
+            self._record(provider, time.perf_counter() - started, failed=False)
+            logger.info(f"Found {len(transactions)} USDT transfers for {address} via {provider.name}")
+            return transactions
+
+        raise RuntimeError(f"All providers failed for {address}: {'; '.join(errors)}")
+
+    def get_usdt_for_multiple_addresses(self, addresses: List[str], date_from: str, date_to: str,
+                                        since: Optional[Dict[str, int]] = None) -> List[Dict]:
+        """Get USDT transactions for multiple addresses (since: per-address start timestamps)"""
+        start_timestamp, end_timestamp = TronScanAPI.date_range_to_timestamps(date_from, date_to)
+        since = since or {}
+        self.failed_addresses = []
+
+        all_usdt_transactions = []
+
+        for i, address in enumerate(addresses, 1):
+            logger.info(f"Processing address {i}/{len(addresses)}: {address}")
+
+            try:
+                address_start = max(start_timestamp, since.get(address, start_timestamp))
+                usdt_transactions = self.get_usdt_transactions(address, address_start, end_timestamp)
+                all_usdt_transactions.extend(usdt_transactions)
+
+                total_usdt = sum(tx['amt_usdt'] for tx in usdt_transactions)
+                logger.info(f"✅ Address {address}: {len(usdt_transactions)} USDT transactions, Total: ${total_usdt:,.2f}")
+
+            except Exception as e:
+                logger.error(f"Failed to get USDT transactions for address {address}: {e}")
+                self.failed_addresses.append(address)
+
+        logger.info(f"🎉 Total USDT transactions found: {len(all_usdt_transactions)}")
+        logger.info(f"💰 Total USDT value: ${sum(tx['amt_usdt'] for tx in all_usdt_transactions):,.2f}")
+        self.log_health()
+        if self.failed_addresses:
+            logger.warning(f"⚠️ {len(self.failed_addresses)} addresses failed and are incomplete in the output: "
+                           f"{', '.join(self.failed_addresses)}")
+
+        return all_usdt_transactions
+
+    def log_health(self):
+        """Log one line per provider with its query count, failures and latency"""
+        for name, health in self.health.items():
+            latency = f"{health['latency']:.2f}s" if health['latency'] is not None else "n/a"
+            logger.info(f"🔀 {name}: {health['queries']} queries, {health['failures']} failures, "
+                        f"{latency} avg latency, {health['error_rate']:.0%} recent errors")
+
+def build_provider_client(name: str, tronscan_api: TronScanAPI = None):
+    """Client for --provider: a single provider or 'auto' to route between TronScan and TronGrid"""
+    tronscan = TronScanProvider(tronscan_api)
+    if name == 'tronscan':
+        return ProviderRouter([tronscan])
+    if name == 'trongrid':
+        return ProviderRouter([TronGridProvider()])
+    return ProviderRouter([tronscan, TronGridProvider()])
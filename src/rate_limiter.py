@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from src.utils import setup_logging
+
+logger = setup_logging()
+
+# Default sustained requests/second and burst size per provider (and per API key of it).
+# Override with <PROVIDER>_REQUESTS_PER_SECOND and <PROVIDER>_BURST; per-key budgets
+# with <PROVIDER>_KEY_REQUESTS_PER_SECOND and <PROVIDER>_KEY_BURST.
+PROVIDER_DEFAULTS = {
+    'tronscan': (5.0, 5),
+    'trongrid': (10.0, 10),
+    'coingecko': (0.5, 1),
+}
+
+def parse_retry_after(value: Optional[str]) -> float:
+    """Parse a Retry-After header (seconds or HTTP date) into seconds to wait"""
+    if not value:
+        return 0.0
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+class TokenBucketLimiter:
+    """Thread- and coroutine-safe token bucket with backoff on throttling responses"""
+
+    def __init__(self, name: str, rate: float, burst: int = 1, recovery_seconds: float = 30.0):
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = rate / 16
+        self.burst = max(burst, 1)
+        self.recovery_seconds = recovery_seconds
+
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_adjustment = self._updated
+        self._lock = threading.Lock()
+
+        self.stats = {'requests': 0, 'throttled': 0, 'waited_seconds': 0.0}
+
+    def _refill(self, now: float):
+        """Add tokens for the time elapsed since the last call, including time spent in flight"""
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def _recover(self, now: float):
+        """Step the rate back toward its ceiling after each quiet period without throttling"""
+        if self.rate < self.max_rate and now - self._last_adjustment >= self.recovery_seconds:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+            self._last_adjustment = now
+            logger.info(f"🔼 {self.name} rate limit recovering: {self.rate:.2f} req/s")
+
+    def raise_ceiling(self, rate: float, burst: int):
+        """Lift the sustained rate and burst to at least the given values (never lowers them)"""
+        with self._lock:
+            if rate > self.max_rate:
+                self.rate += rate - self.max_rate
+                self.max_rate = rate
+                self.min_rate = rate / 16
+            self.burst = max(self.burst, burst)
+
+    def reserve(self) -> float:
+        """Take one token and return how many seconds the caller must wait before sending"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._recover(now)
+
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            wait = max(wait, self._blocked_until - now)
+
+            self.stats['requests'] += 1
+            self.stats['waited_seconds'] += wait
+            return wait
+
+    def acquire(self):
+        """Block the calling thread until a request may be sent"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Suspend the calling coroutine until a request may be sent"""
+        # Imported here so the synchronous tools don't pay for loading asyncio at startup
+        import asyncio
+        
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record_response(self, status_code: int, retry_after: Optional[str] = None):
+        """Halve the rate on 429/5xx and honour Retry-After before the next request"""
+        if status_code != 429 and status_code < 500:
+            return
+
+        pause = parse_retry_after(retry_after)
+        with self._lock:
+            now = time.monotonic()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._last_adjustment = now
+            self._tokens = min(self._tokens, 0.0)
+            if pause:
+                self._blocked_until = max(self._blocked_until, now + pause)
+            self.stats['throttled'] += 1
+
+        logger.warning(f"🔽 {self.name} returned HTTP {status_code}, rate limit now {self.rate:.2f} req/s"
+                       + (f", pausing {pause:.1f}s" if pause else ""))
+
+def provider_limits(provider: str) -> Tuple[float, int]:
+    """Configured (requests/second, burst) for a provider"""
+    default_rate, default_burst = PROVIDER_DEFAULTS.get(provider, (1.0, 1))
+    rate = float(os.getenv(f'{provider.upper()}_REQUESTS_PER_SECOND', default_rate))
+    burst = int(os.getenv(f'{provider.upper()}_BURST', default_burst))
+    return rate, burst
+
+def host_limit_configured(provider: str) -> bool:
+    """Whether <PROVIDER>_REQUESTS_PER_SECOND sets the provider's host-wide rate explicitly"""
+    return f'{provider.upper()}_REQUESTS_PER_SECOND' in os.environ
+
+def key_limits(provider: str) -> Tuple[float, int]:
+    """Configured (requests/second, burst) of each API key of a provider, the provider's by default"""
+    default_rate, default_burst = provider_limits(provider)
+    rate = float(os.getenv(f'{provider.upper()}_KEY_REQUESTS_PER_SECOND', default_rate))
+    burst = int(os.getenv(f'{provider.upper()}_KEY_BURST', default_burst))
+    return rate, burst
+
+_limiters: Dict[str, TokenBucketLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(provider: str) -> TokenBucketLimiter:
+    """Get the process-wide limiter for a provider (tronscan, trongrid, coingecko)"""
+    with _limiters_lock:
+        if provider not in _limiters:
+            rate, burst = provider_limits(provider)
+            _limiters[provider] = TokenBucketLimiter(provider, rate, burst)
+        return _limiters[provider]
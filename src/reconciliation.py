@@ -0,0 +1,264 @@
+from typing import Dict, List, Tuple
+import numpy as np
+
+# Type codes double as the sort order of the EXCEPTION tab
+AMOUNT_DIFFERENT, IN_FORM_NOT_TRONSCAN, IN_TRONSCAN_NOT_FORM, MATCHED_BY_WALLET, MATCHED = range(5)
+EXCEPTION_TYPES = np.array(['AMOUNT_DIFFERENT', 'IN_FORM_NOT_TRONSCAN', 'IN_TRONSCAN_NOT_FORM',
+                            'MATCHED_BY_WALLET', 'MATCHED'], dtype=object)
+
+SEVERITY_OK, SEVERITY_LOW, SEVERITY_MEDIUM, SEVERITY_HIGH = range(4)
+SEVERITIES = np.array(['OK', 'LOW', 'MEDIUM', 'HIGH'], dtype=object)
+
+NOTES = np.array([
+    '',  # AMOUNT_DIFFERENT notes carry the difference and are formatted per row
+    'Transaction recorded in form but not found in blockchain',
+    'Blockchain transaction not recorded in form',
+    '',  # MATCHED_BY_WALLET notes carry the form's hash and are formatted per row
+    'Perfect match'
+], dtype=object)
+
+class ReconciliationSide:
+    """One side of the reconciliation as parallel column arrays
+
+    hash, amount and sheet row are required; wallet (Tron address) and timestamp (ms, 0 when
+    unknown) are only used by the secondary wallet/amount/time matching.
+    """
+
+    def __init__(self, hashes: np.ndarray, amounts: np.ndarray, rows: np.ndarray,
+                 wallets: np.ndarray = None, timestamps: np.ndarray = None):
+        self.hashes = hashes
+        self.amounts = amounts
+        self.rows = rows
+        self.wallets = wallets if wallets is not None else np.full(len(hashes), '', dtype=object)
+        self.timestamps = timestamps if timestamps is not None else np.zeros(len(hashes), dtype=np.int64)
+
+    @classmethod
+    def from_records(cls, records: Dict[str, Dict]) -> 'ReconciliationSide':
+        """Columns from the reader dicts ({hash: {'amount', 'row_number', 'wallet'?, 'timestamp'?}})"""
+        count = len(records)
+        values = records.values()
+        return cls(
+            hashes=np.array(list(records), dtype=str) if count else np.array([], dtype='<U1'),
+            amounts=np.fromiter((record['amount'] for record in values), dtype=np.float64, count=count),
+            rows=np.fromiter((record['row_number'] for record in values), dtype=np.int64, count=count),
+            wallets=np.array([record.get('wallet', '') for record in values], dtype=object),
+            timestamps=np.fromiter((record.get('timestamp') or 0 for record in values), dtype=np.int64, count=count)
+        )
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def _gather(self, index: np.ndarray):
+        """Amount, row, wallet and timestamp columns at index, with -1 (absent) giving 0.0 / 0 / '' / 0"""
+        present = index >= 0
+        safe = np.where(present, index, 0)
+        if not len(self):
+            return (np.zeros(len(index)), np.zeros(len(index), dtype=np.int64),
+                    np.full(len(index), '', dtype=object), np.zeros(len(index), dtype=np.int64))
+        return (np.where(present, self.amounts[safe], 0.0),
+                np.where(present, self.rows[safe], 0),
+                np.where(present, self.wallets[safe], ''),
+                np.where(present, self.timestamps[safe], 0))
+
+class ReconciliationResult:
+    """Outcome of reconciling MS_FORM against TRONSCAN, one entry per distinct hash, in sheet order"""
+
+    def __init__(self, hashes, type_codes, ms_form_amounts, tronscan_amounts, differences,
+                 tronscan_wallets, ms_form_rows, tronscan_rows, severity_codes, form_hashes):
+        self.hashes = hashes
+        self.type_codes = type_codes
+        self.ms_form_amounts = ms_form_amounts
+        self.tronscan_amounts = tronscan_amounts
+        self.differences = differences
+        self.tronscan_wallets = tronscan_wallets
+        self.ms_form_rows = ms_form_rows
+        self.tronscan_rows = tronscan_rows
+        self.severity_codes = severity_codes
+        self.form_hashes = form_hashes
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def type_counts(self) -> Dict[str, int]:
+        """Rows per exception type, for the types that occur"""
+        counts = np.bincount(self.type_codes, minlength=len(EXCEPTION_TYPES))
+        return {EXCEPTION_TYPES[code]: int(count) for code, count in enumerate(counts) if count}
+
+    def total_difference(self) -> float:
+        """Sum of the differences of every row that isn't a match"""
+        return float(self.differences[self.type_codes < MATCHED_BY_WALLET].sum())
+
+    def notes(self) -> np.ndarray:
+        """NOTES column, with the difference or the form's own hash spelled out where relevant"""
+        notes = NOTES[self.type_codes]
+        amount_different = self.type_codes == AMOUNT_DIFFERENT
+        if amount_different.any():
+            notes[amount_different] = np.char.mod('Amount differs by $%.2f', self.differences[amount_different]).astype(object)
+        by_wallet = self.type_codes == MATCHED_BY_WALLET
+        if by_wallet.any():
+            notes[by_wallet] = 'Matched on wallet, amount and time; form hash: ' + self.form_hashes[by_wallet]
+        return notes
+
+    def to_rows(self) -> List[List]:
+        """EXCEPTION tab rows: HASH, TYPE, MS_FORM_AMOUNT, TRONSCAN_AMOUNT, DIFFERENCE, WALLET, rows, SEVERITY, NOTES"""
+        ms_form_rows = self.ms_form_rows.astype(object)
+        ms_form_rows[self.ms_form_rows == 0] = 'N/A'
+        tronscan_rows = self.tronscan_rows.astype(object)
+        tronscan_rows[self.tronscan_rows == 0] = 'N/A'
+
+        columns = [
+            self.hashes,
+            EXCEPTION_TYPES[self.type_codes],
+            self.ms_form_amounts,
+            self.tronscan_amounts,
+            self.differences,
+            self.tronscan_wallets,
+            ms_form_rows,
+            tronscan_rows,
+            SEVERITIES[self.severity_codes],
+            self.notes()
+        ]
+        # Filling one object matrix and calling tolist() once is much cheaper than zipping columns
+        grid = np.empty((len(self), len(columns)), dtype=object)
+        for i, column in enumerate(columns):
+            grid[:, i] = column
+        return grid.tolist()
+
+def classify_severity(type_codes: np.ndarray, differences: np.ndarray) -> np.ndarray:
+    """Severity codes: OK when matched on hash, LOW for wallet matches, else LOW/MEDIUM/HIGH by difference
+
+    Missing rows are never LOW.
+    """
+    severity = np.where(differences < 100, SEVERITY_MEDIUM, SEVERITY_HIGH)
+    severity = np.where((type_codes == AMOUNT_DIFFERENT) & (differences < 1), SEVERITY_LOW, severity)
+    severity = np.where(type_codes == MATCHED_BY_WALLET, SEVERITY_LOW, severity)
+    return np.where(type_codes == MATCHED, SEVERITY_OK, severity).astype(np.int8)
+
+def match_residue(form_wallets: np.ndarray, form_amounts: np.ndarray, form_times: np.ndarray,
+                  chain_wallets: np.ndarray, chain_amounts: np.ndarray, chain_times: np.ndarray,
+                  tolerance: float, window_ms: int) -> List[Tuple[int, int]]:
+    """Pair unmatched form rows with unmatched chain transfers on wallet, |amount| and time
+
+    Each side is grouped by wallet and sorted by absolute amount, so the candidates for a form
+    row are found with a binary search for [amount - tolerance, amount + tolerance]; among
+    those still unpaired, the one closest in time (and within window_ms) wins. Rows without a
+    wallet or timestamp are never paired. Returns (form position, chain position) pairs.
+    """
+    pairs = []
+    form_usable = (form_wallets != '') & (form_times > 0)
+    chain_usable = (chain_wallets != '') & (chain_times > 0)
+
+    chain_by_wallet = {}
+    for position in np.flatnonzero(chain_usable):
+        chain_by_wallet.setdefault(chain_wallets[position], []).append(position)
+
+    form_by_wallet = {}
+    for position in np.flatnonzero(form_usable):
+        form_by_wallet.setdefault(form_wallets[position], []).append(position)
+
+    for wallet, form_positions in form_by_wallet.items():
+        chain_positions = chain_by_wallet.get(wallet)
+        if not chain_positions:
+            continue
+
+        # Per-wallet index: chain transfers sorted by absolute amount
+        chain_positions = np.array(chain_positions)
+        chain_abs = np.abs(chain_amounts[chain_positions])
+        order = np.argsort(chain_abs, kind='stable')
+        chain_positions, chain_abs = chain_positions[order], chain_abs[order]
+        taken = np.zeros(len(chain_positions), dtype=bool)
+
+        form_positions = np.array(form_positions)
+        form_abs = np.abs(form_amounts[form_positions])
+        lows = np.searchsorted(chain_abs, form_abs - tolerance, side='left')
+        highs = np.searchsorted(chain_abs, form_abs + tolerance, side='right')
+
+        for form_position, low, high in zip(form_positions, lows, highs):
+            if low == high:
+                continue
+            candidates = np.arange(low, high)[~taken[low:high]]
+            if not len(candidates):
+                continue
+            gaps = np.abs(chain_times[chain_positions[candidates]] - form_times[form_position])
+            best = np.argmin(gaps)
+            if gaps[best] <= window_ms:
+                taken[candidates[best]] = True
+                pairs.append((int(form_position), int(chain_positions[candidates[best]])))
+
+    return pairs
+
+def reconcile(ms_form: ReconciliationSide, tronscan: ReconciliationSide, tolerance: float = 0.01,
+              match_window_ms: int = 0) -> ReconciliationResult:
+    """Hash-keyed outer join of both sides, classified and sorted like the EXCEPTION tab
+
+    With match_window_ms > 0, the rows left IN_FORM_NOT_TRONSCAN and IN_TRONSCAN_NOT_FORM get a
+    second pass (match_residue) and each pair found becomes one MATCHED_BY_WALLET row.
+    Rows are ordered by type (AMOUNT_DIFFERENT, IN_FORM_NOT_TRONSCAN, IN_TRONSCAN_NOT_FORM,
+    MATCHED_BY_WALLET, MATCHED), then by largest difference, then by hash.
+    """
+    all_hashes, inverse = np.unique(np.concatenate([ms_form.hashes, tronscan.hashes]), return_inverse=True)
+    count = len(all_hashes)
+
+    # Position of each distinct hash on either side, -1 where it's absent
+    ms_form_index = np.full(count, -1, dtype=np.int64)
+    ms_form_index[inverse[:len(ms_form)]] = np.arange(len(ms_form))
+    tronscan_index = np.full(count, -1, dtype=np.int64)
+    tronscan_index[inverse[len(ms_form):]] = np.arange(len(tronscan))
+
+    in_ms_form = ms_form_index >= 0
+    in_tronscan = tronscan_index >= 0
+    ms_form_amounts, ms_form_rows, ms_form_wallets, ms_form_times = ms_form._gather(ms_form_index)
+    tronscan_amounts, tronscan_rows, tronscan_wallets, tronscan_times = tronscan._gather(tronscan_index)
+
+    absolute_difference = np.abs(ms_form_amounts - tronscan_amounts)
+    type_codes = np.where(
+        in_ms_form & in_tronscan,
+        np.where(absolute_difference <= tolerance, MATCHED, AMOUNT_DIFFERENT),
+        np.where(in_ms_form, IN_FORM_NOT_TRONSCAN, IN_TRONSCAN_NOT_FORM)
+    ).astype(np.int8)
+
+    # Missing rows report the amount of the side that has them (signed, as recorded)
+    differences = np.select(
+        [type_codes == MATCHED, type_codes == AMOUNT_DIFFERENT, type_codes == IN_FORM_NOT_TRONSCAN],
+        [0.0, absolute_difference, ms_form_amounts],
+        default=tronscan_amounts
+    )
+    form_hashes = np.full(count, '', dtype=object)
+    keep = np.ones(count, dtype=bool)
+
+    if match_window_ms > 0:
+        form_residue = np.flatnonzero(type_codes == IN_FORM_NOT_TRONSCAN)
+        chain_residue = np.flatnonzero(type_codes == IN_TRONSCAN_NOT_FORM)
+        pairs = match_residue(
+            ms_form_wallets[form_residue], ms_form_amounts[form_residue], ms_form_times[form_residue],
+            tronscan_wallets[chain_residue], tronscan_amounts[chain_residue], tronscan_times[chain_residue],
+            tolerance, match_window_ms
+        )
+        if pairs:
+            form_positions = form_residue[[form for form, _ in pairs]]
+            chain_positions = chain_residue[[chain for _, chain in pairs]]
+
+            # The chain row carries the match; the form row's hash moves into the notes
+            type_codes[chain_positions] = MATCHED_BY_WALLET
+            ms_form_amounts[chain_positions] = ms_form_amounts[form_positions]
+            ms_form_rows[chain_positions] = ms_form_rows[form_positions]
+            differences[chain_positions] = np.abs(np.abs(ms_form_amounts[form_positions]) - np.abs(tronscan_amounts[chain_positions]))
+            form_hashes[chain_positions] = all_hashes[form_positions].astype(object)
+            keep[form_positions] = False
+
+    severity_codes = classify_severity(type_codes, differences)
+
+    order = np.lexsort((all_hashes, -differences, type_codes))
+    order = order[keep[order]]
+    return ReconciliationResult(
+        hashes=all_hashes[order],
+        type_codes=type_codes[order],
+        ms_form_amounts=ms_form_amounts[order],
+        tronscan_amounts=tronscan_amounts[order],
+        differences=differences[order],
+        tronscan_wallets=tronscan_wallets[order],
+        ms_form_rows=ms_form_rows[order],
+        tronscan_rows=tronscan_rows[order],
+        severity_codes=severity_codes[order],
+        form_hashes=form_hashes[order]
+    )
@@ -0,0 +1,103 @@
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from src.utils import setup_logging
+
+logger = setup_logging()
+
+def fingerprint(record: Optional[Dict]) -> str:
+    """Fingerprint of everything reconciliation reads from one side's record ('' when the side lacks the hash)"""
+    if record is None:
+        return ''
+    return f"{record['amount']!r}|{record['row_number']}|{record.get('wallet', '')}|{record.get('timestamp') or 0}"
+
+class ReconciliationState:
+    """Per-hash reconciliation outcome of the last run, so the next one only revisits what changed
+
+    For every hash seen on either side it keeps the fingerprints of its MS_FORM and TRONSCAN
+    inputs, its exception type and the EXCEPTION tab row it was written to (none when a
+    wallet match folded it into another row). State is scoped per output tab.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = Path(path or os.getenv('RECONCILIATION_STATE_PATH', 'cache/reconciliation_state.sqlite'))
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS hashes ('
+            'scope TEXT NOT NULL, hash TEXT NOT NULL, ms_form_fingerprint TEXT NOT NULL, '
+            'tronscan_fingerprint TEXT NOT NULL, type TEXT NOT NULL, difference REAL NOT NULL, '
+            'sheet_row INTEGER, row_json TEXT, PRIMARY KEY (scope, hash))'
+        )
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS runs ('
+            'scope TEXT PRIMARY KEY, settings TEXT NOT NULL, next_row INTEGER NOT NULL, '
+            'summary_start INTEGER NOT NULL, summary_rows INTEGER NOT NULL)'
+        )
+        self._db.commit()
+
+    def get_run(self, scope: str) -> Optional[Dict]:
+        """Settings and tab layout of the last run for scope, None when there was none"""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT settings, next_row, summary_start, summary_rows FROM runs WHERE scope = ?', (scope,)
+            ).fetchone()
+        if not row:
+            return None
+        return {'settings': row[0], 'next_row': row[1], 'summary_start': row[2], 'summary_rows': row[3]}
+
+    def load(self, scope: str) -> Dict[str, Dict]:
+        """{hash: {'ms_form', 'tronscan', 'type', 'sheet_row', 'row'}} for every hash of the last run"""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT hash, ms_form_fingerprint, tronscan_fingerprint, type, sheet_row, row_json '
+                'FROM hashes WHERE scope = ?', (scope,)
+            ).fetchall()
+        return {
+            tx_hash: {'ms_form': ms_form, 'tronscan': tronscan, 'type': exc_type, 'sheet_row': sheet_row,
+                      'row': json.loads(row_json) if row_json else None}
+            for tx_hash, ms_form, tronscan, exc_type, sheet_row, row_json in rows
+        }
+
+    def type_totals(self, scope: str) -> Dict[str, Dict]:
+        """{type: {'count', 'difference'}} over the written rows, for the summary block"""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT type, COUNT(*), SUM(difference) FROM hashes '
+                'WHERE scope = ? AND sheet_row IS NOT NULL GROUP BY type', (scope,)
+            ).fetchall()
+        return {exc_type: {'count': count, 'difference': difference} for exc_type, count, difference in rows}
+
+    def save(self, scope: str, entries: Iterable[tuple], removed: Iterable[str], run: Dict, replace: bool = False):
+        """Upsert (hash, ms_form_fp, tronscan_fp, type, difference, sheet_row, row) entries in one transaction
+
+        replace drops everything stored for scope first (after a full rewrite of the tab).
+        """
+        with self._lock:
+            with self._db:
+                if replace:
+                    self._db.execute('DELETE FROM hashes WHERE scope = ?', (scope,))
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO hashes (scope, hash, ms_form_fingerprint, tronscan_fingerprint, '
+                    'type, difference, sheet_row, row_json) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    [(scope, tx_hash, ms_form, tronscan, exc_type, difference, sheet_row,
+                      json.dumps(row) if row is not None else None)
+                     for tx_hash, ms_form, tronscan, exc_type, difference, sheet_row, row in entries]
+                )
+                self._db.executemany('DELETE FROM hashes WHERE scope = ? AND hash = ?',
+                                     [(scope, tx_hash) for tx_hash in removed])
+                self._db.execute(
+                    'INSERT OR REPLACE INTO runs (scope, settings, next_row, summary_start, summary_rows) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (scope, run['settings'], run['next_row'], run['summary_start'], run['summary_rows'])
+                )
+
+    def close(self):
+        """Close the underlying SQLite connection"""
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,59 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+def to_text(value: Any) -> str:
+    """Sheet cell text for a raw value (None becomes an empty cell)"""
+    return '' if value is None else str(value)
+
+class RowSerializer:
+    """Flatten records into sheet rows for a fixed column tuple
+
+    Each column gets its formatter resolved once up front, so a row is a single pass over
+    (key, formatter) pairs. Records are plain dicts (missing keys give empty cells) or compact
+    tuples already in column order.
+    """
+
+    def __init__(self, columns: Sequence[str], headers: Sequence[str] = None,
+                 formatters: Optional[Dict[str, Callable[[Any], Any]]] = None):
+        self.columns: Tuple[str, ...] = tuple(columns)
+        self.headers: List[str] = list(headers or columns)
+        if len(self.headers) != len(self.columns):
+            raise ValueError(f"Expected {len(self.columns)} headers, got {len(self.headers)}")
+
+        formatters = formatters or {}
+        self._fields = tuple((column, formatters.get(column, to_text)) for column in self.columns)
+        self._formats = tuple(formatter for _, formatter in self._fields)
+
+    def row(self, record: Dict) -> List[Any]:
+        """One sheet row for a dict record"""
+        get = record.get
+        return [formatter(get(column)) for column, formatter in self._fields]
+
+    def rows(self, records: Iterable[Dict]) -> List[List[Any]]:
+        """Sheet rows for dict records, in order"""
+        fields = self._fields
+        return [[formatter(record.get(column)) for column, formatter in fields] for record in records]
+
+    def rows_from_tuples(self, records: Iterable[Sequence[Any]]) -> List[List[Any]]:
+        """Sheet rows for compact records whose values are already in column order"""
+        formats = self._formats
+        return [[formatter(value) for formatter, value in zip(formats, record)] for record in records]
+
+    def grid(self, records: Iterable[Dict]) -> List[List[Any]]:
+        """Header row followed by the rows for records"""
+        return [list(self.headers)] + self.rows(records)
+
+# Detailed transaction layout of the TRONSCAN tab written by historical_load / adhoc_load
+TRANSACTION_SERIALIZER = RowSerializer(
+    columns=(
+        'hash', 'block_number', 'timestamp', 'from_address', 'to_address',
+        'amount_raw', 'amount_formatted', 'amount_usdt', 'token_price_usdt',
+        'token_name', 'token_symbol', 'contract_address', 'transfer_type', 'fee',
+        'status', 'transaction_type', 'date_formatted', 'address_queried'
+    ),
+    headers=(
+        'Hash', 'Block Number', 'Timestamp', 'From Address', 'To Address',
+        'Amount (Raw)', 'Amount (Formatted)', 'Amount (USDT)', 'Token Price (USDT)',
+        'Token Name', 'Token Symbol', 'Contract Address', 'Transfer Type', 'Fee',
+        'Status', 'Transaction Type', 'Date', 'Queried Address'
+    )
+)
@@ -0,0 +1,63 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from src.utils import setup_logging
+
+logger = setup_logging()
+
+class SheetHashIndex:
+    """Local copy of each tab's hash column, valid while the spreadsheet's modifiedTime is unchanged"""
+
+    def __init__(self, path: str = None):
+        self.path = Path(path or os.getenv('SHEET_HASH_INDEX_PATH', 'cache/sheet_hash_index.json'))
+        self.entries = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        """Load the saved index from disk"""
+        if not self.path.exists():
+            return {}
+
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Could not read hash index from {self.path}, rebuilding: {e}")
+            return {}
+
+    def _save(self):
+        """Write the index atomically so a crash never leaves a truncated file"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.entries))
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _key(sheet_id: str, worksheet_name: str) -> str:
+        return f"{sheet_id}/{worksheet_name}"
+
+    def get(self, sheet_id: str, worksheet_name: str, modified_time: str) -> Optional[set]:
+        """Cached hashes for a tab, or None when there is no entry or the sheet changed since"""
+        entry = self.entries.get(self._key(sheet_id, worksheet_name))
+        if not entry or entry['modified_time'] != modified_time:
+            return None
+        return set(entry['hashes'])
+
+    def put(self, sheet_id: str, worksheet_name: str, hashes: Iterable[str], row_count: int, modified_time: str):
+        """Replace a tab's entry after reading (or rewriting) its whole hash column"""
+        self.entries[self._key(sheet_id, worksheet_name)] = {
+            'hashes': sorted(set(hashes)),
+            'row_count': row_count,
+            'modified_time': modified_time
+        }
+        self._save()
+
+    def add(self, sheet_id: str, worksheet_name: str, hashes: Iterable[str], appended_rows: int, modified_time: str):
+        """Fold rows we just appended into a tab's entry and move it to the new modifiedTime"""
+        entry = self.entries.get(self._key(sheet_id, worksheet_name))
+        if not entry:
+            return
+
+        entry['hashes'] = sorted(set(entry['hashes']).union(hashes))
+        entry['row_count'] += appended_rows
+        entry['modified_time'] = modified_time
+        self._save()
@@ -0,0 +1,95 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+import gspread
+from src.utils import setup_logging
+
+logger = setup_logging()
+
+class SheetMirror:
+    """SQLite snapshots of sheet tabs, reused while the spreadsheet's Drive modifiedTime is unchanged"""
+
+    def __init__(self, path: str = None):
+        self.path = Path(path or os.getenv('SHEET_MIRROR_PATH', 'cache/sheet_mirror.sqlite'))
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS snapshots ('
+            'sheet_id TEXT NOT NULL, worksheet TEXT NOT NULL, modified_time TEXT NOT NULL, '
+            'row_count INTEGER NOT NULL, fetched_at INTEGER NOT NULL, "values" TEXT NOT NULL, '
+            'PRIMARY KEY (sheet_id, worksheet))'
+        )
+        self._db.commit()
+
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def _snapshot(self, sheet_id: str, worksheet_name: str, modified_time: str) -> Optional[List[List[str]]]:
+        """Stored values for a tab if they were taken at this modifiedTime"""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT "values" FROM snapshots WHERE sheet_id = ? AND worksheet = ? AND modified_time = ?',
+                (sheet_id, worksheet_name, modified_time)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _store(self, sheet_id: str, worksheet_name: str, modified_time: str, values: List[List[str]]):
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO snapshots (sheet_id, worksheet, modified_time, row_count, fetched_at, "values") '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (sheet_id, worksheet_name, modified_time, len(values), int(time.time()), json.dumps(values))
+            )
+            self._db.commit()
+
+    def get_all_values(self, spreadsheet: gspread.Spreadsheet, worksheet_name: str) -> List[List[str]]:
+        """Same result as worksheet.get_all_values(), downloading the tab only when the spreadsheet changed
+
+        Raises gspread.WorksheetNotFound like the live read when the tab doesn't exist.
+        """
+        try:
+            modified_time = spreadsheet.get_lastUpdateTime()
+        except gspread.exceptions.APIError as e:
+            logger.warning(f"⚠️ Could not read modifiedTime for {spreadsheet.id}, reading {worksheet_name} live: {e}")
+            return spreadsheet.worksheet(worksheet_name).get_all_values()
+
+        values = self._snapshot(spreadsheet.id, worksheet_name, modified_time)
+        if values is not None:
+            self.stats['hits'] += 1
+            logger.info(f"📦 Using local snapshot of {worksheet_name} ({len(values)} rows, unchanged since {modified_time})")
+            return values
+
+        self.stats['misses'] += 1
+        values = spreadsheet.worksheet(worksheet_name).get_all_values()
+        self._store(spreadsheet.id, worksheet_name, modified_time, values)
+        return values
+
+    def invalidate(self, sheet_id: str, worksheet_name: str = None):
+        """Drop the snapshots for a spreadsheet (or one of its tabs)"""
+        with self._lock:
+            if worksheet_name is None:
+                self._db.execute('DELETE FROM snapshots WHERE sheet_id = ?', (sheet_id,))
+            else:
+                self._db.execute('DELETE FROM snapshots WHERE sheet_id = ? AND worksheet = ?', (sheet_id, worksheet_name))
+            self._db.commit()
+
+    def close(self):
+        """Close the underlying SQLite connection"""
+        with self._lock:
+            self._db.close()
+
+_mirror: Optional[SheetMirror] = None
+_mirror_lock = threading.Lock()
+
+def get_sheet_mirror() -> SheetMirror:
+    """Get the process-wide sheet mirror"""
+    global _mirror
+    with _mirror_lock:
+        if _mirror is None:
+            _mirror = SheetMirror()
+        return _mirror
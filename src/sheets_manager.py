@@ -1,10 +1,15 @@
 import gspread
 import json
-import os
-from google.oauth2.service_account import Credentials
+from contextlib import contextmanager
 from typing import List, Dict, Any, Optional
-import pandas as pd
+from collections import Counter
+from datetime import datetime
 from src.utils import setup_logging, get_env_variable
+from src.google_client import get_gspread_client, open_spreadsheet
+from src.sheet_hash_index import SheetHashIndex
+from src.sheet_mirror import get_sheet_mirror
+from src.sheets_write_queue import SheetsWriteQueue
+from src.row_serializer import TRANSACTION_SERIALIZER
 
 logger = setup_logging()
 
@@ -14,52 +19,17 @@ class GoogleSheetsManager:
     def __init__(self):
         self.sheet_id = get_env_variable('GOOGLE_SHEET_ID')
         self.client = self._authenticate()
-        self.workbook = self.client.open_by_key(self.sheet_id)
+        self.workbook = open_spreadsheet(self.sheet_id)
+        self.hash_index = SheetHashIndex()
+        self.mirror = get_sheet_mirror()
+        self.write_queue = SheetsWriteQueue(self.workbook)
+        self.bulk_upload_cells = int(get_env_variable('SHEETS_BULK_UPLOAD_CELLS', '200000'))
+        self._batch_depth = 0
     
     def _authenticate(self) -> gspread.Client:
-        """Authenticate with Google Sheets API using environment variables (secure method)"""
-        scope = [
-            'https://spreadsheets.google.com/feeds',
-            'https://www.googleapis.com/auth/drive'
-        ]
-        
+        """Get the shared, cached gspread client (credentials from environment variables or file)"""
         try:
-            # Method 1: Try environment variable first (most secure)
-            creds_json = os.getenv('GOOGLE_CREDENTIALS_JSON')
-            if creds_json:
-                logger.info("Using credentials from environment variable")
-                creds_data = json.loads(creds_json)
-                credentials = Credentials.from_service_account_info(creds_data, scopes=scope)
-                client = gspread.authorize(credentials)
-                
-                # Test access
-                workbook = client.open_by_key(self.sheet_id)
-                logger.info(f"Successfully authenticated and opened sheet: {workbook.title}")
-                return client
-            
-            # Method 2: Fallback to file (less secure, only for development)
-            creds_path = os.getenv('GOOGLE_SHEETS_CREDENTIALS_PATH', 'config/credentials.json')
-            if os.path.exists(creds_path):
-                logger.warning("Using credentials from file - consider using environment variables for production")
-                
-                with open(creds_path, 'r') as f:
-                    creds_data = json.load(f)
-                
-                if creds_data.get('type') != 'service_account':
-                    raise ValueError(f"Expected service_account, got: {creds_data.get('type')}")
-                
-                logger.info(f"Using service account: {creds_data.get('client_email')}")
-                
-                credentials = Credentials.from_service_account_file(creds_path, scopes=scope)
-                client = gspread.authorize(credentials)
-                
-                # Test access
-                workbook = client.open_by_key(self.sheet_id)
-                logger.info(f"Successfully opened sheet: {workbook.title}")
-                return client
-            
-            # No credentials found
-            raise ValueError("No credentials found. Set GOOGLE_CREDENTIALS_JSON environment variable or provide credentials file")
+            return get_gspread_client()
             
         except json.JSONDecodeError as e:
             logger.error(f"Invalid JSON in credentials: {e}")
@@ -112,13 +82,15 @@ class GoogleSheetsManager:
             logger.error(f"Failed to read addresses from {worksheet_name}: {e}")
             raise
     
+    def read_worksheet_values(self, worksheet_name: str) -> List[List[str]]:
+        """get_all_values() for a tab, served from the local mirror while the spreadsheet is unchanged"""
+        return self.mirror.get_all_values(self.workbook, worksheet_name)
+    
     def read_all_data_from_sheet(self, worksheet_name: str = "WALLET_LIST") -> List[Dict]:
         """Read all data from worksheet and return as list of dictionaries"""
         try:
-            worksheet = self.workbook.worksheet(worksheet_name)
-            
             # Get all data as list of lists
-            all_values = worksheet.get_all_values()
+            all_values = self.read_worksheet_values(worksheet_name)
             
             if not all_values:
                 logger.warning(f"No data found in worksheet {worksheet_name}")
@@ -196,67 +168,81 @@ class GoogleSheetsManager:
             logger.error(f"Failed to list worksheets: {e}")
             raise
     
+    def get_or_create_worksheet(self, worksheet_name: str, rows: int = 1000, cols: int = 20) -> gspread.Worksheet:
+        """Get a worksheet by name, creating it if it doesn't exist"""
+        try:
+            worksheet = self.workbook.worksheet(worksheet_name)
+            logger.info(f"Using existing worksheet: {worksheet_name}")
+        except gspread.WorksheetNotFound:
+            worksheet = self.workbook.add_worksheet(title=worksheet_name, rows=rows, cols=cols)
+            logger.info(f"Created new worksheet: {worksheet_name}")
+        return worksheet
+    
+    @contextmanager
+    def batched_writes(self):
+        """Queue tab writes made inside the block and send them as coalesced batchUpdate calls on exit
+        
+        Nothing queued is sent if the block raises.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.write_queue.discard()
+            raise
+        
+        self._batch_depth -= 1
+        if not self._batch_depth:
+            self.write_queue.flush()
+    
+    def flush_writes(self):
+        """Send queued writes now unless a batched_writes() block will send them later"""
+        if not self._batch_depth:
+            self.write_queue.flush()
+    
+    def write_grid(self, worksheet_name: str, grid: List[List[Any]], rows: int = 1000, cols: int = 20) -> gspread.Worksheet:
+        """Replace a tab's contents with a complete 2D grid (headers, data, totals, summary)
+
+        The resize (when needed), clear and write go out as one atomic batchUpdate through the
+        quota-aware write queue, so a throttled write is retried instead of leaving a cleared tab.
+        Grids of at least SHEETS_BULK_UPLOAD_CELLS cells are bulk-loaded right away instead (one
+        resize, then concurrent ranged chunks, row count verified), even inside batched_writes().
+        """
+        worksheet = self.get_or_create_worksheet(worksheet_name, rows=rows, cols=cols)
+        cells = len(grid) * max((len(row) for row in grid), default=0)
+        if cells >= self.bulk_upload_cells:
+            self.write_queue.upload_tab(worksheet, grid)
+            logger.info(f"Wrote {len(grid)} rows for {worksheet_name}")
+            return worksheet
+        
+        self.write_queue.replace_tab(worksheet, grid)
+        self.flush_writes()
+        
+        logger.info(f"{'Queued' if self._batch_depth else 'Wrote'} {len(grid)} rows for {worksheet_name}")
+        return worksheet
+    
+    def update_rows(self, worksheet_name: str, rows: Dict[int, List[Any]], cols: int = 20) -> gspread.Worksheet:
+        """Overwrite individual rows of a tab in place ({1-based row number: values}) in one batchUpdate"""
+        worksheet = self.get_or_create_worksheet(worksheet_name, rows=max(rows, default=1), cols=cols)
+        self.write_queue.update_rows(worksheet, rows)
+        self.flush_writes()
+        
+        logger.info(f"{'Queued' if self._batch_depth else 'Wrote'} {len(rows)} changed rows for {worksheet_name}")
+        return worksheet
+    
     def write_transactions_to_sheet(self, transactions: List[Dict], worksheet_name: str = "TRONSCAN"):
         """Write transaction data to specified worksheet"""
         try:
-            # Try to get existing worksheet or create new one
-            try:
-                worksheet = self.workbook.worksheet(worksheet_name)
-                logger.info(f"Using existing worksheet: {worksheet_name}")
-            except gspread.WorksheetNotFound:
-                worksheet = self.workbook.add_worksheet(title=worksheet_name, rows=1000, cols=20)
-                logger.info(f"Created new worksheet: {worksheet_name}")
-            
             if not transactions:
                 logger.warning("No transactions to write")
                 return
             
-            # Prepare data for Google Sheets
-            df = pd.DataFrame(transactions)
-            
-            # Define column order and headers with USDT conversion and transfer type
-            columns = [
-                'hash', 'block_number', 'timestamp', 'from_address', 'to_address',
-                'amount_raw', 'amount_formatted', 'amount_usdt', 'token_price_usdt',
-                'token_name', 'token_symbol', 'contract_address', 'transfer_type', 'fee',
-                'status', 'transaction_type', 'date_formatted', 'address_queried'
-            ]
-            
-            # Ensure all columns exist
-            for col in columns:
-                if col not in df.columns:
-                    df[col] = ''
-            
-            # Reorder columns
-            df = df[columns]
-            
-            # Clear existing data and write headers
-            worksheet.clear()
-            
-            # Write headers with clear descriptions
-            headers = [
-                'Hash', 'Block Number', 'Timestamp', 'From Address', 'To Address',
-                'Amount (Raw)', 'Amount (Formatted)', 'Amount (USDT)', 'Token Price (USDT)',
-                'Token Name', 'Token Symbol', 'Contract Address', 'Transfer Type', 'Fee',
-                'Status', 'Transaction Type', 'Date', 'Queried Address'
-            ]
-            worksheet.append_row(headers)
-            
-            # Write data in batches
-            batch_size = int(get_env_variable('BATCH_SIZE', '100'))
-            
-            total_batches = (len(df) + batch_size - 1) // batch_size
-            
-            for i in range(0, len(df), batch_size):
-                batch_num = i // batch_size + 1
-                batch = df.iloc[i:i+batch_size]
-                values = batch.values.tolist()
-                
-                # Convert all values to strings to avoid type issues
-                values = [[str(cell) if cell is not None else '' for cell in row] for row in values]
-                
-                worksheet.append_rows(values)
-                logger.info(f"Written batch {batch_num}/{total_batches}, rows {i+1} to {min(i+batch_size, len(df))}")
+            # Header plus one row per transaction, in the fixed TRONSCAN column order
+            grid = TRANSACTION_SERIALIZER.grid(transactions)
+            
+            self.write_grid(worksheet_name, grid, rows=1000, cols=20)
             
             logger.info(f"Successfully wrote {len(transactions)} transactions to {worksheet_name}")
             
@@ -273,34 +259,10 @@ class GoogleSheetsManager:
                 logger.warning("No transactions to append")
                 return
             
-            df = pd.DataFrame(transactions)
-            
-            # Define column order
-            columns = [
-                'hash', 'block_number', 'timestamp', 'from_address', 'to_address',
-                'amount_raw', 'amount_formatted', 'amount_usdt', 'token_price_usdt',
-                'token_name', 'token_symbol', 'contract_address', 'transfer_type', 'fee',
-                'status', 'transaction_type', 'date_formatted', 'address_queried'
-            ]
-            
-            # Ensure all columns exist and reorder
-            for col in columns:
-                if col not in df.columns:
-                    df[col] = ''
-            df = df[columns]
-            
-            # Append data
-            values = df.values.tolist()
-            values = [[str(cell) if cell is not None else '' for cell in row] for row in values]
-            
-            batch_size = int(get_env_variable('BATCH_SIZE', '100'))
-            total_batches = (len(values) + batch_size - 1) // batch_size
-            
-            for i in range(0, len(values), batch_size):
-                batch_num = i // batch_size + 1
-                batch = values[i:i+batch_size]
-                worksheet.append_rows(batch)
-                logger.info(f"Appended batch {batch_num}/{total_batches}")
+            # Append data in a single request
+            values = TRANSACTION_SERIALIZER.rows(transactions)
+            self.write_queue.append_rows(worksheet, values)
+            self.flush_writes()
             
             logger.info(f"Appended {len(transactions)} transactions to {worksheet_name}")
             
@@ -309,18 +271,22 @@ class GoogleSheetsManager:
             raise
     
     def get_existing_transaction_hashes(self, worksheet_name: str = "TRONSCAN") -> set:
-        """Get set of existing transaction hashes to avoid duplicates"""
+        """Get set of existing transaction hashes to avoid duplicates
+        
+        Served from the local hash index while the spreadsheet's modifiedTime is unchanged;
+        otherwise only the header row and the hash column are downloaded to rebuild it.
+        """
         try:
-            worksheet = self.workbook.worksheet(worksheet_name)
-            
-            # Get all values from the hash column (assuming it's column A after headers)
-            all_values = worksheet.get_all_values()
+            modified_time = self.workbook.get_lastUpdateTime()
+            existing_hashes = self.hash_index.get(self.sheet_id, worksheet_name, modified_time)
+            if existing_hashes is not None:
+                logger.info(f"Found {len(existing_hashes)} existing transaction hashes (cached, sheet unchanged)")
+                return existing_hashes
             
-            if len(all_values) <= 1:  # Only headers or empty
-                return set()
+            worksheet = self.workbook.worksheet(worksheet_name)
             
             # Find the hash column index
-            headers = all_values[0]
+            headers = worksheet.row_values(1)
             try:
                 hash_col_index = headers.index('Hash')
             except ValueError:
@@ -328,10 +294,9 @@ class GoogleSheetsManager:
                 hash_col_index = 0
             
             # Extract hashes (skip header row)
-            existing_hashes = set()
-            for row in all_values[1:]:
-                if hash_col_index < len(row) and row[hash_col_index]:
-                    existing_hashes.add(row[hash_col_index])
+            column_values = worksheet.col_values(hash_col_index + 1)
+            existing_hashes = {value for value in column_values[1:] if value}
+            self.hash_index.put(self.sheet_id, worksheet_name, existing_hashes, len(column_values), modified_time)
             
             logger.info(f"Found {len(existing_hashes)} existing transaction hashes")
             return existing_hashes
@@ -368,10 +333,15 @@ class GoogleSheetsManager:
             logger.info(f"Writing {len(new_transactions)} new transactions")
             
             if new_transactions:
+                new_hashes = [tx['hash'] for tx in new_transactions]
                 if existing_hashes:  # Append to existing data
                     self.append_transactions_to_sheet(new_transactions, worksheet_name)
+                    self.hash_index.add(self.sheet_id, worksheet_name, new_hashes, len(new_transactions),
+                                        self.workbook.get_lastUpdateTime())
                 else:  # Write fresh data
                     self.write_transactions_to_sheet(new_transactions, worksheet_name)
+                    self.hash_index.put(self.sheet_id, worksheet_name, new_hashes, len(new_transactions) + 1,
+                                        self.workbook.get_lastUpdateTime())
             else:
                 logger.info("No new transactions to write")
             
@@ -379,6 +349,22 @@ class GoogleSheetsManager:
             logger.error(f"Failed to write unique transactions to {worksheet_name}: {e}")
             raise
     
+    @staticmethod
+    def _value_counts(transactions: List[Dict], field: str) -> Optional[Counter]:
+        """Counts of the non-empty values of field, or None when no transaction has it"""
+        if not any(field in tx for tx in transactions):
+            return None
+        return Counter(tx[field] for tx in transactions if tx.get(field) not in (None, ''))
+    
+    @staticmethod
+    def _parse_date(value: Any) -> Optional[datetime]:
+        """Parse an ISO-like date string, None when it isn't one"""
+        try:
+            parsed = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        return parsed.replace(tzinfo=None)
+    
     def create_summary_sheet(self, transactions: List[Dict], worksheet_name: str = "SUMMARY"):
         """Create a summary sheet with transaction statistics"""
         try:
@@ -386,61 +372,46 @@ class GoogleSheetsManager:
                 logger.warning("No transactions to summarize")
                 return
             
-            # Try to get existing worksheet or create new one
-            try:
-                worksheet = self.workbook.worksheet(worksheet_name)
-            except gspread.WorksheetNotFound:
-                worksheet = self.workbook.add_worksheet(title=worksheet_name, rows=100, cols=10)
-                logger.info(f"Created new summary worksheet: {worksheet_name}")
-            
-            # Clear existing data
-            worksheet.clear()
-            
-            df = pd.DataFrame(transactions)
-            
             # Create summary data
             summary_data = []
             
             # Total transactions
-            summary_data.append(['Total Transactions', len(df)])
+            summary_data.append(['Total Transactions', len(transactions)])
             summary_data.append([''])  # Empty row
             
             # By address
-            if 'address_queried' in df.columns:
-                address_counts = df['address_queried'].value_counts()
+            address_counts = self._value_counts(transactions, 'address_queried')
+            if address_counts is not None:
                 summary_data.append(['Transactions by Address:', ''])
-                for address, count in address_counts.head(20).items():  # Top 20
+                for address, count in address_counts.most_common(20):  # Top 20
                     summary_data.append([address, count])
                 summary_data.append([''])  # Empty row
             
             # By token
-            if 'token_symbol' in df.columns:
-                token_counts = df['token_symbol'].value_counts()
+            token_counts = self._value_counts(transactions, 'token_symbol')
+            if token_counts is not None:
                 summary_data.append(['Transactions by Token:', ''])
-                for token, count in token_counts.head(20).items():  # Top 20
+                for token, count in token_counts.most_common(20):  # Top 20
                     summary_data.append([token, count])
                 summary_data.append([''])  # Empty row
             
             # By status
-            if 'status' in df.columns:
-                status_counts = df['status'].value_counts()
+            status_counts = self._value_counts(transactions, 'status')
+            if status_counts is not None:
                 summary_data.append(['Transactions by Status:', ''])
-                for status, count in status_counts.items():
+                for status, count in status_counts.most_common():
                     summary_data.append([status, count])
                 summary_data.append([''])  # Empty row
             
             # Date range
-            if 'date_formatted' in df.columns:
-                dates = pd.to_datetime(df['date_formatted'], errors='coerce')
-                dates = dates.dropna()
-                if not dates.empty:
-                    summary_data.append(['Date Range:', ''])
-                    summary_data.append(['Earliest Transaction', dates.min().strftime('%Y-%m-%d')])
-                    summary_data.append(['Latest Transaction', dates.max().strftime('%Y-%m-%d')])
+            dates = [date for date in map(self._parse_date, (tx.get('date_formatted') for tx in transactions)) if date]
+            if dates:
+                summary_data.append(['Date Range:', ''])
+                summary_data.append(['Earliest Transaction', min(dates).strftime('%Y-%m-%d')])
+                summary_data.append(['Latest Transaction', max(dates).strftime('%Y-%m-%d')])
             
             # Write summary data
-            for row in summary_data:
-                worksheet.append_row(row)
+            self.write_grid(worksheet_name, summary_data, rows=100, cols=10)
             
             logger.info(f"Created summary sheet with {len(summary_data)} rows")
             
@@ -451,60 +422,75 @@ class GoogleSheetsManager:
     # Add this method to your existing GoogleSheetsManager class in src/sheets_manager.py
 
     def write_usdt_transactions_to_sheet(self, transactions: List[Dict], worksheet_name: str = "TRONSCAN"):
-        """Write simplified USDT transactions (HASH, WALLET, AMT) to sheet"""
+        """Write simplified USDT transactions (HASH, WALLET, AMT, TIMESTAMP in ms) to sheet"""
         try:
-            # Try to get existing worksheet or create new one
-            try:
-                worksheet = self.workbook.worksheet(worksheet_name)
-                logger.info(f"Using existing worksheet: {worksheet_name}")
-            except gspread.WorksheetNotFound:
-                worksheet = self.workbook.add_worksheet(title=worksheet_name, rows=1000, cols=10)
-                logger.info(f"Created new worksheet: {worksheet_name}")
-            
             if not transactions:
                 logger.warning("No USDT transactions to write")
                 return
             
-            # Clear existing data and write headers
-            worksheet.clear()
-            
-            # Write headers
-            headers = ['HASH', 'WALLET', 'AMT']
-            worksheet.append_row(headers)
-            
-            # Prepare data
-            rows_to_write = []
+            # Headers, data and the TOTAL row go out as one grid
+            headers = ['HASH', 'WALLET', 'AMT', 'TIMESTAMP']
+            rows_to_write = [headers]
             for tx in transactions:
                 row = [
                     tx.get('hash', ''),
                     tx.get('wallet', ''),
-                    float(tx.get('amt_usdt', 0))
+                    float(tx.get('amt_usdt', 0)),
+                    tx.get('timestamp') or ''
                 ]
                 rows_to_write.append(row)
             
-            # Write data in batches
-            batch_size = 100
-            total_batches = (len(rows_to_write) + batch_size - 1) // batch_size
-            
-            for i in range(0, len(rows_to_write), batch_size):
-                batch_num = i // batch_size + 1
-                batch = rows_to_write[i:i+batch_size]
-                worksheet.append_rows(batch)
-                logger.info(f"Written batch {batch_num}/{total_batches}")
-            
-            logger.info(f"✅ Successfully wrote {len(transactions)} USDT transactions to {worksheet_name}")
-            
             # Add summary at the bottom
             total_usdt = sum(tx.get('amt_usdt', 0) for tx in transactions)
-            summary_row = ['', 'TOTAL:', total_usdt]
-            worksheet.append_row(summary_row)
+            rows_to_write.append(['', 'TOTAL:', total_usdt, ''])
             
+            self.write_grid(worksheet_name, rows_to_write, rows=1000, cols=10)
+            
+            logger.info(f"✅ Successfully wrote {len(transactions)} USDT transactions to {worksheet_name}")
             logger.info(f"💰 Total USDT value: ${total_usdt:,.2f}")
             
         except Exception as e:
             logger.error(f"Failed to write USDT transactions to {worksheet_name}: {e}")
             raise
 
+    def read_usdt_transactions_from_sheet(self, worksheet_name: str = "TRONSCAN") -> List[Dict]:
+        """Read simplified USDT transactions (HASH, WALLET, AMT, TIMESTAMP) back from a sheet, skipping the TOTAL row"""
+        try:
+            all_values = self.read_worksheet_values(worksheet_name)
+        except gspread.WorksheetNotFound:
+            logger.info(f"Worksheet {worksheet_name} not found, no existing USDT transactions")
+            return []
+        
+        if len(all_values) <= 1:
+            return []
+        
+        headers = [h.strip().upper() for h in all_values[0]]
+        hash_col = headers.index('HASH') if 'HASH' in headers else 0
+        wallet_col = headers.index('WALLET') if 'WALLET' in headers else 1
+        amt_col = headers.index('AMT') if 'AMT' in headers else 2
+        # Sheets written before the TIMESTAMP column was added don't have it
+        timestamp_col = headers.index('TIMESTAMP') if 'TIMESTAMP' in headers else None
+        
+        transactions = []
+        for row in all_values[1:]:
+            if len(row) <= max(hash_col, wallet_col, amt_col) or not row[hash_col].strip():
+                continue
+            try:
+                amount = float(row[amt_col].replace(',', ''))
+            except ValueError:
+                continue
+            transaction = {
+                'hash': row[hash_col].strip(),
+                'wallet': row[wallet_col].strip(),
+                'amt_usdt': amount
+            }
+            if timestamp_col is not None and len(row) > timestamp_col and row[timestamp_col].strip().isdigit():
+                transaction['timestamp'] = int(row[timestamp_col])
+            transactions.append(transaction)
+        
+        logger.info(f"Read {len(transactions)} existing USDT transactions from {worksheet_name}")
+        return transactions
+
     # Add this method to your existing GoogleSheetsManager class
 
 def get_worksheet_data_as_dict(self, worksheet_name: str, key_column: str) -> Dict[str, Dict]:
@@ -0,0 +1,308 @@
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+import gspread
+from gspread.utils import absolute_range_name, rowcol_to_a1
+from src.utils import setup_logging
+
+logger = setup_logging()
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def to_cell(value: Any) -> Dict:
+    """CellData for a raw value (like value_input_option RAW: strings stay strings)"""
+    if value is None or value == '':
+        return {}
+    if isinstance(value, bool):
+        return {'userEnteredValue': {'boolValue': value}}
+    if isinstance(value, (int, float)) and math.isfinite(value):
+        return {'userEnteredValue': {'numberValue': value}}
+    return {'userEnteredValue': {'stringValue': str(value)}}
+
+def to_row_data(row: List[Any]) -> Dict:
+    return {'values': [to_cell(value) for value in row]}
+
+class QuotaWindow:
+    """Sliding one-minute window of the write requests sent under one Sheets write quota"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.sent = deque()
+        self.lock = threading.Lock()
+
+    def wait(self, requests_per_minute: int) -> float:
+        """Block until one more request fits in the window and record it; returns the seconds waited"""
+        waited = 0.0
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                while self.sent and now - self.sent[0] >= 60:
+                    self.sent.popleft()
+                if len(self.sent) < requests_per_minute:
+                    break
+
+                wait = 60 - (now - self.sent[0])
+                logger.info(f"⏳ Sheets write quota ({requests_per_minute}/min) reached for {self.name}, "
+                            f"waiting {wait:.1f}s")
+                time.sleep(wait)
+                waited += wait
+
+            self.sent.append(time.monotonic())
+        return waited
+
+_windows: Dict[str, QuotaWindow] = {}
+_windows_lock = threading.Lock()
+
+def get_quota_window(key: str) -> QuotaWindow:
+    """Get the process-wide write quota window for a key (the service account the writes run as)"""
+    with _windows_lock:
+        if key not in _windows:
+            _windows[key] = QuotaWindow(key)
+        return _windows[key]
+
+def quota_key(spreadsheet: gspread.Spreadsheet) -> str:
+    """The write quota is per project and user, i.e. per service account, across all spreadsheets"""
+    credentials = getattr(getattr(spreadsheet, 'client', None), 'auth', None)
+    return getattr(credentials, 'service_account_email', None) or 'default'
+
+class SheetsWriteQueue:
+    """Coalesces tab writes into spreadsheets.batchUpdate calls paced under the per-minute write quota
+
+    A tab rewrite (resize, clear and new values) always travels inside a single batchUpdate, which
+    the API applies atomically, so a throttled or failed call never leaves a cleared tab behind and
+    can simply be retried. Queues writing as the same service account pace against one shared
+    quota window, so several sheets managers in a process stay under the quota together.
+    """
+
+    def __init__(self, spreadsheet: gspread.Spreadsheet, requests_per_minute: int = None,
+                 max_cells_per_batch: int = None, max_retries: int = None):
+        self.spreadsheet = spreadsheet
+        self.requests_per_minute = requests_per_minute or int(os.getenv('SHEETS_WRITE_REQUESTS_PER_MINUTE', 60))
+        self.max_cells_per_batch = max_cells_per_batch or int(os.getenv('SHEETS_MAX_CELLS_PER_BATCH', 50000))
+        self.max_retries = max_retries or int(os.getenv('SHEETS_WRITE_MAX_RETRIES', 5))
+        self.upload_chunk_rows = int(os.getenv('SHEETS_UPLOAD_CHUNK_ROWS', 5000))
+        self.upload_workers = int(os.getenv('SHEETS_UPLOAD_WORKERS', 4))
+
+        self._pending = []
+        self._window = get_quota_window(quota_key(spreadsheet))
+        self._lock = threading.Lock()
+
+        self.stats = {'batches': 0, 'requests': 0, 'retries': 0, 'waited_seconds': 0.0, 'chunks': 0}
+
+    def _enqueue(self, worksheet: gspread.Worksheet, requests: List[Dict], cells: int, replaces_tab: bool = False):
+        with self._lock:
+            # A full rewrite makes anything still queued for the same tab redundant
+            if replaces_tab:
+                self._pending = [entry for entry in self._pending if entry['sheet_id'] != worksheet.id]
+            self._pending.append({'sheet_id': worksheet.id, 'title': worksheet.title, 'requests': requests, 'cells': cells})
+
+    def replace_tab(self, worksheet: gspread.Worksheet, grid: List[List[Any]]):
+        """Queue a resize (when needed), clear and write of the full grid for one tab"""
+        row_count = len(grid)
+        col_count = max((len(row) for row in grid), default=0)
+        requests = []
+
+        if row_count > worksheet.row_count or col_count > worksheet.col_count:
+            requests.append({'updateSheetProperties': {
+                'properties': {'sheetId': worksheet.id, 'gridProperties': {
+                    'rowCount': max(row_count, worksheet.row_count),
+                    'columnCount': max(col_count, worksheet.col_count)
+                }},
+                'fields': 'gridProperties(rowCount,columnCount)'
+            }})
+
+        requests.append({'updateCells': {'range': {'sheetId': worksheet.id}, 'fields': 'userEnteredValue'}})
+
+        if grid:
+            requests.append({'updateCells': {
+                'start': {'sheetId': worksheet.id, 'rowIndex': 0, 'columnIndex': 0},
+                'rows': [to_row_data(row) for row in grid],
+                'fields': 'userEnteredValue'
+            }})
+
+        self._enqueue(worksheet, requests, row_count * col_count, replaces_tab=True)
+
+    def update_rows(self, worksheet: gspread.Worksheet, rows: Dict[int, List[Any]]):
+        """Queue in-place writes of individual rows ({1-based row number: values}), growing the tab if needed
+
+        Contiguous row numbers share one updateCells request; cells beyond a row's values are
+        left untouched, so pad rows that should overwrite wider content.
+        """
+        if not rows:
+            return
+
+        requests = []
+        last_row = max(rows)
+        if last_row > worksheet.row_count:
+            requests.append({'updateSheetProperties': {
+                'properties': {'sheetId': worksheet.id, 'gridProperties': {'rowCount': last_row}},
+                'fields': 'gridProperties.rowCount'
+            }})
+
+        run = []
+        for row_number in sorted(rows):
+            if run and row_number != run[-1] + 1:
+                requests.append(self._update_run(worksheet, run, rows))
+                run = []
+            run.append(row_number)
+        requests.append(self._update_run(worksheet, run, rows))
+
+        self._enqueue(worksheet, requests, sum(len(values) for values in rows.values()))
+
+    @staticmethod
+    def _update_run(worksheet: gspread.Worksheet, run: List[int], rows: Dict[int, List[Any]]) -> Dict:
+        return {'updateCells': {
+            'start': {'sheetId': worksheet.id, 'rowIndex': run[0] - 1, 'columnIndex': 0},
+            'rows': [to_row_data(rows[row_number]) for row_number in run],
+            'fields': 'userEnteredValue'
+        }}
+
+    def append_rows(self, worksheet: gspread.Worksheet, rows: List[List[Any]]):
+        """Queue rows to append after the last row with data (new rows are inserted as needed)"""
+        if not rows:
+            return
+        requests = [{'appendCells': {
+            'sheetId': worksheet.id,
+            'rows': [to_row_data(row) for row in rows],
+            'fields': 'userEnteredValue'
+        }}]
+        self._enqueue(worksheet, requests, sum(len(row) for row in rows))
+
+    def discard(self):
+        """Drop everything queued without sending it"""
+        with self._lock:
+            self._pending = []
+
+    def flush(self):
+        """Send queued writes, packing whole tabs into batches of at most max_cells_per_batch cells
+
+        If a batch fails, it and every entry after it go back to the front of the queue (in
+        order) before the error is raised, so a later flush can still send them.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+
+        batches = []
+        batch, cells = [], 0
+        for entry in pending:
+            # A single oversized tab still goes out alone in one batch so it stays atomic
+            if batch and cells + entry['cells'] > self.max_cells_per_batch:
+                batches.append(batch)
+                batch, cells = [], 0
+            batch.append(entry)
+            cells += entry['cells']
+        if batch:
+            batches.append(batch)
+
+        sent = 0
+        try:
+            for batch in batches:
+                self._send(batch)
+                sent += len(batch)
+        except BaseException:
+            unsent = pending[sent:]
+            with self._lock:
+                self._pending = unsent + self._pending
+            logger.error(f"❌ Sheet writes not sent, still queued for: {', '.join(dict.fromkeys(entry['title'] for entry in unsent))}")
+            raise
+
+    def upload_tab(self, worksheet: gspread.Worksheet, grid: List[List[Any]]) -> int:
+        """Bulk-load a large grid: one resize + clear, then concurrent ranged chunk writes
+
+        Unlike replace_tab this is not atomic (a failed chunk leaves the tab partly written and
+        raises), but no single request has to carry the whole tab. Chunks are written to
+        explicit A1 ranges, so they can go out in parallel while sharing the write quota, and the
+        tab's row count is read back at the end. Returns the number of rows written.
+        """
+        row_count = len(grid)
+        col_count = max((len(row) for row in grid), default=0)
+        if not row_count:
+            self.replace_tab(worksheet, grid)
+            self.flush()
+            return 0
+
+        # Anything still queued for this tab would be overwritten anyway
+        with self._lock:
+            self._pending = [entry for entry in self._pending if entry['sheet_id'] != worksheet.id]
+
+        self._send([{'sheet_id': worksheet.id, 'title': worksheet.title, 'cells': 0, 'requests': [
+            {'updateSheetProperties': {
+                'properties': {'sheetId': worksheet.id, 'gridProperties': {
+                    'rowCount': row_count,
+                    'columnCount': max(col_count, worksheet.col_count)
+                }},
+                'fields': 'gridProperties(rowCount,columnCount)'
+            }},
+            {'updateCells': {'range': {'sheetId': worksheet.id}, 'fields': 'userEnteredValue'}}
+        ]}])
+
+        chunks = []
+        for start in range(0, row_count, self.upload_chunk_rows):
+            rows = grid[start:start + self.upload_chunk_rows]
+            a1 = f"{rowcol_to_a1(start + 1, 1)}:{rowcol_to_a1(start + len(rows), col_count)}"
+            chunks.append((absolute_range_name(worksheet.title, a1), rows))
+
+        logger.info(f"📤 Uploading {row_count:,} rows to {worksheet.title} in {len(chunks)} chunks "
+                    f"({self.upload_workers} workers)")
+
+        def upload(chunk):
+            range_name, rows = chunk
+            response = self._call(range_name, lambda: self.spreadsheet.values_update(
+                range_name, params={'valueInputOption': 'RAW'}, body={'values': rows}
+            ))
+            with self._lock:
+                self.stats['chunks'] += 1
+            return response.get('updatedRows', 0)
+
+        with ThreadPoolExecutor(max_workers=max(self.upload_workers, 1)) as executor:
+            updated_rows = sum(executor.map(upload, chunks))
+
+        # Read back the first column: its last filled row has to match the grid's
+        expected_rows = max((i + 1 for i, row in enumerate(grid) if row and row[0] not in (None, '')), default=0)
+        written_rows = len(worksheet.col_values(1))
+        if updated_rows != row_count or written_rows != expected_rows:
+            raise RuntimeError(f"Bulk upload to {worksheet.title} incomplete: {updated_rows}/{row_count} rows "
+                               f"acknowledged, {written_rows}/{expected_rows} rows found in column A")
+
+        logger.info(f"✅ Verified {row_count:,} rows in {worksheet.title}")
+        return row_count
+
+    def _pace(self):
+        """Wait until one more write request fits in the shared sliding one-minute quota window"""
+        wait = self._window.wait(self.requests_per_minute)
+        if wait:
+            with self._lock:
+                self.stats['waited_seconds'] += wait
+
+    def _call(self, description: str, request: Callable[[], Any]) -> Any:
+        """Run one write request under the quota, retried with truncated exponential backoff on 429/5xx"""
+        for attempt in range(self.max_retries + 1):
+            self._pace()
+            try:
+                return request()
+            except gspread.exceptions.APIError as e:
+                status = e.response.status_code
+                if status not in RETRY_STATUSES or attempt == self.max_retries:
+                    raise
+                delay = min(2 ** attempt + random.uniform(0, 1), 64)
+                with self._lock:
+                    self.stats['retries'] += 1
+                logger.warning(f"🔁 Sheets write for {description} returned HTTP {status}, retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _send(self, entries: List[Dict]):
+        """One batchUpdate for the given tabs"""
+        requests = [request for entry in entries for request in entry['requests']]
+        titles = ', '.join(dict.fromkeys(entry['title'] for entry in entries))
+        cells = sum(entry['cells'] for entry in entries)
+
+        self._call(titles, lambda: self.spreadsheet.batch_update({'requests': requests}))
+
+        self.stats['batches'] += 1
+        self.stats['requests'] += len(requests)
+        logger.info(f"📤 Sheets batchUpdate: {titles} ({len(requests)} requests, {cells:,} cells)")
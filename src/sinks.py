@@ -0,0 +1,144 @@
+import csv
+import sqlite3
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Any
+from src.utils import setup_logging
+
+logger = setup_logging()
+
+class SheetAppendSink:
+    """Stream USDT transactions into a sheet in the HASH, WALLET, AMT, TIMESTAMP layout via the quota-aware write queue"""
+
+    def __init__(self, sheets_manager, worksheet_name: str = "TRONSCAN"):
+        self.sheets_manager = sheets_manager
+        self.worksheet_name = worksheet_name
+        self.worksheet = None
+        self.total_usdt = 0.0
+
+    def open(self):
+        """Reset the target tab and write the header row"""
+        self.worksheet = self.sheets_manager.get_or_create_worksheet(self.worksheet_name, rows=1000, cols=10)
+        self.sheets_manager.write_queue.replace_tab(self.worksheet, [['HASH', 'WALLET', 'AMT', 'TIMESTAMP']])
+        self.sheets_manager.flush_writes()
+
+    def write_chunk(self, chunk: List[Dict]):
+        rows = [[tx.get('hash', ''), tx.get('wallet', ''), float(tx.get('amt_usdt', 0)), tx.get('timestamp') or '']
+                for tx in chunk]
+        self.sheets_manager.write_queue.append_rows(self.worksheet, rows)
+        self.sheets_manager.flush_writes()
+        self.total_usdt += sum(row[2] for row in rows)
+
+    def close(self):
+        """Finish with the same TOTAL row write_usdt_transactions_to_sheet adds"""
+        self.sheets_manager.write_queue.append_rows(self.worksheet, [['', 'TOTAL:', self.total_usdt, '']])
+        self.sheets_manager.flush_writes()
+
+class CsvSink:
+    """Stream USDT transactions into a CSV file, flushing after every chunk"""
+
+    fieldnames = ['hash', 'wallet', 'amt_usdt', 'timestamp']
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.file = None
+        self.writer = None
+
+    def open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=self.fieldnames, extrasaction='ignore')
+        self.writer.writeheader()
+
+    def write_chunk(self, chunk: List[Dict]):
+        self.writer.writerows(chunk)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class LocalStoreSink:
+    """Stream USDT transactions into a local SQLite table, committing every chunk
+
+    Rows are keyed on (hash, wallet, amt_usdt, transfer_index): the index numbers equal transfers
+    of one transaction (batch payouts) so they are all stored, while rerunning a load over the
+    same range still writes each transfer only once.
+    """
+
+    def __init__(self, path: str = 'cache/usdt_transfers.sqlite'):
+        self.path = Path(path)
+        self.db = None
+        # Occurrences per transfer within the current (wallet, timestamp) run of records; the
+        # stream is time-ordered per wallet, so a transaction's transfers are all in one run
+        self._group = None
+        self._occurrences = Counter()
+
+    def open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path))
+        columns = [row[1] for row in self.db.execute('PRAGMA table_info(usdt_transfers)')]
+        if columns and 'transfer_index' not in columns:
+            # Stores from before transfer_index held at most one of each equal transfer
+            self.db.execute('ALTER TABLE usdt_transfers RENAME TO usdt_transfers_old')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS usdt_transfers ('
+            'hash TEXT NOT NULL, wallet TEXT NOT NULL, amt_usdt REAL NOT NULL, '
+            'transfer_index INTEGER NOT NULL DEFAULT 0, timestamp INTEGER, '
+            'PRIMARY KEY (hash, wallet, amt_usdt, transfer_index))'
+        )
+        if columns and 'transfer_index' not in columns:
+            self.db.execute('INSERT INTO usdt_transfers (hash, wallet, amt_usdt, timestamp) '
+                            'SELECT hash, wallet, amt_usdt, timestamp FROM usdt_transfers_old')
+            self.db.execute('DROP TABLE usdt_transfers_old')
+            logger.info(f"📦 Added transfer_index to {self.path}")
+        self.db.commit()
+
+    def _transfer_index(self, tx: Dict) -> int:
+        group = (tx['wallet'], tx.get('timestamp', 0))
+        if group != self._group:
+            self._group, self._occurrences = group, Counter()
+        key = (tx['hash'], tx['amt_usdt'])
+        index = self._occurrences[key]
+        self._occurrences[key] += 1
+        return index
+
+    def write_chunk(self, chunk: List[Dict]):
+        # A rerun over the same range produces the same indexes, so conflicts are true repeats
+        self.db.executemany(
+            'INSERT OR IGNORE INTO usdt_transfers (hash, wallet, amt_usdt, transfer_index, timestamp) '
+            'VALUES (?, ?, ?, ?, ?)',
+            [(tx['hash'], tx['wallet'], tx['amt_usdt'], self._transfer_index(tx), tx.get('timestamp', 0)) for tx in chunk]
+        )
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+def write_stream(records: Iterable[Dict], sink, chunk_size: int = 500) -> Dict[str, Any]:
+    """Drain a record stream into a sink in fixed-size chunks; returns running totals"""
+    stats = {'count': 0, 'total_usdt': 0.0, 'wallets': set(), 'chunks': 0}
+    chunk = []
+
+    def flush():
+        sink.write_chunk(chunk)
+        stats['chunks'] += 1
+        logger.info(f"💾 Saved chunk {stats['chunks']} ({stats['count']} transactions so far)")
+
+    sink.open()
+    try:
+        for record in records:
+            chunk.append(record)
+            stats['count'] += 1
+            stats['total_usdt'] += record.get('amt_usdt', 0)
+            stats['wallets'].add(record.get('wallet', ''))
+
+            if len(chunk) >= chunk_size:
+                flush()
+                chunk = []
+
+        if chunk:
+            flush()
+    finally:
+        sink.close()
+
+    return stats
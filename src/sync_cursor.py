@@ -0,0 +1,74 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+from src.utils import setup_logging
+
+logger = setup_logging()
+
+class SyncCursorStore:
+    """Per-wallet high-watermark (newest block timestamp + hash) for incremental USDT loads"""
+
+    def __init__(self, path: str = None):
+        self.path = Path(path or os.getenv('USDT_SYNC_CURSOR_PATH', 'cache/usdt_sync_cursors.json'))
+        self.cursors = self._load()
+        self.pending = {}
+
+    def _load(self) -> Dict[str, Dict]:
+        """Load committed cursors from disk"""
+        if not self.path.exists():
+            return {}
+
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Could not read sync cursors from {self.path}, starting fresh: {e}")
+            return {}
+
+    def get(self, wallet: str) -> Optional[Dict]:
+        """Get the committed cursor for a wallet, if any"""
+        return self.cursors.get(wallet)
+
+    def start_timestamps(self, wallets: List[str]) -> Dict[str, int]:
+        """Lower-bound fetch timestamps for wallets that already have a cursor"""
+        return {wallet: self.cursors[wallet]['timestamp'] for wallet in wallets if wallet in self.cursors}
+
+    def filter_new(self, transactions: List[Dict]) -> List[Dict]:
+        """Drop transfers at or behind each wallet's cursor"""
+        new_transactions = []
+        for tx in transactions:
+            cursor = self.cursors.get(tx['wallet'])
+            if cursor:
+                if tx.get('timestamp', 0) < cursor['timestamp'] or tx['hash'] == cursor['hash']:
+                    continue
+            new_transactions.append(tx)
+        return new_transactions
+
+    def stage(self, transactions: List[Dict]):
+        """Record the newest transfer per wallet; nothing is persisted until commit()"""
+        for tx in transactions:
+            timestamp = tx.get('timestamp', 0)
+            current = self.pending.get(tx['wallet']) or self.cursors.get(tx['wallet'])
+            if not current or timestamp > current['timestamp']:
+                self.pending[tx['wallet']] = {'timestamp': timestamp, 'hash': tx['hash']}
+
+    def discard(self, wallets: List[str]):
+        """Drop staged cursors for wallets whose fetch failed part-way"""
+        for wallet in wallets:
+            self.pending.pop(wallet, None)
+    
+    def commit(self):
+        """Persist staged cursors; call only after the output write has succeeded"""
+        if not self.pending:
+            return
+
+        self.cursors.update(self.pending)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temp file first so a crash never leaves a truncated cursor file
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.cursors, indent=2, sort_keys=True))
+        os.replace(tmp_path, self.path)
+
+        logger.info(f"📌 Advanced sync cursors for {len(self.pending)} wallets")
+        self.pending = {}
@@ -1,9 +1,16 @@
 import requests
 import time
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Optional, Iterator
 from decimal import Decimal, getcontext
-from src.utils import setup_logging, rate_limit_delay, get_env_variable
+from src.utils import setup_logging, get_env_variable
+from src.rate_limiter import get_rate_limiter
+from src.http_transport import HttpTransport
+from src.key_pool import get_key_pool
+from src.tx_cache import get_transaction_cache
 
 logger = setup_logging()
 getcontext().prec = 28
@@ -14,17 +21,47 @@ class TronScanAPI:
     def __init__(self):
         self.base_url = get_env_variable('TRONSCAN_API_BASE_URL')
         self.api_key = get_env_variable('TRONSCAN_API_KEY', '')
-        self.session = requests.Session()
+        self.rate_limiter = get_rate_limiter('tronscan')
         
-        if self.api_key:
-            self.session.headers.update({'Authorization': f'Bearer {self.api_key}'})
+        # TRONSCAN_API_KEYS / TRONSCAN_API_KEYS_FILE spread requests over several keys,
+        # each with its own quota; without any key requests go out unauthenticated
+        self.key_pool = get_key_pool('tronscan', self.api_key)
+        self.transport = HttpTransport(
+            'tronscan', rate_limiter=self.rate_limiter,
+            key_pool=self.key_pool, key_header='Authorization', key_format='Bearer {key}'
+        )
+        self.session = self.transport.session
+        self.tx_cache = get_transaction_cache()
+        
+        # USDT TRC20 contract address
+        self.usdt_contract = "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"
+        
+        # 'transfers' reads whole pages from the TRC20 transfer list; 'details' is the
+        # older per-transaction transaction-info path, also used as the fallback
+        self.usdt_mode = get_env_variable('TRONSCAN_USDT_MODE', 'transfers')
+        self.transfer_page_limit = 50
+        self.detail_page_limit = 200
+        
+        # Deep offsets are rejected, so ranges with more rows than this are split into
+        # smaller time windows (never below min_window_ms) fetched window_workers at a time
+        self.max_offset = int(get_env_variable('TRONSCAN_MAX_OFFSET', '10000'))
+        self.min_window_ms = 60 * 1000
+        self.window_workers = int(get_env_variable('TRONSCAN_WINDOW_WORKERS', str(4 * max(len(self.key_pool), 1))))
+        
+        # Request accounting for requests-per-wallet-day reporting
+        self.request_count = 0
+        self._request_count_lock = threading.Lock()
+        
+        # Addresses whose history could not be fetched completely in the last run
+        self.failed_addresses = []
     
     def _make_request(self, endpoint: str, params: Dict) -> Dict:
-        """Make API request with error handling"""
+        """Make API request with error handling (retries and pacing are handled by the transport)"""
         url = f"{self.base_url}/{endpoint}"
+        with self._request_count_lock:
+            self.request_count += 1
         try:
-            rate_limit_delay()
-            response = self.session.get(url, params=params)
+            response = self.transport.get(url, params=params)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -33,19 +70,26 @@ class TronScanAPI:
     
     def _get_transaction_details(self, tx_hash: str) -> Dict:
         """Get full transaction details including TRC20 transfers"""
-        try:
-            response = self._make_request('transaction-info', {'hash': tx_hash})
-            return response
-        except:
-            return {}
+        cached = self.tx_cache.get(tx_hash)
+        if cached is not None:
+            return cached
+        
+        # Errors propagate: an empty payload here would silently drop the transfer
+        response = self._make_request('transaction-info', {'hash': tx_hash})
+        self.tx_cache.put(tx_hash, response)
+        return response
     
     def _extract_usdt_transfers(self, tx: Dict, wallet_address: str) -> List[Dict]:
         """Extract USDT transfers and return simplified format"""
-        results = []
         tx_hash = tx.get('hash', '')
         
         # Get full transaction details to access trc20TransferInfo
         tx_details = self._get_transaction_details(tx_hash)
+        return self._parse_usdt_transfers(tx_hash, tx_details, wallet_address)
+    
+    def _parse_usdt_transfers(self, tx_hash: str, tx_details: Dict, wallet_address: str) -> List[Dict]:
+        """Turn a transaction-info payload into simplified USDT transfer records"""
+        results = []
         
         # Look for TRC20 transfers in the detailed response
         if 'trc20TransferInfo' in tx_details and tx_details['trc20TransferInfo']:
@@ -72,68 +116,223 @@ class TronScanAPI:
                         results.append({
                             'hash': tx_hash,
                             'wallet': wallet_address,
-                            'amt_usdt': usdt_amount
+                            'amt_usdt': usdt_amount,
+                            'timestamp': tx_details.get('timestamp', 0)
                         })
                         logger.info(f"💰 Found USDT transfer: {usdt_amount:,.2f} USDT in {tx_hash[:16]}...")
         
         return results
     
-    def get_usdt_transactions(self, address: str, start_timestamp: int, end_timestamp: int) -> List[Dict]:
-        """Get USDT transactions for address - simplified output"""
-        all_transactions = []
+    def _parse_trc20_transfer(self, transfer: Dict, wallet_address: str) -> Optional[Dict]:
+        """Turn one TRC20 transfer-list row into a simplified USDT record"""
+        if transfer.get('contract_address', self.usdt_contract) != self.usdt_contract:
+            return None
+        
+        # Reverted transfers moved no funds
+        if transfer.get('contractRet', 'SUCCESS') != 'SUCCESS':
+            return None
+        
+        token_info = transfer.get('tokenInfo') or {}
+        decimals = int(token_info.get('tokenDecimal', 6))
+        quant = transfer.get('quant', '0')
+        
+        usdt_amount = 0
+        if quant and quant != '0':
+            try:
+                usdt_amount = float(Decimal(str(quant)) / (Decimal(10) ** decimals))
+            except:
+                usdt_amount = 0
+        
+        if usdt_amount <= 0:
+            return None
+        
+        return {
+            'hash': transfer.get('transaction_id', ''),
+            'wallet': wallet_address,
+            'amt_usdt': usdt_amount,
+            'timestamp': transfer.get('block_ts', 0)
+        }
+    
+    def _transfer_list_params(self, address: str, start_timestamp: int, end_timestamp: int, start: int) -> Dict:
+        """Query parameters for one page of the USDT-filtered TRC20 transfer list"""
+        return {
+            'relatedAddress': address,
+            'contract_address': self.usdt_contract,
+            'start_timestamp': start_timestamp,
+            'end_timestamp': end_timestamp,
+            'start': start,
+            'limit': self.transfer_page_limit,
+            'sort': '-timestamp'
+        }
+    
+    def _get_transfer_page(self, address: str, start_timestamp: int, end_timestamp: int, start: int) -> Tuple[List[Dict], int, int]:
+        """Fetch one transfer-list page: (records, rows on page, total rows in the window)"""
+        params = self._transfer_list_params(address, start_timestamp, end_timestamp, start)
+        response = self._make_request('token_trc20/transfers', params)
+        
+        if 'token_transfers' not in response:
+            raise ValueError(f"Unexpected transfer list response keys: {list(response.keys())}")
+        
+        transfers = response['token_transfers'] or []
+        records = [r for r in (self._parse_trc20_transfer(t, address) for t in transfers) if r]
+        return records, len(transfers), self._window_total(response, len(transfers))
+    
+    def _get_detail_page(self, address: str, start_timestamp: int, end_timestamp: int, start: int) -> Tuple[List[Dict], int, int]:
+        """Fetch one transaction-list page and the details of every row on it"""
+        params = {
+            'address': address,
+            'start_timestamp': start_timestamp,
+            'end_timestamp': end_timestamp,
+            'start': start,
+            'limit': self.detail_page_limit,
+            'sort': '-timestamp'
+        }
+        response = self._make_request('transaction', params)
+        
+        transactions = response.get('data') or []
+        records = []
+        
+        # Extract USDT transfers from each transaction
+        for tx in transactions:
+            records.extend(self._extract_usdt_transfers(tx, address))
+        
+        return records, len(transactions), self._window_total(response, len(transactions))
+    
+    @staticmethod
+    def _window_total(response: Dict, page_rows: int) -> int:
+        """Total rows TronScan reports for the queried time window"""
+        return int(response.get('rangeTotal') or response.get('total') or page_rows)
+    
+    def _split_window(self, address: str, start_timestamp: int, end_timestamp: int, total: int) -> List[Tuple[int, int]]:
+        """Halve a window whose rows would run past the offset cap; [] when it can't be split further"""
+        if total <= self.max_offset:
+            return []
+        
+        if end_timestamp - start_timestamp <= self.min_window_ms:
+            logger.warning(f"Window {start_timestamp}-{end_timestamp} for {address} has {total} rows but cannot be split further")
+            return []
+        
+        midpoint = (start_timestamp + end_timestamp) // 2
+        logger.info(f"🪓 Splitting window for {address}: {total} rows exceed offset cap {self.max_offset}")
+        return [(start_timestamp, midpoint), (midpoint, end_timestamp)]
+    
+    def _fetch_window(self, address: str, start_timestamp: int, end_timestamp: int, get_page, limit: int) -> Tuple[List[Dict], List[Tuple[int, int]]]:
+        """Fetch one time window: (records, sub-windows to fetch instead when it's over the cap)"""
+        records, page_rows, total = get_page(address, start_timestamp, end_timestamp, 0)
+        
+        sub_windows = self._split_window(address, start_timestamp, end_timestamp, total)
+        if sub_windows:
+            return [], sub_windows
+        
+        all_records = list(records)
         start = 0
-        limit = 200
-        
-        while True:
-            params = {
-                'address': address,
-                'start_timestamp': start_timestamp,
-                'end_timestamp': end_timestamp,
-                'start': start,
-                'limit': limit,
-                'sort': '-timestamp'
-            }
+        
+        while page_rows == limit:
+            start += limit
             
-            try:
-                response = self._make_request('transaction', params)
-                
-                if 'data' not in response:
-                    break
-                
-                transactions = response['data']
-                if not transactions:
-                    break
-                
-                logger.info(f"Checking {len(transactions)} transactions for USDT transfers...")
-                
-                # Extract USDT transfers from each transaction
-                for tx in transactions:
-                    usdt_transfers = self._extract_usdt_transfers(tx, address)
-                    all_transactions.extend(usdt_transfers)
-                
-                logger.info(f"Processed {len(transactions)} transactions for {address}, found {len([t for t in all_transactions if t['wallet'] == address])} USDT transfers")
-                
-                if len(transactions) < limit:
-                    break
-                
-                start += limit
+            # Only reachable for windows that couldn't be split
+            if start >= self.max_offset:
+                logger.warning(f"Reached API limit for address {address}")
+                break
+            
+            records, page_rows, _ = get_page(address, start_timestamp, end_timestamp, start)
+            all_records.extend(records)
+        
+        return all_records, []
+    
+    def _fetch_sharded(self, address: str, start_timestamp: int, end_timestamp: int, get_page, limit: int) -> List[Dict]:
+        """Fetch a time range as concurrent windows, splitting any window over the offset cap
+        
+        Any failing window fails the whole address rather than returning a partial history.
+        """
+        windows = []
+        
+        with ThreadPoolExecutor(max_workers=self.window_workers) as pool:
+            pending = {pool.submit(self._fetch_window, address, start_timestamp, end_timestamp, get_page, limit)}
+            
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
                 
-                # Safety limit
-                if start > 50000:  # Max 250 API calls per address
-                    logger.warning(f"Reached API limit for address {address}")
-                    break
-                    
+                for future in done:
+                    records, sub_windows = future.result()
+                    if records:
+                        windows.append(records)
+                    for window_start, window_end in sub_windows:
+                        pending.add(pool.submit(self._fetch_window, address, window_start, window_end, get_page, limit))
+        
+        return self._merge_window_records(windows)
+    
+    @staticmethod
+    def _merge_window_records(windows: List[List[Dict]]) -> List[Dict]:
+        """Merge per-window records, dropping the copies adjacent windows share, newest first
+        
+        A transfer on a split boundary is returned by both halves, but one transaction can also
+        carry several equal transfers (batch payouts), so records are only deduplicated across
+        windows: each (hash, amount) is kept as often as the window holding it most often has it.
+        """
+        kept = {}
+        for records in windows:
+            by_key = {}
+            for record in records:
+                by_key.setdefault((record['hash'], record['amt_usdt']), []).append(record)
+            for key, key_records in by_key.items():
+                if len(key_records) > len(kept.get(key, ())):
+                    kept[key] = key_records
+        merged = [record for key_records in kept.values() for record in key_records]
+        return sorted(merged, key=lambda r: r.get('timestamp', 0), reverse=True)
+    
+    def get_usdt_transactions(self, address: str, start_timestamp: int, end_timestamp: int) -> List[Dict]:
+        """Get USDT transactions for address - simplified output"""
+        if self.usdt_mode == 'transfers':
+            try:
+                transactions = self._fetch_sharded(address, start_timestamp, end_timestamp,
+                                                   self._get_transfer_page, self.transfer_page_limit)
+                logger.info(f"Found {len(transactions)} USDT transfers for {address}")
+                return transactions
             except Exception as e:
-                logger.error(f"Error fetching transactions for {address}: {e}")
-                break
+                logger.warning(f"Transfer list failed for {address} ({e}), falling back to per-transaction details")
         
-        return all_transactions
+        transactions = self._fetch_sharded(address, start_timestamp, end_timestamp,
+                                           self._get_detail_page, self.detail_page_limit)
+        logger.info(f"Found {len(transactions)} USDT transfers for {address} from transaction details")
+        return transactions
     
-    def get_usdt_for_multiple_addresses(self, addresses: List[str], date_from: str, date_to: str) -> List[Dict]:
-        """Get USDT transactions for multiple addresses"""
-        # Convert dates to timestamps
+    @staticmethod
+    def date_range_to_timestamps(date_from: str, date_to: str) -> Tuple[int, int]:
+        """Convert an inclusive YYYY-MM-DD date range to [start, end) millisecond timestamps"""
         start_timestamp = int(datetime.strptime(date_from, '%Y-%m-%d').timestamp() * 1000)
         end_timestamp = int((datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1)).timestamp() * 1000)
+        return start_timestamp, end_timestamp
+    
+    @property
+    def request_rate(self) -> float:
+        """Current combined requests/second budget"""
+        # The shared provider limiter caps the host on top of the per-key budgets
+        return min(self.key_pool.rate, self.rate_limiter.rate) if self.key_pool else self.rate_limiter.rate
+    
+    def log_request_stats(self, address_count: int, start_timestamp: int, end_timestamp: int, requests_made: int):
+        """Log API requests per wallet-day so fetch modes can be compared"""
+        days = max((end_timestamp - start_timestamp) / 86400000, 1)
+        wallet_days = max(address_count, 1) * days
+        logger.info(f"📡 {requests_made} API requests ({self.usdt_mode} mode), {requests_made / wallet_days:,.1f} per wallet-day")
+    
+    def log_failed_addresses(self):
+        """Warn about addresses missing from (or only partly in) the output"""
+        if self.failed_addresses:
+            logger.warning(f"⚠️ {len(self.failed_addresses)} addresses failed and are incomplete in the output: "
+                           f"{', '.join(self.failed_addresses)}")
+    
+    def get_usdt_for_multiple_addresses(self, addresses: List[str], date_from: str, date_to: str,
+                                        since: Optional[Dict[str, int]] = None) -> List[Dict]:
+        """Get USDT transactions for multiple addresses
+        
+        since optionally maps an address to a later start timestamp (e.g. an incremental sync cursor)
+        """
+        # Convert dates to timestamps
+        start_timestamp, end_timestamp = self.date_range_to_timestamps(date_from, date_to)
+        since = since or {}
+        requests_before = self.request_count
+        self.failed_addresses = []
         
         all_usdt_transactions = []
         
@@ -141,7 +340,8 @@ class TronScanAPI:
             logger.info(f"Processing address {i}/{len(addresses)}: {address}")
             
             try:
-                usdt_transactions = self.get_usdt_transactions(address, start_timestamp, end_timestamp)
+                address_start = max(start_timestamp, since.get(address, start_timestamp))
+                usdt_transactions = self.get_usdt_transactions(address, address_start, end_timestamp)
                 all_usdt_transactions.extend(usdt_transactions)
                 
                 usdt_count = len(usdt_transactions)
@@ -150,13 +350,111 @@ class TronScanAPI:
                 
             except Exception as e:
                 logger.error(f"Failed to get USDT transactions for address {address}: {e}")
+                self.failed_addresses.append(address)
                 continue
         
         logger.info(f"🎉 Total USDT transactions found: {len(all_usdt_transactions)}")
         logger.info(f"💰 Total USDT value: ${sum(tx['amt_usdt'] for tx in all_usdt_transactions):,.2f}")
+        self.log_request_stats(len(addresses), start_timestamp, end_timestamp, self.request_count - requests_before)
+        self.log_failed_addresses()
         
         return all_usdt_transactions
     
+    def _iter_window_pages(self, address: str, start_timestamp: int, end_timestamp: int, get_page, limit: int,
+                           boundaries: set) -> Iterator[Tuple[Tuple[int, int], List[Dict]]]:
+        """Yield (window, page of records) one page at a time, walking split windows newest first"""
+        records, page_rows, total = get_page(address, start_timestamp, end_timestamp, 0)
+        
+        sub_windows = self._split_window(address, start_timestamp, end_timestamp, total)
+        if sub_windows:
+            boundaries.add(sub_windows[0][1])
+            for window_start, window_end in reversed(sub_windows):
+                yield from self._iter_window_pages(address, window_start, window_end, get_page, limit, boundaries)
+            return
+        
+        window = (start_timestamp, end_timestamp)
+        yield window, records
+        start = 0
+        
+        while page_rows == limit:
+            start += limit
+            
+            # Only reachable for windows that couldn't be split
+            if start >= self.max_offset:
+                logger.warning(f"Reached API limit for address {address}")
+                break
+            
+            records, page_rows, _ = get_page(address, start_timestamp, end_timestamp, start)
+            yield window, records
+    
+    def _iter_address_pages(self, address: str, start_timestamp: int, end_timestamp: int, mode: str) -> Iterator[List[Dict]]:
+        """Yield an address's USDT records page by page, dropping duplicates at window boundaries"""
+        if mode == 'transfers':
+            get_page, limit = self._get_transfer_page, self.transfer_page_limit
+        else:
+            get_page, limit = self._get_detail_page, self.detail_page_limit
+        
+        # Only records sitting exactly on a split point can appear in two windows, so that is
+        # all we remember for deduplication. Like _merge_window_records, each (hash, amount) is
+        # kept as often as the window holding it most often has it (equal transfers of one
+        # transaction all stay)
+        boundaries = set()
+        boundary_kept = Counter()
+        window_counts = Counter()
+        current_window = None
+        pages_yielded = 0
+        
+        try:
+            for window, records in self._iter_window_pages(address, start_timestamp, end_timestamp, get_page, limit, boundaries):
+                if window != current_window:
+                    current_window, window_counts = window, Counter()
+                page = []
+                for record in records:
+                    if record.get('timestamp') in boundaries:
+                        key = (record['hash'], record['amt_usdt'])
+                        window_counts[key] += 1
+                        if window_counts[key] <= boundary_kept[key]:
+                            continue
+                        boundary_kept[key] = window_counts[key]
+                    page.append(record)
+                
+                pages_yielded += 1
+                yield page
+        
+        except Exception as e:
+            if mode == 'transfers' and not pages_yielded:
+                logger.warning(f"Transfer list failed for {address} ({e}), falling back to per-transaction details")
+                yield from self._iter_address_pages(address, start_timestamp, end_timestamp, 'details')
+            else:
+                logger.error(f"Error fetching transactions for {address}: {e}")
+                self.failed_addresses.append(address)
+    
+    def iter_usdt_transfers(self, addresses: List[str], date_from: str, date_to: str,
+                            since: Optional[Dict[str, int]] = None) -> Iterator[Dict]:
+        """Stream USDT transactions for addresses one API page at a time
+        
+        Yields the same records as get_usdt_for_multiple_addresses without holding them all in memory.
+        """
+        start_timestamp, end_timestamp = self.date_range_to_timestamps(date_from, date_to)
+        since = since or {}
+        self.failed_addresses = []
+        
+        for i, address in enumerate(addresses, 1):
+            logger.info(f"Processing address {i}/{len(addresses)}: {address}")
+            
+            address_start = max(start_timestamp, since.get(address, start_timestamp))
+            usdt_count = 0
+            total_usdt = 0
+            
+            for page in self._iter_address_pages(address, address_start, end_timestamp, self.usdt_mode):
+                usdt_count += len(page)
+                total_usdt += sum(tx['amt_usdt'] for tx in page)
+                yield from page
+            
+            logger.info(f"✅ Address {address}: {usdt_count} USDT transactions, Total: ${total_usdt:,.2f}")
+        
+        self.log_failed_addresses()
+    
     def get_usdt_for_single_address(self, address: str, date_from: str, date_to: str) -> List[Dict]:
         """Get USDT transactions for single address"""
         return self.get_usdt_for_multiple_addresses([address], date_from, date_to)
\ No newline at end of file
@@ -0,0 +1,126 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Any
+from src.utils import setup_logging
+
+logger = setup_logging()
+
+class TransactionInfoCache:
+    """Two-tier cache (in-memory LRU over SQLite) for confirmed transaction-info payloads"""
+
+    def __init__(self, path: str = None, max_memory_entries: int = None):
+        self.path = Path(path or os.getenv('TX_CACHE_PATH', 'cache/transaction_info.sqlite'))
+        self.max_memory_entries = max_memory_entries or int(os.getenv('TX_CACHE_MEMORY_ENTRIES', 10000))
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS transaction_info ('
+            'hash TEXT PRIMARY KEY, payload TEXT NOT NULL, cached_at INTEGER NOT NULL)'
+        )
+        self._db.commit()
+
+        self.stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'skipped_unconfirmed': 0,
+            'evictions': 0
+        }
+
+    def _remember(self, tx_hash: str, payload: Dict):
+        """Insert into the memory tier, evicting the least recently used entries"""
+        self._memory[tx_hash] = payload
+        self._memory.move_to_end(tx_hash)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def get(self, tx_hash: str) -> Optional[Dict]:
+        """Return the cached payload for a hash, or None on a miss"""
+        if not tx_hash:
+            return None
+
+        with self._lock:
+            payload = self._memory.get(tx_hash)
+            if payload is not None:
+                self._memory.move_to_end(tx_hash)
+                self.stats['memory_hits'] += 1
+                return payload
+
+            row = self._db.execute('SELECT payload FROM transaction_info WHERE hash = ?', (tx_hash,)).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+
+            payload = json.loads(row[0])
+            self._remember(tx_hash, payload)
+            self.stats['disk_hits'] += 1
+            return payload
+
+    def put(self, tx_hash: str, payload: Dict) -> bool:
+        """Store a payload if the transaction is confirmed; returns True when stored"""
+        if not tx_hash or not payload or not payload.get('confirmed'):
+            self.stats['skipped_unconfirmed'] += 1
+            return False
+
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO transaction_info (hash, payload, cached_at) VALUES (?, ?, ?)',
+                (tx_hash, json.dumps(payload), int(time.time()))
+            )
+            self._db.commit()
+            self._remember(tx_hash, payload)
+            self.stats['stores'] += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache sizes plus hit, store and eviction counters"""
+        with self._lock:
+            disk_entries = self._db.execute('SELECT COUNT(*) FROM transaction_info').fetchone()[0]
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self._memory)
+
+        stats['disk_entries'] = disk_entries
+        stats['disk_bytes'] = self.path.stat().st_size if self.path.exists() else 0
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def log_stats(self):
+        """Log a one-line summary of cache effectiveness"""
+        stats = self.get_stats()
+        if not (stats['memory_hits'] or stats['disk_hits'] or stats['misses']):
+            return
+        logger.info(
+            f"🗄️ transaction-info cache: {stats['hit_rate']:.0%} hit rate "
+            f"({stats['memory_hits']} memory, {stats['disk_hits']} disk, {stats['misses']} misses), "
+            f"{stats['memory_entries']} in memory, {stats['disk_entries']} on disk ({stats['disk_bytes']:,} bytes), "
+            f"{stats['evictions']} evictions"
+        )
+
+    def close(self):
+        """Close the underlying SQLite connection"""
+        with self._lock:
+            self._db.close()
+
+_cache: Optional[TransactionInfoCache] = None
+_cache_lock = threading.Lock()
+
+def get_transaction_cache() -> TransactionInfoCache:
+    """Get the process-wide transaction-info cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TransactionInfoCache()
+        return _cache
@@ -14,7 +14,8 @@ def setup_logging(log_level: str = "INFO") -> logging.Logger:
         level=getattr(logging, log_level.upper()),
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         handlers=[
-            logging.FileHandler('tronscan_data.log'),
+            # delay: the log file is only opened once something is actually logged
+            logging.FileHandler('tronscan_data.log', delay=True),
             logging.StreamHandler()
         ]
     )
@@ -36,11 +37,6 @@ def convert_timestamp_to_date(timestamp: int) -> str:
     """Convert timestamp to readable date"""
     return datetime.fromtimestamp(timestamp / 1000).strftime('%Y-%m-%d %H:%M:%S')
 
-def rate_limit_delay():
-    """Apply rate limiting delay"""
-    delay = float(os.getenv('API_RATE_LIMIT_DELAY', 1))
-    time.sleep(delay)
-
 def chunk_list(lst: List, chunk_size: int) -> List[List]:
     """Split list into chunks"""
     return [lst[i:i + chunk_size] for i in range(0, len(lst), chunk_size)]
@@ -5,13 +5,12 @@ Quick test for external form sheet - hardcoded values
 
 import sys
 from pathlib import Path
-import gspread
-from google.oauth2.service_account import Credentials
 
 # Add src to path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from src.utils import setup_logging, get_env_variable
+from src.google_client import get_gspread_client, open_spreadsheet
 
 logger = setup_logging()
 
@@ -29,21 +28,14 @@ def quick_test():
     logger.info("="*60)
     
     try:
-        # Authenticate
-        scope = [
-            'https://spreadsheets.google.com/feeds',
-            'https://www.googleapis.com/auth/drive'
-        ]
-        
-        credentials_path = get_env_variable('GOOGLE_SHEETS_CREDENTIALS_PATH', 'config/credentials.json')
-        credentials = Credentials.from_service_account_file(credentials_path, scopes=scope)
-        client = gspread.authorize(credentials)
+        # Authenticate (shared client, cached access token)
+        get_gspread_client()
         
         logger.info("✅ Authentication successful")
         
         # Open the sheet
         logger.info("🔍 Opening external sheet...")
-        workbook = client.open_by_key(SHEET_ID)
+        workbook = open_spreadsheet(SHEET_ID)
         logger.info(f"✅ Successfully opened: {workbook.title}")
         
         # List all worksheets
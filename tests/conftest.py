@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Add the repo root to path (the src.* imports), like the scripts do
+sys.path.insert(0, str(Path(__file__).parent.parent))
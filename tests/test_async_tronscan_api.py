@@ -0,0 +1,46 @@
+import asyncio
+import os
+import threading
+import time
+from src.async_tronscan_api import AsyncTronScanAPI
+
+class FakeTransport:
+    pool_size = 100
+
+    def set_pool_size(self, pool_size):
+        self.pool_size = pool_size
+
+class FakeApi:
+    """Blocking _make_request that records how many calls overlap"""
+
+    def __init__(self):
+        self.key_pool = []
+        self.transport = FakeTransport()
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def _make_request(self, endpoint, params):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(0.2)
+        with self._lock:
+            self.in_flight -= 1
+        return {}
+
+def test_max_concurrency_above_default_executor_cap():
+    # asyncio's default executor stops at min(32, cpus + 4) workers
+    max_concurrency = min(32, (os.cpu_count() or 1) + 4) + 8
+    api = FakeApi()
+    async_api = AsyncTronScanAPI(api, max_concurrency=max_concurrency)
+
+    async def fetch_address(address, index, total, start_timestamp, end_timestamp):
+        await async_api._request('token_trc20/transfers', {'address': address})
+        return []
+
+    async_api._fetch_address = fetch_address
+    addresses = [f"T{i}" for i in range(max_concurrency)]
+    asyncio.run(async_api._fetch_all(addresses, 0, 1, {}))
+
+    assert api.peak == max_concurrency
@@ -0,0 +1,36 @@
+from scripts.exception_analysis import ExceptionAnalyzer
+
+HASH = 'a' * 64
+WALLET = 'TXYZopYRdj2D9XRtbG411XZZ3kM5VkAeBf'
+
+def form_values(headers, row):
+    return [headers, row]
+
+def test_time_column_prefers_timestamp_over_other_times():
+    analyzer = ExceptionAnalyzer(None)
+    headers = ['Start time', 'Completion time', 'TrxHash', 'Amount', 'Wallet', 'Timestamp', 'Sync_Date']
+    row = ['01/01/2025 08:00:00', '01/01/2025 08:05:00', HASH, '100', WALLET, '2025-01-02 10:00:00',
+           '2025-01-03 00:00:00']
+
+    record = analyzer.parse_ms_form_values(form_values(headers, row))[HASH]
+
+    assert record['timestamp'] == analyzer._parse_form_time('2025-01-02 10:00:00')
+
+def test_time_column_uses_configured_header():
+    analyzer = ExceptionAnalyzer(None)
+    analyzer.form_time_column = 'Completion time'
+    headers = ['Start time', 'Completion time', 'TrxHash', 'Amount']
+    row = ['01/01/2025 08:00:00', '01/01/2025 08:05:00', HASH, '100']
+
+    record = analyzer.parse_ms_form_values(form_values(headers, row))[HASH]
+
+    assert record['timestamp'] == analyzer._parse_form_time('01/01/2025 08:05:00')
+
+def test_time_column_fallback_skips_sync_date():
+    analyzer = ExceptionAnalyzer(None)
+    headers = ['Sync_Date', 'TrxHash', 'Amount', 'Transfer date']
+    row = ['2025-01-03 00:00:00', HASH, '100', '2025-01-02']
+
+    record = analyzer.parse_ms_form_values(form_values(headers, row))[HASH]
+
+    assert record['timestamp'] == analyzer._parse_form_time('2025-01-02')
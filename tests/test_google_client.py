@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+from google.oauth2.service_account import Credentials
+from src.google_client import TokenCache, save_refreshed_tokens
+
+def make_credentials():
+    credentials = Credentials(signer=None, service_account_email='sync@example.iam.gserviceaccount.com',
+                              token_uri='https://oauth2.example/token')
+    tokens = iter(['token-1', 'token-2'])
+
+    def refresh(request):
+        credentials.token = next(tokens)
+        credentials.expiry = datetime.utcnow() + timedelta(hours=1)
+
+    credentials.refresh = refresh
+    return credentials
+
+def test_refresh_during_the_run_is_cached(tmp_path):
+    token_cache = TokenCache(str(tmp_path / 'token.json'))
+    credentials = make_credentials()
+    save_refreshed_tokens(credentials, token_cache)
+
+    credentials.refresh(None)
+    # gspread refreshes the same credentials once the first token expires
+    credentials.refresh(None)
+
+    cached = make_credentials()
+    assert token_cache.load(cached)
+    assert cached.token == 'token-2'
+
+def test_cache_write_failure_does_not_fail_the_refresh(tmp_path):
+    blocker = tmp_path / 'not-a-dir'
+    blocker.write_text('')
+    credentials = make_credentials()
+    save_refreshed_tokens(credentials, TokenCache(str(blocker / 'token.json')))
+
+    credentials.refresh(None)
+
+    assert credentials.token == 'token-1'
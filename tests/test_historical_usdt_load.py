@@ -0,0 +1,19 @@
+from scripts.historical_usdt_load import merge_usdt_transactions
+
+WALLET = 'TXYZopYRdj2D9XRtbG411XZZ3kM5VkAeBf'
+
+def transfer(tx_hash, amount, wallet=WALLET):
+    return {'hash': tx_hash, 'wallet': wallet, 'amt_usdt': amount, 'timestamp': 1}
+
+def test_equal_transfers_of_one_transaction_are_all_merged():
+    new = [transfer('a' * 64, 50.0), transfer('a' * 64, 50.0)]
+
+    assert merge_usdt_transactions([], new) == new
+
+def test_transfers_already_in_the_output_are_skipped_by_count():
+    existing = [transfer('a' * 64, 50.0), transfer('b' * 64, 10.0)]
+    new = [transfer('a' * 64, 50.0), transfer('a' * 64, 50.0), transfer('a' * 64, 7.0), transfer('c' * 64, 1.0)]
+
+    merged = merge_usdt_transactions(existing, new)
+
+    assert merged == existing + [transfer('a' * 64, 50.0), transfer('a' * 64, 7.0), transfer('c' * 64, 1.0)]
@@ -0,0 +1,134 @@
+import time
+import pytest
+import requests
+from src.http_transport import HttpTransport, CircuitOpenError, get_circuit_breaker
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+class FakeSession:
+    """Answers GETs with the queued status codes (or raises queued exceptions)"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return FakeResponse(outcome)
+
+def make_transport(session):
+    transport = HttpTransport('test')
+    transport.session = session
+    transport.max_retries = 0
+    return transport
+
+def open_breaker(host):
+    """Breaker for host, open with its cooldown already over (the next request is the half-open probe)"""
+    breaker = get_circuit_breaker(host)
+    breaker.state = 'open'
+    breaker.opened_at = time.monotonic() - breaker.reset_timeout - 1
+    return breaker
+
+def test_half_open_probe_answered_429_closes_the_breaker():
+    breaker = open_breaker('throttled.example')
+    transport = make_transport(FakeSession(429, 200))
+
+    assert transport.get('https://throttled.example/api').status_code == 429
+    assert breaker.state == 'closed'
+    # The next call goes through instead of raising CircuitOpenError
+    assert transport.get('https://throttled.example/api').status_code == 200
+
+def test_half_open_probe_answered_5xx_reopens_the_breaker():
+    breaker = open_breaker('failing.example')
+    transport = make_transport(FakeSession(503))
+
+    transport.get('https://failing.example/api')
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        transport.get('https://failing.example/api')
+
+def test_non_retryable_request_error_fails_the_probe():
+    breaker = open_breaker('redirects.example')
+    transport = make_transport(FakeSession(requests.exceptions.TooManyRedirects()))
+
+    with pytest.raises(requests.exceptions.TooManyRedirects):
+        transport.get('https://redirects.example/api')
+    assert breaker.state == 'open'
+
+def test_probe_that_never_left_is_released():
+    breaker = open_breaker('nokey.example')
+    session = FakeSession(200)
+    transport = make_transport(session)
+
+    class BrokenPool:
+        def __bool__(self):
+            return True
+
+        def acquire(self):
+            raise RuntimeError('no keys')
+
+    transport.key_pool = BrokenPool()
+    with pytest.raises(RuntimeError):
+        transport.get('https://nokey.example/api')
+    assert session.calls == 0
+    assert breaker.state == 'open'
+
+    # The cooldown is still over, so the next caller can probe right away
+    transport.key_pool = None
+    assert transport.get('https://nokey.example/api').status_code == 200
+    assert breaker.state == 'closed'
+
+class RecordingLimiter:
+    max_rate = 5.0
+
+    def __init__(self):
+        self.acquired = 0
+        self.responses = []
+
+    def acquire(self):
+        self.acquired += 1
+
+    def record_response(self, status_code, retry_after=None):
+        self.responses.append(status_code)
+
+class RecordingPool(RecordingLimiter):
+    rate = 10.0
+
+    def __len__(self):
+        return 2
+
+    def acquire(self):
+        super().acquire()
+        return 'key-1234567890'
+
+    def record_response(self, key, status_code, retry_after=None):
+        self.responses.append(status_code)
+
+def test_keyed_requests_also_take_the_shared_provider_limiter():
+    session = FakeSession(429, 200)
+    transport = make_transport(session)
+    transport.key_header = 'Authorization'
+    transport.key_pool, transport.rate_limiter = RecordingPool(), RecordingLimiter()
+
+    transport.get('https://keyed.example/api')
+    transport.get('https://keyed.example/api')
+
+    assert transport.key_pool.acquired == transport.rate_limiter.acquired == 2
+    assert transport.key_pool.responses == [429, 200]
+    # A key's 429 is that key's quota; the host-wide limiter doesn't back off for it
+    assert transport.rate_limiter.responses == []
+
+def test_keyed_5xx_slows_the_shared_provider_limiter():
+    transport = make_transport(FakeSession(503))
+    transport.key_header = 'Authorization'
+    transport.key_pool, transport.rate_limiter = RecordingPool(), RecordingLimiter()
+
+    transport.get('https://keyed-5xx.example/api')
+
+    assert transport.key_pool.responses == transport.rate_limiter.responses == [503]
@@ -0,0 +1,104 @@
+from collections import Counter
+from scripts.exception_analysis import ExceptionAnalyzer
+from src.reconciliation_state import ReconciliationState
+
+HOUR_MS = 3600 * 1000
+WALLET_A = 'TXYZopYRdj2D9XRtbG411XZZ3kM5VkAeBf'
+WALLET_B = 'TJRabPrwbZy45sbavfcjinPJC18kjpRTv8'
+
+class FakeSheetsManager:
+    """Keeps the EXCEPTION tab as {row number: values}"""
+
+    sheet_id = 'sheet'
+
+    def __init__(self):
+        self.tab = {}
+
+    def write_grid(self, worksheet_name, grid, rows=1000, cols=20):
+        self.tab = {row_number: list(row) for row_number, row in enumerate(grid, 1)}
+
+    def update_rows(self, worksheet_name, rows, cols=20):
+        for row_number, row in rows.items():
+            self.tab[row_number] = list(row)
+
+    def exception_rows(self):
+        """Non-blank exception rows above the summary block, in tab order"""
+        rows = []
+        for row_number in sorted(self.tab)[1:]:
+            row = self.tab[row_number]
+            if row and row[0] == '=== SUMMARY ===':
+                break
+            if any(value != '' for value in row):
+                rows.append(row)
+        return rows
+
+    def summary(self):
+        """{label: value} of the summary block, without the run timestamp"""
+        rows = [self.tab[row_number] for row_number in sorted(self.tab)]
+        start = next(i for i, row in enumerate(rows) if row and row[0] == '=== SUMMARY ===')
+        return {row[0]: row[1] for row in rows[start + 1:]
+                if len(row) > 1 and row[0] not in ('', 'ANALYSIS_TIMESTAMP')}
+
+def records(entries):
+    return {tx_hash: {'hash': tx_hash, 'amount': amount, 'wallet': wallet, 'timestamp': timestamp, 'row_number': row}
+            for row, (tx_hash, amount, wallet, timestamp) in enumerate(entries, 2)}
+
+def full_run(analyzer, state, ms_form_data, tronscan_data):
+    exceptions = analyzer.analyze_exceptions(ms_form_data, tronscan_data)
+    analyzer.write_exceptions_to_sheet(exceptions)
+    analyzer.save_state(state, exceptions, 'EXCEPTION', ms_form_data, tronscan_data)
+
+def test_incremental_run_matches_full_run(tmp_path):
+    ms_form_before = [
+        ('a' * 64, 100.0, WALLET_A, 1 * HOUR_MS),
+        ('b' * 64, 250.0, WALLET_A, 2 * HOUR_MS),
+        ('c' * 64, 75.0, WALLET_B, 3 * HOUR_MS),
+        ('typo-hash', 40.0, WALLET_B, 4 * HOUR_MS),
+    ]
+    tronscan_before = [
+        ('a' * 64, 100.0, WALLET_A, 1 * HOUR_MS),
+        ('b' * 64, 250.0, WALLET_A, 2 * HOUR_MS),
+        ('d' * 64, 40.0, WALLET_B, 5 * HOUR_MS),
+        ('e' * 64, 900.0, WALLET_A, 6 * HOUR_MS),
+    ]
+    # b's amount changes, c is removed, f is new on both sides, g is a new form row that
+    # wallet-matches e, and the earlier typo-hash / d pair stays matched
+    ms_form_after = [
+        ('a' * 64, 100.0, WALLET_A, 1 * HOUR_MS),
+        ('b' * 64, 260.0, WALLET_A, 2 * HOUR_MS),
+        ('typo-hash', 40.0, WALLET_B, 4 * HOUR_MS),
+        ('f' * 64, 12.5, WALLET_B, 7 * HOUR_MS),
+        ('g-typo', 900.0, WALLET_A, 6 * HOUR_MS),
+    ]
+    tronscan_after = tronscan_before + [('f' * 64, 12.5, WALLET_B, 7 * HOUR_MS)]
+
+    incremental = ExceptionAnalyzer(FakeSheetsManager())
+    state = ReconciliationState(str(tmp_path / 'incremental.sqlite'))
+    full_run(incremental, state, records(ms_form_before), records(tronscan_before))
+    type_counts = incremental.reconcile_incremental(state, records(ms_form_after), records(tronscan_after))
+
+    full = ExceptionAnalyzer(FakeSheetsManager())
+    full_run(full, ReconciliationState(str(tmp_path / 'full.sqlite')), records(ms_form_after), records(tronscan_after))
+
+    assert type_counts == full.analyze_exceptions(records(ms_form_after), records(tronscan_after)).type_counts()
+    assert Counter(map(tuple, incremental.sheets_manager.exception_rows())) == \
+        Counter(map(tuple, full.sheets_manager.exception_rows()))
+    assert incremental.sheets_manager.summary() == full.sheets_manager.summary()
+
+def test_incremental_run_without_state_falls_back(tmp_path):
+    analyzer = ExceptionAnalyzer(FakeSheetsManager())
+    state = ReconciliationState(str(tmp_path / 'state.sqlite'))
+
+    assert analyzer.reconcile_incremental(state, records([('a' * 64, 1.0, '', 0)]), {}) is None
+
+def test_state_is_reused_whatever_the_case_of_the_form_time_column(tmp_path):
+    state = ReconciliationState(str(tmp_path / 'state.sqlite'))
+    data = records([('a' * 64, 1.0, '', 0)])
+    first = ExceptionAnalyzer(FakeSheetsManager())
+    first.form_time_column = 'timestamp'
+    full_run(first, state, data, data)
+
+    second = ExceptionAnalyzer(first.sheets_manager)
+    second.form_time_column = ' Timestamp '
+
+    assert second.reconcile_incremental(state, data, data) == {'MATCHED': 1}
@@ -0,0 +1,40 @@
+import pytest
+from src import key_pool, rate_limiter
+from src.key_pool import get_key_pool
+from src.rate_limiter import get_rate_limiter
+
+@pytest.fixture(autouse=True)
+def fresh_registries(monkeypatch):
+    monkeypatch.setattr(key_pool, '_pools', {})
+    monkeypatch.setattr(rate_limiter, '_limiters', {})
+    for name in ('KEYTEST_REQUESTS_PER_SECOND', 'KEYTEST_BURST', 'KEYTEST_API_KEYS', 'KEYTEST_API_KEYS_FILE',
+                 'KEYTEST_KEY_REQUESTS_PER_SECOND', 'KEYTEST_KEY_BURST'):
+        monkeypatch.delenv(name, raising=False)
+
+def test_host_cap_defaults_to_the_keys_combined_quota(monkeypatch):
+    monkeypatch.setenv('KEYTEST_API_KEYS', 'key-aaaaaaaa,key-bbbbbbbb,key-cccccccc')
+    monkeypatch.setenv('KEYTEST_KEY_REQUESTS_PER_SECOND', '4')
+    monkeypatch.setenv('KEYTEST_KEY_BURST', '2')
+
+    pool = get_key_pool('keytest')
+
+    assert [state['limiter'].max_rate for state in pool.keys] == [4.0, 4.0, 4.0]
+    assert pool.rate == 12.0
+    host = get_rate_limiter('keytest')
+    assert (host.max_rate, host.rate, host.burst) == (12.0, 12.0, 6)
+
+def test_explicit_host_cap_is_kept(monkeypatch):
+    monkeypatch.setenv('KEYTEST_API_KEYS', 'key-aaaaaaaa,key-bbbbbbbb')
+    monkeypatch.setenv('KEYTEST_REQUESTS_PER_SECOND', '3')
+    monkeypatch.setenv('KEYTEST_KEY_REQUESTS_PER_SECOND', '5')
+
+    pool = get_key_pool('keytest')
+
+    assert pool.rate == 10.0
+    assert get_rate_limiter('keytest').max_rate == 3.0
+
+def test_without_keys_the_provider_limit_is_unchanged(monkeypatch):
+    monkeypatch.setenv('KEYTEST_REQUESTS_PER_SECOND', '2')
+
+    assert len(get_key_pool('keytest')) == 0
+    assert get_rate_limiter('keytest').max_rate == 2.0
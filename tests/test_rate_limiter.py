@@ -0,0 +1,58 @@
+import pytest
+from src import rate_limiter
+from src.rate_limiter import TokenBucketLimiter
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', clock)
+    return clock
+
+def test_429_halves_rate_down_to_the_floor(clock):
+    limiter = TokenBucketLimiter('test', rate=8.0, burst=4)
+
+    limiter.record_response(429)
+    assert limiter.rate == 4.0
+    for _ in range(10):
+        limiter.record_response(429)
+    assert limiter.rate == limiter.min_rate == 0.5
+    assert limiter.stats['throttled'] == 11
+
+def test_successful_responses_do_not_throttle(clock):
+    limiter = TokenBucketLimiter('test', rate=8.0, burst=4)
+
+    limiter.record_response(200)
+    limiter.record_response(404)
+
+    assert limiter.rate == 8.0
+
+def test_rate_recovers_step_by_step_after_quiet_periods(clock):
+    limiter = TokenBucketLimiter('test', rate=8.0, burst=4, recovery_seconds=30.0)
+    limiter.record_response(429)
+
+    clock.now += 29
+    limiter.reserve()
+    assert limiter.rate == 4.0
+
+    clock.now += 1
+    limiter.reserve()
+    assert limiter.rate == pytest.approx(4.8)
+
+    for _ in range(10):
+        clock.now += 30
+        limiter.reserve()
+    assert limiter.rate == 8.0
+
+def test_retry_after_blocks_the_next_request(clock):
+    limiter = TokenBucketLimiter('test', rate=8.0, burst=4)
+
+    limiter.record_response(429, retry_after='5')
+
+    assert limiter.reserve() == pytest.approx(5.0)
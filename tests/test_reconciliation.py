@@ -0,0 +1,115 @@
+import random
+import numpy as np
+from src.reconciliation import ReconciliationSide, reconcile, match_residue, MATCHED_BY_WALLET
+
+HOUR_MS = 3600 * 1000
+WALLET_A = 'TXYZopYRdj2D9XRtbG411XZZ3kM5VkAeBf'
+WALLET_B = 'TJRabPrwbZy45sbavfcjinPJC18kjpRTv8'
+
+def records(entries):
+    """{hash: record} as the sheet readers return them, rows numbered from 2"""
+    return {tx_hash: {'hash': tx_hash, 'amount': amount, 'wallet': wallet, 'timestamp': timestamp, 'row_number': row}
+            for row, (tx_hash, amount, wallet, timestamp) in enumerate(entries, 2)}
+
+def dict_reconcile(ms_form_data, tronscan_data, tolerance):
+    """The per-hash dict implementation reconcile() replaced, with the hash as the final sort key"""
+    exceptions = []
+    for tx_hash in set(ms_form_data) | set(tronscan_data):
+        ms_form, tronscan = ms_form_data.get(tx_hash), tronscan_data.get(tx_hash)
+        if ms_form and tronscan:
+            difference = abs(ms_form['amount'] - tronscan['amount'])
+            exc_type = 'MATCHED' if difference <= tolerance else 'AMOUNT_DIFFERENT'
+            exceptions.append([tx_hash, exc_type, ms_form['amount'], tronscan['amount'],
+                               0.0 if exc_type == 'MATCHED' else difference, tronscan['wallet'],
+                               ms_form['row_number'], tronscan['row_number']])
+        elif ms_form:
+            exceptions.append([tx_hash, 'IN_FORM_NOT_TRONSCAN', ms_form['amount'], 0.0, ms_form['amount'],
+                               '', ms_form['row_number'], 'N/A'])
+        else:
+            exceptions.append([tx_hash, 'IN_TRONSCAN_NOT_FORM', 0.0, tronscan['amount'], tronscan['amount'],
+                               tronscan['wallet'], 'N/A', tronscan['row_number']])
+
+    type_order = {'AMOUNT_DIFFERENT': 1, 'IN_FORM_NOT_TRONSCAN': 2, 'IN_TRONSCAN_NOT_FORM': 3, 'MATCHED': 4}
+    exceptions.sort(key=lambda exc: (type_order[exc[1]], -exc[4], exc[0]))
+
+    rows = []
+    for exc in exceptions:
+        exc_type, difference = exc[1], exc[4]
+        if exc_type == 'MATCHED':
+            severity, notes = 'OK', 'Perfect match'
+        elif exc_type == 'AMOUNT_DIFFERENT':
+            severity = 'LOW' if difference < 1 else 'MEDIUM' if difference < 100 else 'HIGH'
+            notes = f'Amount differs by ${difference:.2f}'
+        else:
+            severity = 'MEDIUM' if difference < 100 else 'HIGH'
+            notes = ('Transaction recorded in form but not found in blockchain' if exc_type == 'IN_FORM_NOT_TRONSCAN'
+                     else 'Blockchain transaction not recorded in form')
+        rows.append(exc + [severity, notes])
+    return rows
+
+def fixture(count=500, seed=7):
+    rng = random.Random(seed)
+    ms_form, tronscan = [], []
+    for i in range(count):
+        tx_hash = f"{i:064x}"
+        amount = round(rng.uniform(0.5, 5000), 2)
+        roll = rng.random()
+        if roll < 0.5:
+            ms_form.append((tx_hash, amount, '', 0))
+            tronscan.append((tx_hash, amount + rng.choice([0, 0, 0.005, 0.5, 250]), WALLET_A, 0))
+        elif roll < 0.75:
+            ms_form.append((tx_hash, amount, '', 0))
+        else:
+            tronscan.append((tx_hash, amount, WALLET_B, 0))
+    return records(ms_form), records(tronscan)
+
+def test_reconcile_matches_dict_implementation():
+    ms_form_data, tronscan_data = fixture()
+
+    result = reconcile(ReconciliationSide.from_records(ms_form_data), ReconciliationSide.from_records(tronscan_data),
+                       tolerance=0.01)
+
+    assert result.to_rows() == dict_reconcile(ms_form_data, tronscan_data, 0.01)
+
+def test_reconcile_pairs_residue_on_wallet_amount_and_time():
+    ms_form_data = records([('bad-hash', 100.0, WALLET_A, 10 * HOUR_MS)])
+    tronscan_data = records([('f' * 64, 100.0, WALLET_A, 11 * HOUR_MS)])
+
+    result = reconcile(ReconciliationSide.from_records(ms_form_data), ReconciliationSide.from_records(tronscan_data),
+                       tolerance=0.01, match_window_ms=48 * HOUR_MS)
+
+    assert result.hashes.tolist() == ['f' * 64]
+    assert result.type_codes.tolist() == [MATCHED_BY_WALLET]
+    assert result.form_hashes.tolist() == ['bad-hash']
+
+def residue(form, chain, window_ms, tolerance=0.01):
+    """match_residue over [(wallet, amount, time)] lists"""
+    def columns(entries):
+        return (np.array([wallet for wallet, _, _ in entries], dtype=object),
+                np.array([amount for _, amount, _ in entries], dtype=np.float64),
+                np.array([time for _, _, time in entries], dtype=np.int64))
+    return match_residue(*columns(form), *columns(chain), tolerance, window_ms)
+
+def test_match_residue_pairs_within_window():
+    pairs = residue([(WALLET_A, 100.0, 10 * HOUR_MS)], [(WALLET_A, -100.0, 12 * HOUR_MS)], window_ms=2 * HOUR_MS)
+
+    assert pairs == [(0, 0)]
+
+def test_match_residue_skips_transfers_outside_window():
+    pairs = residue([(WALLET_A, 100.0, 10 * HOUR_MS)], [(WALLET_A, 100.0, 12 * HOUR_MS + 1)], window_ms=2 * HOUR_MS)
+
+    assert pairs == []
+
+def test_match_residue_picks_closest_transfer_once():
+    form = [(WALLET_A, 100.0, 10 * HOUR_MS), (WALLET_A, 100.0, 20 * HOUR_MS)]
+    chain = [(WALLET_A, 100.0, 19 * HOUR_MS), (WALLET_A, 100.004, 11 * HOUR_MS), (WALLET_B, 100.0, 10 * HOUR_MS)]
+
+    pairs = residue(form, chain, window_ms=48 * HOUR_MS)
+
+    assert sorted(pairs) == [(0, 1), (1, 0)]
+
+def test_match_residue_ignores_other_wallets_and_amounts():
+    form = [(WALLET_A, 100.0, 10 * HOUR_MS), ('', 50.0, 10 * HOUR_MS)]
+    chain = [(WALLET_B, 100.0, 10 * HOUR_MS), (WALLET_A, 100.5, 10 * HOUR_MS), (WALLET_A, 50.0, 10 * HOUR_MS)]
+
+    assert residue(form, chain, window_ms=48 * HOUR_MS) == []
@@ -0,0 +1,84 @@
+import pytest
+from src.sheets_write_queue import SheetsWriteQueue
+
+class FakeWorksheet:
+    def __init__(self, sheet_id, title):
+        self.id = sheet_id
+        self.title = title
+
+class FakeSpreadsheet:
+    """batch_update that fails the first `failures` calls"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+
+    def batch_update(self, body):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError('backend error')
+        self.sent.append([request['appendCells']['sheetId'] for request in body['requests']])
+        return {}
+
+def queue_with_tabs(spreadsheet, titles):
+    # One cell per batch, so every tab goes out in its own batchUpdate
+    queue = SheetsWriteQueue(spreadsheet, requests_per_minute=6000, max_cells_per_batch=1)
+    for sheet_id, title in enumerate(titles):
+        queue.append_rows(FakeWorksheet(sheet_id, title), [['x']])
+    return queue
+
+def test_failed_batch_requeues_it_and_everything_after_it():
+    spreadsheet = FakeSpreadsheet()
+    queue = queue_with_tabs(spreadsheet, ['A', 'B', 'C'])
+
+    def fail_second(body, original=spreadsheet.batch_update):
+        if spreadsheet.sent:
+            spreadsheet.batch_update = original
+            raise RuntimeError('backend error')
+        return original(body)
+
+    spreadsheet.batch_update = fail_second
+    with pytest.raises(RuntimeError):
+        queue.flush()
+    assert spreadsheet.sent == [[0]]
+    assert [entry['title'] for entry in queue._pending] == ['B', 'C']
+
+    queue.flush()
+    assert spreadsheet.sent == [[0], [1], [2]]
+    assert queue._pending == []
+
+def test_requeued_writes_stay_ahead_of_newer_ones():
+    spreadsheet = FakeSpreadsheet(failures=1)
+    queue = queue_with_tabs(spreadsheet, ['A'])
+
+    with pytest.raises(RuntimeError):
+        queue.flush()
+    queue.append_rows(FakeWorksheet(1, 'B'), [['y']])
+    queue.flush()
+    assert spreadsheet.sent == [[0], [1]]
+
+class FakeAuth:
+    service_account_email = 'sync@example.iam.gserviceaccount.com'
+
+class FakeClient:
+    auth = FakeAuth()
+
+def test_queues_of_one_service_account_share_the_quota_window(monkeypatch):
+    monkeypatch.setattr('src.sheets_write_queue._windows', {})
+    first, second = FakeSpreadsheet(), FakeSpreadsheet()
+    first.client = second.client = FakeClient()
+    sleeps = []
+    monkeypatch.setattr('src.sheets_write_queue.time.sleep', sleeps.append)
+
+    queues = [SheetsWriteQueue(spreadsheet, requests_per_minute=2) for spreadsheet in (first, second)]
+    queues[0]._pace()
+    queues[1]._pace()
+    assert sleeps == []
+
+    # The third request in the minute waits, whichever queue sends it
+    monkeypatch.setattr('src.sheets_write_queue.time.monotonic', lambda: queues[0]._window.sent[0] + 59)
+    monkeypatch.setattr('src.sheets_write_queue.time.sleep',
+                        lambda seconds: (sleeps.append(seconds), queues[0]._window.sent.popleft()))
+    queues[1]._pace()
+    assert sleeps == [pytest.approx(1.0)]
+    assert queues[1].stats['waited_seconds'] == pytest.approx(1.0)
@@ -0,0 +1,40 @@
+import sqlite3
+from src.sinks import LocalStoreSink, write_stream
+
+WALLET = 'TXYZopYRdj2D9XRtbG411XZZ3kM5VkAeBf'
+
+def transfer(tx_hash, amount, timestamp):
+    return {'hash': tx_hash, 'wallet': WALLET, 'amt_usdt': amount, 'timestamp': timestamp}
+
+def stored(path):
+    with sqlite3.connect(str(path)) as db:
+        return db.execute('SELECT hash, amt_usdt FROM usdt_transfers ORDER BY hash, transfer_index').fetchall()
+
+def test_store_keeps_equal_transfers_of_one_transaction(tmp_path):
+    path = tmp_path / 'transfers.sqlite'
+    records = [transfer('a' * 64, 50.0, 2000), transfer('a' * 64, 50.0, 2000), transfer('b' * 64, 50.0, 1000)]
+
+    # Chunks of one, so the payout's transfers land in different chunks
+    write_stream(records, LocalStoreSink(str(path)), chunk_size=1)
+
+    assert stored(path) == [('a' * 64, 50.0), ('a' * 64, 50.0), ('b' * 64, 50.0)]
+
+def test_rerun_over_the_same_range_adds_nothing(tmp_path):
+    path = tmp_path / 'transfers.sqlite'
+    records = [transfer('a' * 64, 50.0, 2000), transfer('a' * 64, 50.0, 2000)]
+
+    write_stream(records, LocalStoreSink(str(path)))
+    write_stream(records, LocalStoreSink(str(path)))
+
+    assert stored(path) == [('a' * 64, 50.0), ('a' * 64, 50.0)]
+
+def test_store_without_transfer_index_is_migrated(tmp_path):
+    path = tmp_path / 'transfers.sqlite'
+    with sqlite3.connect(str(path)) as db:
+        db.execute('CREATE TABLE usdt_transfers (hash TEXT NOT NULL, wallet TEXT NOT NULL, amt_usdt REAL NOT NULL, '
+                   'timestamp INTEGER, PRIMARY KEY (hash, wallet, amt_usdt))')
+        db.execute('INSERT INTO usdt_transfers VALUES (?, ?, ?, ?)', ('a' * 64, WALLET, 50.0, 2000))
+
+    write_stream([transfer('a' * 64, 50.0, 2000), transfer('a' * 64, 50.0, 2000)], LocalStoreSink(str(path)))
+
+    assert stored(path) == [('a' * 64, 50.0), ('a' * 64, 50.0)]
@@ -0,0 +1,30 @@
+from src.sync_cursor import SyncCursorStore
+
+WALLET = 'TXYZopYRdj2D9XRtbG411XZZ3kM5VkAeBf'
+
+def transfer(tx_hash, timestamp, wallet=WALLET):
+    return {'hash': tx_hash, 'wallet': wallet, 'timestamp': timestamp}
+
+def test_filter_new_keeps_other_transfers_at_the_cursor_timestamp(tmp_path):
+    store = SyncCursorStore(str(tmp_path / 'cursors.json'))
+    store.stage([transfer('a' * 64, 1000)])
+    store.commit()
+
+    new = store.filter_new([transfer('a' * 64, 1000), transfer('b' * 64, 1000), transfer('c' * 64, 999),
+                            transfer('d' * 64, 1001)])
+
+    assert [tx['hash'] for tx in new] == ['b' * 64, 'd' * 64]
+
+def test_filter_new_keeps_wallets_without_cursor(tmp_path):
+    store = SyncCursorStore(str(tmp_path / 'cursors.json'))
+
+    assert store.filter_new([transfer('a' * 64, 1, wallet='other')]) == [transfer('a' * 64, 1, wallet='other')]
+
+def test_cursor_persists_only_after_commit(tmp_path):
+    path = str(tmp_path / 'cursors.json')
+    store = SyncCursorStore(path)
+    store.stage([transfer('a' * 64, 1000), transfer('b' * 64, 2000)])
+
+    assert SyncCursorStore(path).get(WALLET) is None
+    store.commit()
+    assert SyncCursorStore(path).get(WALLET) == {'timestamp': 2000, 'hash': 'b' * 64}
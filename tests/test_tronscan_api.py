@@ -0,0 +1,46 @@
+from src.tronscan_api import TronScanAPI
+
+def record(tx_hash, amount, timestamp):
+    return {'hash': tx_hash, 'wallet': 'TWallet', 'amt_usdt': amount, 'timestamp': timestamp}
+
+def test_equal_transfers_in_one_transaction_are_kept():
+    payout = [record('batch', 100.0, 5000)] * 3
+    merged = TronScanAPI._merge_window_records([payout + [record('other', 1.0, 4000)]])
+    assert [r['hash'] for r in merged] == ['batch', 'batch', 'batch', 'other']
+
+def test_boundary_transfers_returned_by_both_windows_are_kept_once():
+    older = [record('boundary', 50.0, 3000), record('boundary', 50.0, 3000), record('old', 2.0, 1000)]
+    newer = [record('new', 7.0, 6000), record('boundary', 50.0, 3000), record('boundary', 50.0, 3000)]
+    merged = TronScanAPI._merge_window_records([newer, older])
+    assert [(r['hash'], r['amt_usdt']) for r in merged] == [
+        ('new', 7.0), ('boundary', 50.0), ('boundary', 50.0), ('old', 2.0)
+    ]
+
+def split_api():
+    api = TronScanAPI.__new__(TronScanAPI)
+    api.window_workers = 2
+    api.max_offset = 3
+    api.min_window_ms = 1
+    api.failed_addresses = []
+    return api
+
+# Inclusive window bounds, like TronScan: the payout at the midpoint is in both halves
+TRANSFERS = [record('payout', 10.0, 50)] * 2 + [record(f"tx{t}", 1.0, t) for t in (10, 20, 80, 90)]
+
+def get_page(address, start_timestamp, end_timestamp, start):
+    rows = [t for t in TRANSFERS if start_timestamp <= t['timestamp'] <= end_timestamp]
+    return rows, len(rows), len(rows)
+
+def test_sharded_fetch_keeps_batch_payouts_across_a_split():
+    merged = split_api()._fetch_sharded('TWallet', 0, 100, get_page, limit=100)
+    assert sorted(r['hash'] for r in merged) == ['payout', 'payout', 'tx10', 'tx20', 'tx80', 'tx90']
+
+def test_streamed_pages_keep_batch_payouts_across_a_split():
+    api = split_api()
+    api._get_transfer_page, api.transfer_page_limit = get_page, 100
+
+    streamed = [r for page in api._iter_address_pages('TWallet', 0, 100, 'transfers') for r in page]
+
+    listed = api._fetch_sharded('TWallet', 0, 100, get_page, limit=100)
+    assert sorted(r['hash'] for r in streamed) == sorted(r['hash'] for r in listed) == \
+        ['payout', 'payout', 'tx10', 'tx20', 'tx80', 'tx90']